@@ -1,83 +1,262 @@
+import hashlib
+import json
+import math
+import os
+import random
+import socket
+import sqlite3
 import time
 import subprocess
 import re
 import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlencode
+
+import assets
+import metrics
+import perf
+
+import channel_plans
+import lineup
+from batch import parse_ops, run_batch
+from coalesce import SingleFlight
+from devices import (
+    DeviceRegistry,
+    count_tuners,
+    parse_device_list,
+    parse_discover_output,
+    parse_discover_targets,
+)
+
+from events import EventBroker, format_sse
+from hdhomerun import (
+    HDHOMERUN_CONTROL_PORT,
+    HDHOMERUN_HTTP_PORT,
+    ControlClient,
+    DeviceError,
+    SubprocessClient,
+    discover,
+    parse_status,
+)
+from history import HistoryRecorder
+from leases import LeaseError, TunerAllocator
+from monitor import ChannelMonitor, WebhookSender
+from parallel_scan import ParallelScan, incremental_channels
+from sampler import TunerSampler
+from scan_parser import ChannelFinished, ChannelStarted, ScanParser
+from scan_store import ScanStore, diff_scans
+from shared_state import EventRelay, MemoryState, SharedState
+from ts_analyzer import Capture, receive_http, receive_udp
+from ts_relay import StreamRelay
+from tuning import tune
 
 try:
-    from flask import Flask, jsonify, request, send_from_directory
+    from flask import (
+        Flask,
+        Response,
+        g,
+        jsonify,
+        request,
+        stream_with_context,
+    )
 except ImportError as exc:  # pragma: no cover - runtime guard only
     raise ImportError(
         "Flask is required to run this application."
         " Please install dependencies with 'pip install -r requirements.txt'."
     ) from exc
 
-app = Flask(__name__, static_folder=".", static_url_path="")
+app = Flask(__name__, static_folder=None)
 
-# Store scan progress keyed by UUID
-scans = {}
+# The page and everything under static/ are served from memory with gzip
+# (and brotli) variants and strong ETags (see assets.py). Static files have
+# fingerprinted URLs and are cached by browsers for a year; the page is
+# revalidated on every visit and reloaded when a file changes on disk.
+static_assets = assets.AssetStore()
+
+# Device commands, parsers and waits are always timed (see perf.py). A
+# request sent with "X-Perf-Trace: 1", or every request when
+# PERF_SERVER_TIMING=1, also gets a Server-Timing header breaking its time down.
+PERF_SERVER_TIMING = os.environ.get("PERF_SERVER_TIMING") == "1"
 
-# Cache for discovered device information to avoid expensive calls on every
-# request. Values expire after DEVICE_CACHE_TTL seconds.
+# Store scan progress keyed by UUID. Finished scans are kept in memory for
+# SCAN_MEMORY_TTL seconds; after that they are served from the scan store.
+scans = {}
+SCAN_MEMORY_TTL = float(os.environ.get("SCAN_MEMORY_TTL", "600"))
+SCAN_DB = os.environ.get("SCAN_DB", "scans.db")
+scan_store = ScanStore(SCAN_DB)
+# An incremental scan re-probes the channels that locked in the device's last
+# scan with the same channelmap, plus one in SCAN_SAMPLE_EVERY of the others.
+SCAN_SAMPLE_EVERY = int(os.environ.get("SCAN_SAMPLE_EVERY", "8"))
+
+# Tune completion is detected by polling lock state and streaminfo with
+# backoff. TUNE_DEADLINE bounds a tune by default; callers may pass a
+# shorter or longer deadline up to TUNE_DEADLINE_MAX. Asynchronous tune jobs
+# are kept for TUNE_JOB_TTL seconds after finishing.
+TUNE_DEADLINE = float(os.environ.get("TUNE_DEADLINE", "6.0"))
+TUNE_DEADLINE_MAX = 15.0
+TUNE_JOB_TTL = 300
+tune_jobs = {}
+
+# Gunicorn workers share scan progress, tune jobs, discovered devices, the
+# tuner sample and scan/tune/monitor stream events through SHARED_STATE_DB
+# (see shared_state.py; by default the scan database). One worker at a time
+# discovers devices and samples the tuners; a lapsed leader is replaced after
+# SAMPLE_LEADER_TTL seconds. ":memory:" keeps everything in this process.
+SHARED_STATE_DB = os.environ.get("SHARED_STATE_DB", SCAN_DB)
+shared = MemoryState() if SHARED_STATE_DB == ":memory:" else SharedState(SHARED_STATE_DB)
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+SCAN_SHARE_INTERVAL = 0.25  # seconds between shared updates of a running scan
+DISCOVERY_LOCK_TTL = 30.0
+
+# /api/program_info reads (a tuner's program, debug and streaminfo) are shared
+# by concurrent identical requests and the debug and streaminfo results are
+# cached for TUNER_READ_TTL seconds (see coalesce.py). Program selection and
+# the reads that follow it run one request at a time per tuner.
+TUNER_READ_TTL = float(os.environ.get("TUNER_READ_TTL", "0.5"))
+tuner_reads = SingleFlight(TUNER_READ_TTL)
+_program_locks: dict[tuple[str, int], threading.Lock] = {}
+
+# Per-tuner signal history (1 s / 10 s / 1 min tiers) fed by the sampler.
+history = HistoryRecorder()
+
+# Live events (tuner deltas, scan progress) pushed to /api/stream clients.
+events = EventBroker()
+relay = EventRelay(shared, WORKER_ID, events.publish)
+STREAM_KEEPALIVE = 15.0  # seconds between SSE keepalive comments
+
+# Tuners are leased to callers (see leases.py) for LEASE_TTL seconds by
+# default and at most LEASE_TTL_MAX; a caller may queue up to LEASE_WAIT_MAX
+# seconds for a tuner to free up.
+LEASE_TTL = float(os.environ.get("LEASE_TTL", "300"))
+LEASE_TTL_MAX = 3600.0
+LEASE_WAIT_MAX = 30.0
+
+# Transport stream captures (see ts_analyzer.py) receive a tuner's stream on a
+# UDP port (ANALYZER_UDP_PORT; 0 picks a free port per capture) or from the
+# device's HTTP port. They run for at most ANALYZE_MAX_SECONDS and are kept
+# for ANALYZE_TTL seconds after finishing.
+ANALYZER_UDP_PORT = int(os.environ.get("ANALYZER_UDP_PORT", "0"))
+ANALYZE_DEFAULT_SECONDS = 30.0
+ANALYZE_MAX_SECONDS = 600.0
+ANALYZE_TTL = 300
+captures = {}
+
+# /api/relay shares one tuner among every viewer of a channel (and program):
+# the first viewer leases and tunes a tuner, later ones read the same
+# RELAY_BUFFER-byte ring buffer (see ts_relay.py). A viewer further behind
+# than the buffer is disconnected. The tuner is released RELAY_LINGER
+# seconds after the last viewer leaves.
+RELAY_BUFFER = int(os.environ.get("RELAY_BUFFER", str(8 * 1024 * 1024)))
+RELAY_LINGER = float(os.environ.get("RELAY_LINGER", "5"))
+relays = {}  # (device, channel, program) -> (StreamRelay, Lease)
+relay_starts = SingleFlight(0)
+
+# With MONITOR_ENABLED=1 a background monitor re-probes each device's known
+# channels on a spare tuner, one every MONITOR_INTERVAL seconds, leaving at
+# least MONITOR_RESERVE tuners free. Changes are pushed as "monitor" stream
+# events, logged, and POSTed to MONITOR_WEBHOOK when set. One worker at a time
+# monitors; the others serve its status and take over MONITOR_LEADER_TTL
+# seconds after it stops.
+MONITOR_ENABLED = os.environ.get("MONITOR_ENABLED") == "1"
+MONITOR_INTERVAL = float(os.environ.get("MONITOR_INTERVAL", "30"))
+MONITOR_LEADER_TTL = max(3 * MONITOR_INTERVAL, 60.0)
+MONITOR_RESERVE = int(os.environ.get("MONITOR_RESERVE", "1"))
+MONITOR_WEBHOOK = os.environ.get("MONITOR_WEBHOOK")
+
+# Every device found by discovery. The first discovery starts with the app;
+# the list is refreshed in the background once it is older than
+# DEVICE_CACHE_TTL seconds and requests never wait on a refresh.
 DEVICE_CACHE_TTL = 60  # seconds
-_device_cache = {"id": None, "ip": None, "timestamp": 0.0}
-
-# Mapping from frequency (Hz) to physical channel
-FREQ_TO_CHANNEL = {
-    57000000: 2,
-    63000000: 3,
-    69000000: 4,
-    79000000: 5,
-    85000000: 6,
-    177000000: 7,
-    183000000: 8,
-    189000000: 9,
-    195000000: 10,
-    201000000: 11,
-    207000000: 12,
-    213000000: 13,
-    473000000: 14,
-    479000000: 15,
-    485000000: 16,
-    491000000: 17,
-    497000000: 18,
-    503000000: 19,
-    509000000: 20,
-    515000000: 21,
-    521000000: 22,
-    527000000: 23,
-    533000000: 24,
-    539000000: 25,
-    545000000: 26,
-    551000000: 27,
-    557000000: 28,
-    563000000: 29,
-    569000000: 30,
-    575000000: 31,
-    581000000: 32,
-    587000000: 33,
-    593000000: 34,
-    599000000: 35,
-    605000000: 36,
-    617000000: 38,
-    623000000: 39,
-    629000000: 40,
-    635000000: 41,
-    641000000: 42,
-    647000000: 43,
-    653000000: 44,
-    659000000: 45,
-    665000000: 46,
-    671000000: 47,
-    677000000: 48,
-    683000000: 49,
-    689000000: 50,
-    695000000: 51,
-}
-
-
-def run_scan(scan_id, device_id, tuner_index):
+# Discovery broadcasts on UDP port 65001 and also asks the hosts in
+# HDHOMERUN_DISCOVER_TARGETS ("<ip>[:<port>]" or "<subnet>/<bits>",
+# comma-separated), e.g. devices on other subnets. Replies are collected for
+# DISCOVER_TIMEOUT seconds. The subprocess backend runs hdhomerun_config
+# discover instead.
+DISCOVER_TARGETS = parse_discover_targets(os.environ.get("HDHOMERUN_DISCOVER_TARGETS", ""))
+DISCOVER_TIMEOUT = float(os.environ.get("DISCOVER_TIMEOUT", "0.5"))
+
+# Skip discovery and use fixed devices, given as "<id>@<ip>[:<port>],...".
+STATIC_DEVICES = os.environ.get("HDHOMERUN_DEVICE")
+
+# Device control backend: "native" talks the control protocol directly over a
+# persistent socket, "subprocess" shells out to hdhomerun_config per call.
+CONTROL_BACKEND = os.environ.get("HDHOMERUN_CONTROL", "native")
+_clients: dict[str, ControlClient | SubprocessClient] = {}
+_clients_lock = threading.Lock()
+# Extra native connections per device so batches can drive tuners in parallel.
+_tuner_clients: dict[str, list[ControlClient]] = {}
+
+# Tuner status is sampled once per SAMPLE_INTERVAL seconds by a background
+# thread and shared by every client. A tuner whose last successful read is
+# older than TUNER_STALE_AFTER seconds is flagged as stale.
+SAMPLE_INTERVAL = float(os.environ.get("TUNER_SAMPLE_INTERVAL", "1.0"))
+TUNER_STALE_AFTER = float(os.environ.get("TUNER_STALE_AFTER", "5.0"))
+# Devices are sampled concurrently, up to SAMPLE_WORKERS at a time.
+SAMPLE_WORKERS = 8
+SAMPLE_LEADER_TTL = max(3 * SAMPLE_INTERVAL, 3.0)
+_sample_pool = ThreadPoolExecutor(SAMPLE_WORKERS, thread_name_prefix="tuner-sampler")
+
+def publish_shared(event: str, data: dict) -> None:
+    """Push an event to this worker's stream clients and every other worker's."""
+    events.publish(event, data)
+    try:
+        relay.publish(event, data)
+    except sqlite3.Error as exc:  # e.g. "database is locked"; local clients still got it
+        app.logger.warning("sharing %s event failed: %s", event, exc)
+
+
+def scan_status(data: dict) -> dict:
+    """The /api/scan/status response for an in-memory scan record."""
+    results = list(data["results"])
+    current = data.get("current")
+    if current is not None and (current["lock"] is not None or current["subchannels"]):
+        results.append(current)
+    resp = {"finished": data["finished"], "results": results}
+    if "progress" in data:
+        resp["progress"] = data["progress"]
+        resp["total"] = data["total"]
+    if "previous" in data:
+        resp["previous"] = data["previous"]
+        resp["refreshed"] = data["refreshed"]
+        resp["cached"] = data["cached"]
+    return resp
+
+
+def share_scan(scan_id: str, force: bool = False) -> None:
+    """Copy a scan's status to the shared state, at most every SCAN_SHARE_INTERVAL."""
+    scan = scans[scan_id]
+    now = time.monotonic()
+    if not force and now - scan.get("shared_at", 0.0) < SCAN_SHARE_INTERVAL:
+        return
+    scan["shared_at"] = now
+    try:
+        shared.put("scan", scan_id, scan_status(scan), ttl=SCAN_MEMORY_TTL)
+    except sqlite3.Error as exc:  # the next update (or the finish) tries again
+        app.logger.warning("sharing scan %s failed: %s", scan_id, exc)
+
+
+def finish_scan(scan_id: str) -> None:
+    scan = scans[scan_id]
+    scan.update(current=None, finished=True, finished_at=time.time())
+    scan_store.finish(scan_id)
+    share_scan(scan_id, force=True)
+    publish_shared("scan", {"scan_id": scan_id, "finished": True})
+
+
+def publish_scan_group(scan_id: str, index: int, group: dict) -> None:
+    """Push one (possibly still growing) physical-channel group to clients."""
+    share_scan(scan_id)
+    publish_shared(
+        "scan",
+        {"scan_id": scan_id, "index": index, "group": group, "finished": False},
+    )
+
+
+def run_scan(scan_id, device_id, tuner_index, plan):
     """Background thread to perform a channel scan."""
+    started = time.monotonic()
     cmd = ["hdhomerun_config", device_id, "scan", f"/tuner{tuner_index}"]
     try:
         proc = subprocess.Popen(
@@ -87,423 +266,1193 @@ def run_scan(scan_id, device_id, tuner_index):
             text=True,
         )
     except OSError:
-        scans[scan_id] = {"finished": True, "results": []}
+        finish_scan(scan_id)
         return
 
-    results: list[dict] = []
-    current_group = None
-    capturing = False
+    # The parser's result list is append-only, so it is shared with the scan
+    # record directly; the channel being scanned is exposed as "current".
+    parser = ScanParser(plan.by_frequency)
+    scan = scans[scan_id]
+    scan["results"] = parser.results
+
+    def handle(scan_events):
+        for event in scan_events:
+            if isinstance(event, ChannelFinished):
+                scan["current"] = None
+                scan_store.add_channel(scan_id, event.group)
+                publish_scan_group(scan_id, event.index, event.group)
+            elif isinstance(event, ChannelStarted):
+                scan["current"] = event.group
+                share_scan(scan_id)
+            elif event.group["lock"] is not None or event.group["subchannels"]:
+                publish_scan_group(scan_id, len(parser.results), event.group)
 
-    for raw in proc.stdout:
-        line = raw.strip()
+    try:
+        for raw in proc.stdout:
+            handle(parser.feed(raw))
+        proc.wait()
+        handle(parser.finish())
+        metrics.scan_duration_seconds.observe(time.monotonic() - started, "sequential")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        finish_scan(scan_id)
+
+
+def evict_scans() -> None:
+    """Drop finished scans older than SCAN_MEMORY_TTL from memory."""
+    cutoff = time.time() - SCAN_MEMORY_TTL
+    for scan_id, scan in list(scans.items()):
+        if scan.get("finished") and scan.get("finished_at", 0) < cutoff:
+            scans.pop(scan_id, None)
+
+
+def run_parallel_scan(scan_id, client, leases, channels, mode="parallel"):
+    """Background thread to scan the channel plan across several leased tuners.
+
+    Groups are published with their physical channel as ``index`` so
+    clients can place them in channel order as they arrive. The leases are
+    released when the scan ends.
+    """
+    scan = scans[scan_id]
 
-        if line.startswith("SCANNING:"):
-            if current_group is not None and (
-                current_group.get("lock") is not None
-                or current_group.get("subchannels")
-            ):
-                results.append(current_group)
-                scans[scan_id]["results"] = list(results)
-            capturing = False
+    def on_group(group):
+        scan_store.add_channel(scan_id, group)
+        publish_scan_group(scan_id, group["physical"], group)
 
-            parts = line.split()
-            freq = None
-            try:
-                freq = int(parts[1])
-            except (IndexError, ValueError):
-                pass
-
-            m = re.search(r"\((?:us-bcast:)?(\d+)\)", line)
-            phys = int(m.group(1)) if m else None
-            if phys is None and freq is not None:
-                phys = FREQ_TO_CHANNEL.get(freq)
-
-            current_group = {
-                "physical": phys,
-                "lock": None,
-                "ss": 0,
-                "snq": 0,
-                "subchannels": [],
-            }
-
-        elif line.startswith("LOCK:") and current_group is not None:
-            # Example: "LOCK: 8vsb (ss=85 snq=88 seq=100)" or "LOCK: none (ss=0 snq=0 seq=0)"
-            m = re.search(r"LOCK:\s+(\S+)(?:\s+\(ss=(\d+)\s+snq=(\d+)\s+seq=(\d+)\))?", line)
-            if m:
-                lock_val, ss_val, snq_val, _ = m.groups()
-                current_group["lock"] = lock_val if lock_val.lower() != "none" else None
-                capturing = lock_val.lower() != "none"
-                if ss_val is not None:
-                    try:
-                        current_group["ss"] = int(ss_val)
-                    except ValueError:
-                        current_group["ss"] = 0
-                if snq_val is not None:
-                    try:
-                        current_group["snq"] = int(snq_val)
-                    except ValueError:
-                        current_group["snq"] = 0
-
-        elif line.startswith("PROGRAM") and capturing and current_group is not None:
-            after_colon = line.split(":", 1)[1].strip()
-            for m in re.finditer(r"(\d+\.\d+)\s+(.+?)(?=\s+\d+\.\d+|$)", after_colon):
-                num = m.group(1).strip()
-                name = m.group(2).strip()
-                current_group["subchannels"].append({"num": num, "name": name})
-            scans[scan_id]["results"] = list(results) + [current_group]
-
-    proc.wait()
-
-    if current_group is not None and (
-        current_group.get("lock") is not None or current_group.get("subchannels")
-    ):
-        results.append(current_group)
-
-    scans[scan_id]["results"] = results
-    scans[scan_id]["finished"] = True
-
-
-def discover_device() -> tuple[str | None, str | None]:
-    """Return the HDHomeRun device id and IP address.
-
-    Results are cached for ``DEVICE_CACHE_TTL`` seconds to avoid running the
-    external ``hdhomerun_config discover`` command on every request.
+    def on_progress(progress):
+        share_scan(scan_id)
+        publish_shared(
+            "scan",
+            {
+                "scan_id": scan_id,
+                "finished": False,
+                "progress": progress,
+                "done": sum(p["done"] for p in progress.values()),
+                "total": scan["total"],
+            },
+        )
+
+    scanner = ParallelScan(
+        client,
+        [lease.tuner for lease in leases],
+        channels,
+        on_group=on_group,
+        on_progress=on_progress,
+        lockkeys={lease.tuner: lease.lockkey for lease in leases},
+    )
+    scan["results"] = scanner.results
+    scan["progress"] = scanner.progress
+    started = time.monotonic()
+    try:
+        scanner.run()
+        metrics.scan_duration_seconds.observe(time.monotonic() - started, mode)
+    finally:
+        for lease in leases:
+            allocator.release(lease.id)
+        finish_scan(scan_id)
+
+
+def discover_devices() -> list[tuple]:
+    """Return ``[(device_id, ip[, tuner_count]), ...]`` for every device on the network.
+
+    With ``HDHOMERUN_DEVICE`` set, those devices are returned without
+    discovery. Raises :class:`DeviceError` when discovery cannot run.
     """
-    now = time.time()
-    if (
-        _device_cache["id"]
-        and now - _device_cache["timestamp"] < DEVICE_CACHE_TTL
-    ):
-        return _device_cache["id"], _device_cache["ip"]
+    if STATIC_DEVICES:
+        return parse_device_list(STATIC_DEVICES)
+    if CONTROL_BACKEND != "subprocess":
+        with perf.span("wait", "discover"):
+            return discover(DISCOVER_TARGETS, DISCOVER_TIMEOUT)
 
     try:
         out = subprocess.check_output(
             ["hdhomerun_config", "discover"], stderr=subprocess.DEVNULL
         ).decode()
-    except subprocess.CalledProcessError:
-        _device_cache.update({"id": None, "ip": None, "timestamp": now})
+    except subprocess.CalledProcessError as exc:
+        if b"no devices" in (exc.output or b""):
+            return []
+        raise DeviceError(f"discovery failed: {exc}") from exc
+    except OSError as exc:
+        raise DeviceError(f"discovery failed: {exc}") from exc
+    return parse_discover_output(out)
+
+
+def shared_discover() -> list[tuple]:
+    """Discover devices once for every worker.
+
+    A discovery result younger than DEVICE_CACHE_TTL is reused; otherwise the
+    worker holding the shared "discovery" lock discovers while the others
+    keep using the previous result.
+    """
+    if STATIC_DEVICES:
+        return discover_devices()
+    found = shared.get("devices", "found", max_age=DEVICE_CACHE_TTL)
+    if found is None:
+        if shared.acquire("discovery", WORKER_ID, DISCOVERY_LOCK_TTL):
+            try:
+                found = discover_devices()
+                shared.put("devices", "found", found)
+            finally:
+                shared.release("discovery", WORKER_ID)
+        else:
+            found = shared.get("devices", "found")
+            if found is None:  # nothing discovered yet anywhere
+                found = discover_devices()
+    return [tuple(entry) for entry in found]
+
+
+def probe_tuner_count(device_id: str, device_ip: str) -> int | None:
+    """Read a newly discovered device's tuner count, once for every worker."""
+    key = f"{device_id}@{device_ip}"
+    count = shared.get("tuner_count", key)
+    if count is None:
+        count = count_tuners(device_client(device_id, device_ip))
+        if count is not None:
+            shared.put("tuner_count", key, count)
+    return count
+
+
+registry = DeviceRegistry(shared_discover, probe_tuner_count, ttl=DEVICE_CACHE_TTL)
+
+
+def record_device_command(backend: str, op: str, name: str, seconds: float, ok: bool) -> None:
+    """Feed every device get/set into the latency histogram and perf counters."""
+    metrics.device_command_seconds.observe(seconds, backend, op, "ok" if ok else "error")
+    perf.record("device", f"{backend} {op} {perf.command_name(name)}", seconds, ok)
+
+
+_record_native = partial(record_device_command, "native")
+_record_subprocess = partial(record_device_command, "subprocess")
+
+
+def device_client(device_id: str, device_ip: str | None = None):
+    """Return the cached control client for ``device_id``.
+
+    The native client is used whenever the device IP is known; otherwise, or
+    when ``HDHOMERUN_CONTROL=subprocess``, calls go through hdhomerun_config.
+    ``device_ip`` may carry a ``:port`` suffix (e.g. for the fake device).
+    """
+    host, _, port = (device_ip or "").partition(":")
+    port = int(port) if port else HDHOMERUN_CONTROL_PORT
+    with _clients_lock:
+        client = _clients.get(device_id)
+        if isinstance(client, ControlClient) and (client.host, client.port) != (host, port):
+            client.close()
+            client = None
+        if client is None:
+            if CONTROL_BACKEND == "native" and host:
+                client = ControlClient(host, port, on_request=_record_native)
+            else:
+                client = SubprocessClient(device_id, on_request=_record_subprocess)
+            _clients[device_id] = client
+        return client
+
+
+def device_clients(device) -> list:
+    """Return one control client per tuner of ``device`` for batch operations.
+
+    The first is the device's shared client. ``hdhomerun_config`` runs a
+    process per call, so the subprocess backend simply repeats its client.
+    """
+    main = device_client(device.id, device.ip)
+    count = max(device.tuner_count or 1, 1)
+    if not isinstance(main, ControlClient):
+        return [main] * count
+    with _clients_lock:
+        extra = _tuner_clients.setdefault(device.id, [])
+        if extra and (extra[0].host, extra[0].port) != (main.host, main.port):
+            for client in extra:
+                client.close()
+            extra.clear()
+        while len(extra) < count - 1:
+            extra.append(ControlClient(main.host, main.port, on_request=_record_native))
+        return [main, *extra[: count - 1]]
+
+
+def device_batch(device, ops: list[dict]) -> list[dict]:
+    """Run a batch of get/set operations on ``device``; see :mod:`batch`."""
+    return run_batch(device_clients(device), ops)
+
+
+allocator = TunerAllocator(device_clients, ttl=LEASE_TTL)
+
+
+def lease_ttl(value) -> float:
+    try:
+        return max(1.0, min(float(value if value is not None else LEASE_TTL), LEASE_TTL_MAX))
+    except (TypeError, ValueError):
+        return LEASE_TTL
+
+
+def lease_wait(value) -> float:
+    try:
+        return max(0.0, min(float(value or 0), LEASE_WAIT_MAX))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def tuner_lockkey(device, tuner: int, lease_id: str | None) -> int | None:
+    """Return the lockkey to use on ``tuner``: the lease's if ``lease_id`` holds it.
+
+    Raises :class:`LeaseError` when the tuner is leased to someone else.
+    """
+    if lease_id:
+        lease = allocator.get(lease_id)
+        if lease is None or lease.device_id != device.id or lease.tuner != tuner:
+            raise LeaseError("Unknown lease for this tuner", 404)
+        return lease.lockkey
+    if tuner in allocator.leased(device.id):
+        raise LeaseError("Tuner is leased")
+    return None
+
+
+def tune_target(device, data: dict):
+    """Return ``(tuner, lease)`` for a tune request.
+
+    With ``lease`` the leased tuner is used (and the lease renewed); with
+    ``tuner`` that tuner, unless someone else leases it; with neither, the
+    least disruptive free tuner is leased, waiting up to ``wait`` seconds.
+    Raises :class:`LeaseError`.
+    """
+    lease_id = data.get("lease")
+    if lease_id:
+        lease = allocator.get(lease_id)
+        if lease is None or lease.device_id != device.id:
+            raise LeaseError("Unknown lease", 404)
+        return lease.tuner, allocator.renew(lease_id, lease_ttl(data.get("ttl")))
+    if data.get("tuner") is None:
+        lease = allocator.acquire(
+            device, ttl=lease_ttl(data.get("ttl")), wait=lease_wait(data.get("wait")), purpose="tune"
+        )
+        if lease is None:
+            raise LeaseError("No free tuner")
+        return lease.tuner, lease
+    try:
+        tuner = int(data["tuner"])
+    except (TypeError, ValueError):
+        raise LeaseError("Invalid tuner", 400) from None
+    tuner_lockkey(device, tuner, None)
+    return tuner, None
+
+
+def scan_leases(device) -> list:
+    """Lease every free tuner of ``device`` for a parallel scan."""
+    leases = []
+    while True:
+        lease = allocator.acquire(device, ttl=LEASE_TTL_MAX, purpose="scan")
+        if lease is None:
+            return leases
+        leases.append(lease)
+
+
+def find_device(device_id: str | None = None):
+    """Return ``(device, client)`` for ``device_id`` (default: the first device).
+
+    Both are ``None`` when there is no such device; callers answer 404 when a
+    specific device was asked for and 503 otherwise.
+    """
+    device = registry.get(device_id)
+    if device is None:
         return None, None
+    return device, device_client(device.id, device.ip)
+
+
+def device_plan(device, client) -> channel_plans.ChannelPlan:
+    """Return the channel plan of ``device``, reading its channelmap if not yet known."""
+    if device.channelmap is None:
+        try:
+            device.channelmap = channel_plans.parse_channelmap(client.get("/tuner0/channelmap"))
+        except DeviceError:
+            pass
+    return channel_plans.get_plan(device.channelmap)
+
+
+def plan_summary(plan: channel_plans.ChannelPlan) -> dict:
+    return {"channelmap": plan.name, "channels": [plan.channels[0], plan.channels[-1]]}
+
+
+def device_get(client, name: str) -> str:
+    """Return the value of ``name``, or an empty string if the call fails."""
+    try:
+        return client.get(name)
+    except DeviceError:
+        return ""
+
+
+def device_set(client, name: str, value, lockkey: int | None = None) -> str:
+    """Set ``name`` and return the device response or its error message."""
+    try:
+        return client.set(name, value, lockkey=lockkey)
+    except DeviceError as exc:
+        return str(exc)
+
+
+def wants_trace(headers) -> bool:
+    return PERF_SERVER_TIMING or headers.get("X-Perf-Trace") == "1"
+
+
+@app.before_request
+def start_perf_trace():
+    if wants_trace(request.headers):
+        g.perf_started = time.perf_counter()
+        g.perf_token = perf.start_trace()
+
+
+@app.after_request
+def add_server_timing(response):
+    token = g.pop("perf_token", None)
+    if token is not None:
+        trace = perf.end_trace(token)
+        total = time.perf_counter() - g.perf_started
+        response.headers["Server-Timing"] = perf.server_timing(trace, total)
+    return response
+
+
+@app.teardown_request
+def end_perf_trace(exc):
+    # after_request is skipped when a view raises; don't leak the trace into
+    # the next request handled by this thread.
+    token = g.pop("perf_token", None)
+    if token is not None:
+        perf.end_trace(token)
 
-    device_id = device_ip = None
-    for line in out.splitlines():
-        match = re.search(r"hdhomerun device (\w+) found at ([\d\.]+)", line)
-        if match:
-            device_id = match.group(1)
-            device_ip = match.group(2)
-            break
 
-    _device_cache.update({"id": device_id, "ip": device_ip, "timestamp": now})
-    return device_id, device_ip
+def asset_response(asset: assets.Asset, cache_control: str) -> Response:
+    status, headers, body = asset.respond(
+        request.headers.get("Accept-Encoding", ""),
+        request.headers.get("If-None-Match", ""),
+        cache_control,
+    )
+    return Response(body, status=status, headers=headers)
 
 
 @app.route("/")
 def index():
-    return send_from_directory(".", "index.html")
+    static_assets.refresh()
+    return asset_response(static_assets.page, assets.REVALIDATE)
+
+
+@app.route("/static/<path:name>")
+def static_file(name):
+    asset = static_assets.lookup(name)
+    if asset is None:
+        return jsonify({"error": "Not found"}), 404
+    return asset_response(asset, assets.IMMUTABLE)
+
+
+_local_ip_cache = {"ip": None, "timestamp": 0.0}
+
+
+def local_ip() -> str:
+    """Return this host's first IP address, shown in the status bar.
+
+    Cached for ``DEVICE_CACHE_TTL`` seconds like the discovery result.
+    """
+    now = time.time()
+    if _local_ip_cache["ip"] and now - _local_ip_cache["timestamp"] < DEVICE_CACHE_TTL:
+        return _local_ip_cache["ip"]
+    ip_output = subprocess.getoutput("hostname -I").split()
+    ip = ip_output[0] if ip_output else "unknown"
+    _local_ip_cache.update({"ip": ip, "timestamp": now})
+    return ip
+
+
+DISCONNECTED = {"connected": False, "device_id": None, "device_ip": None, "tuner_count": None}
 
 
 @app.route("/api/status")
 def api_status():
     """
-    Returns device status: connected, device_id, device_ip, tuner_count.
+    Returns device status: connected, device_id, device_ip, tuner_count,
+    channelmap and the plan's first and last channel as ``channels``.
+    Optional ?device=<id>; defaults to the first device found.
     """
-    device_id, _ = discover_device()
-    if not device_id:
-        return (
-            jsonify(
-                {"connected": False, "device_id": None, "device_ip": None, "tuner_count": None}
-            ),
-            503,
-        )
+    requested = request.args.get("device")
+    device, client = find_device(requested)
+    if device is None:
+        return jsonify(DISCONNECTED), 404 if requested else 503
 
     # Verify the device is reachable by querying sys/version
     try:
-        subprocess.check_output(
-            ["hdhomerun_config", device_id, "get", "/sys/version"], stderr=subprocess.DEVNULL
-        )
-        # Fetch local IP to display
-        ip_output = subprocess.getoutput("hostname -I").split()
-        device_ip = ip_output[0] if ip_output else "unknown"
-        # Assume 4 tuners (adjust if necessary)
-        tuner_count = 4
-        return jsonify(
-            {
-                "connected": True,
-                "device_id": device_id,
-                "device_ip": device_ip,
-                "tuner_count": tuner_count,
-            }
-        )
-    except subprocess.CalledProcessError:
-        return (
-            jsonify(
-                {"connected": False, "device_id": None, "device_ip": None, "tuner_count": None}
-            ),
-            503,
-        )
+        client.get("/sys/version")
+    except DeviceError:
+        return jsonify(DISCONNECTED), 503
+    return jsonify(
+        {
+            "connected": True,
+            "device_id": device.id,
+            "device_ip": local_ip(),
+            "tuner_count": device.tuner_count,
+            **plan_summary(device_plan(device, client)),
+        }
+    )
 
 
-@app.route("/api/tuners")
-def api_tuners():
-    """
-    Returns a list of 4 tuner-status objects.
-    Each object: { index, locked, lock, channel, ss, snq, seq }.
+@app.route("/api/devices")
+def api_devices():
+    """List every known device: { devices: [ { device_id, device_ip, tuner_count, last_seen } ] }."""
+    return jsonify({"devices": [d.as_dict() for d in registry.devices()]})
+
+
+@perf.timed("parse")
+def parse_tuner_status(
+    idx: int, status_line: str, plan: channel_plans.ChannelPlan | None = None
+) -> dict:
+    """Convert a raw ``/tunerN/status`` line into a tuner-status object.
+
+    ``ch`` is mapped to a physical channel with ``plan`` (default: the
+    default channelmap).
     """
-    device_id, _ = discover_device()
-    if not device_id:
-        return jsonify([]), 503
+    fields = parse_status(status_line)
 
-    tuners = []
-    for idx in range(4):
-        # Fetch raw status line
-        status_line = subprocess.getoutput(
-            f"hdhomerun_config {device_id} get /tuner{idx}/status"
-        ).strip()
-        parts = status_line.split()
-
-        lockkey = "none"
-        ss = snq = seq = 0
-        raw_ch_value = None
-
-        for part in parts:
-            if part.startswith("lock="):
-                lockkey = part.split("=", 1)[1]
-            elif part.startswith("ss="):
-                try:
-                    ss = int(part.split("=", 1)[1])
-                except ValueError:
-                    ss = 0
-            elif part.startswith("snq="):
+    lockkey = fields.get("lock", "none")
+
+    try:
+        ss = int(fields.get("ss", 0))
+    except ValueError:
+        ss = 0
+    try:
+        snq = int(fields.get("snq", 0))
+    except ValueError:
+        snq = 0
+    try:
+        seq = int(fields.get("seq", 0))
+    except ValueError:
+        seq = 0
+
+    locked = lockkey.lower() != "none"
+
+    # ch = "8vsb:10" or "8vsb:485000000" or "none"
+    channel = channel_plans.status_channel(
+        fields.get("ch"), plan or channel_plans.get_plan(None)
+    )
+
+    return {
+        "index": idx,
+        "locked": locked,
+        "lock": lockkey,
+        "channel": channel,
+        "ss": ss,
+        "snq": snq,
+        "seq": seq,
+    }
+
+
+@perf.timed("parse")
+def parse_debug_bps(raw: str) -> tuple[int | None, int | None]:
+    """Return (ts_bps, dev_bps) from ``/tuner/debug`` output."""
+    ts_bps = dev_bps = None
+    for line in raw.strip().splitlines():
+        line = line.strip()
+        if line.startswith("ts:"):
+            m = re.search(r"bps=(\d+)", line)
+            if m:
                 try:
-                    snq = int(part.split("=", 1)[1])
+                    ts_bps = int(m.group(1))
                 except ValueError:
-                    snq = 0
-            elif part.startswith("seq="):
+                    ts_bps = None
+        elif line.startswith("dev:"):
+            m = re.search(r"bps=(\d+)", line)
+            if m:
                 try:
-                    seq = int(part.split("=", 1)[1])
+                    dev_bps = int(m.group(1))
                 except ValueError:
-                    seq = 0
-            elif part.startswith("ch="):
-                # part = "ch=8vsb:10" or "ch=8vsb:485000000" or "ch=none"
-                raw = part.split("=", 1)[1]
-                if raw != "none":
-                    try:
-                        raw_ch_value = raw.split(":", 1)[1]
-                    except IndexError:
-                        raw_ch_value = None
-
-        locked = lockkey.lower() != "none"
-
-        # Determine physical channel
-        channel = None
-        if raw_ch_value:
-            val_str = raw_ch_value.strip()
-            if val_str.isdigit():
-                if len(val_str) <= 2:
-                    try:
-                        channel = int(val_str)
-                    except ValueError:
-                        channel = None
-                else:
-                    try:
-                        freq = int(val_str)
-                        channel = FREQ_TO_CHANNEL.get(freq)
-                    except ValueError:
-                        channel = None
+                    dev_bps = None
+    return ts_bps, dev_bps
 
-        tuners.append(
-            {
-                "index": idx,
-                "locked": locked,
-                "lock": lockkey,
-                "channel": channel,
-                "ss": ss,
-                "snq": snq,
-                "seq": seq,
-            }
+
+def collect_device_status(device) -> dict[tuple[str, int], dict | None]:
+    """Read the status of every tuner on one device.
+
+    All tuners are read in one batch, then the ``/tunerN/debug`` bitrates of
+    the locked ones in a second, reported as ``bitrate`` (ts) and
+    ``max_bitrate`` (dev). Until the device's channelmap is known it is read
+    in the first batch too.
+    """
+    count = device.tuner_count or 0
+    if not count:
+        return {}
+    ops = [{"op": "get", "name": f"/tuner{idx}/status"} for idx in range(count)]
+    if device.channelmap is None:
+        ops.append({"op": "get", "name": "/tuner0/channelmap"})
+    results = device_batch(device, ops)
+    if device.channelmap is None and "value" in results[count]:
+        device.channelmap = channel_plans.parse_channelmap(results[count]["value"])
+    plan = channel_plans.get_plan(device.channelmap)
+    tuners = {}
+    for idx, result in enumerate(results[:count]):
+        if "error" in result:
+            tuners[(device.id, idx)] = None
+            continue
+        status = parse_tuner_status(idx, result["value"].strip(), plan)
+        status["device"] = device.id
+        status["bitrate"] = status["max_bitrate"] = None
+        tuners[(device.id, idx)] = status
+
+    locked = [key for key, t in tuners.items() if t is not None and t["locked"]]
+    if locked:
+        debug = device_batch(
+            device, [{"op": "get", "name": f"/tuner{idx}/debug"} for _, idx in locked]
         )
+        for key, result in zip(locked, debug):
+            if "error" not in result:
+                tuners[key]["bitrate"], tuners[key]["max_bitrate"] = parse_debug_bps(
+                    result["value"]
+                )
+    return tuners
+
+
+def collect_tuner_status() -> dict[tuple[str, int], dict | None] | None:
+    """Read every tuner of every device.
+
+    Devices are read concurrently. Returns ``None`` when no device is
+    available.
+    """
+    devices = registry.devices()
+    if not devices:
+        return None
+    tuners = {}
+    for result in _sample_pool.map(collect_device_status, devices):
+        tuners.update(result)
+    return tuners
+
+
+def collect_shared_tuner_status() -> dict[tuple[str, int], dict | None] | None:
+    """Sample the tuners in one worker and share the result with the others.
+
+    Used by the background sampler. The worker holding the shared "sampler"
+    lock reads the devices and stores the sample; the others take the stored
+    sample and return ``None`` until a newer one appears (once they have a
+    snapshot). A worker that finds no sample at all reads the devices itself.
+    """
+    if shared.acquire("sampler", WORKER_ID, SAMPLE_LEADER_TTL):
+        tuners = collect_tuner_status()
+        if tuners is not None:
+            shared.put(
+                "tuners",
+                "sample",
+                {"at": time.time(), "tuners": [[d, i, t] for (d, i), t in tuners.items()]},
+                ttl=TUNER_STALE_AFTER,
+            )
+        return tuners
+    sample = shared.get("tuners", "sample")
+    if sample is None:
+        return collect_tuner_status()
+    if sample["at"] <= _shared_sample["at"] and tuner_sampler.snapshot()[0]:
+        return None
+    _shared_sample["at"] = sample["at"]
+    return {(d, i): t for d, i, t in sample["tuners"]}
+
+
+_shared_sample = {"at": 0.0}  # the last shared sample this worker took
+
+
+def handle_sample(timestamp: float, changes: list[dict]) -> None:
+    """Record each sample's locked tuners and push deltas to stream clients."""
+    _, tuners = tuner_sampler.snapshot()
+    for t in tuners:
+        if t["locked"] and t["sampled_at"] == timestamp:
+            history.record(
+                (t["device"], t["index"]), timestamp, t["ss"], t["snq"], t["seq"], t["bitrate"]
+            )
+    events.publish("tuners", {"timestamp": timestamp, "changes": changes})
+
+
+tuner_sampler = TunerSampler(
+    collect_shared_tuner_status,
+    interval=SAMPLE_INTERVAL,
+    stale_after=TUNER_STALE_AFTER,
+    on_sample=handle_sample,
+    key_fields=("device", "index"),
+)
+
+
+def tuner_snapshot() -> tuple[float, list[dict]]:
+    """Start the sampler if needed and return its latest snapshot."""
+    tuner_sampler.start()
+    timestamp, tuners = tuner_sampler.snapshot()
+    if not timestamp:
+        # First request in this process: sample inline rather than wait.
+        tuner_sampler.sample()
+        timestamp, tuners = tuner_sampler.snapshot()
+    return timestamp, tuners
+
+
+def device_tuners(tuners: list[dict], device_id: str) -> list[dict]:
+    return [t for t in tuners if t["device"] == device_id]
+
+
+@app.route("/api/tuners")
+def api_tuners():
+    """
+    Returns the tuner-status objects of one device from the shared sampler.
+    Each object: { device, index, locked, lock, channel, ss, snq, seq, sampled_at, stale }.
+    Optional ?device=<id>; defaults to the first device found.
+    The snapshot time is also sent in the ``X-Sample-Time`` header.
+    """
+    requested = request.args.get("device")
+    device = registry.get(requested)
+    if device is None:
+        return jsonify([]), 404 if requested else 503
+    timestamp, tuners = tuner_snapshot()
+    tuners = device_tuners(tuners, device.id)
+    if not tuners:
+        return jsonify([]), 503
+
+    resp = jsonify(tuners)
+    resp.headers["X-Sample-Time"] = f"{timestamp:.3f}"
+    return resp
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus exposition of every device and tuner from the sampler snapshot.
+
+    Scrapes read cached state only; they never issue device commands.
+    """
+    tuner_sampler.start()
+    timestamp, tuners = tuner_sampler.snapshot()
+    body = metrics.render(registry.devices(), timestamp, tuners)
+    return Response(body, content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/api/debug/perf", methods=["GET", "DELETE"])
+def api_debug_perf():
+    """Per-command counters and p50/p95/p99 latency (ms), slowest total first.
+
+    Optional ?kind=device|parse|wait filter. ``DELETE`` resets the counters.
+    """
+    if request.method == "DELETE":
+        perf.reset()
+    return jsonify(perf.summary(request.args.get("kind")))
+
+
+@app.route("/api/history")
+def api_history():
+    """Return recorded signal samples for a tuner.
+
+    Query: ?tuner=<index>&device=<id>&from=<epoch s>&to=<epoch s>&step=<seconds>.
+    ``from`` defaults to one hour before ``to`` (default now); without
+    ``step`` at most ~1000 points are returned. Points are
+    [time, ss, snq, seq, bitrate] averaged over each step; only samples
+    taken while the tuner was locked are recorded.
+    """
+    tuner = request.args.get("tuner", type=int)
+    if tuner is None:
+        return jsonify({"error": "tuner is required"}), 400
+    end = request.args.get("to", default=time.time(), type=float)
+    start = request.args.get("from", default=end - 3600, type=float)
+    step = request.args.get("step", type=float)
+    if not all(math.isfinite(v) for v in (start, end, step or 0.0)):
+        return jsonify({"error": "from, to and step must be finite numbers"}), 400
+    if start > end:
+        return jsonify({"error": "from must not be after to"}), 400
+    requested = request.args.get("device")
+    device = registry.get(requested)
+    if device is None:
+        return jsonify({"error": "Unknown device"}), 404 if requested else 503
+
+    result = history.query((device.id, tuner), start, end, step)
+    result.update({"device": device.id, "tuner": tuner, "from": start, "to": end})
+    return jsonify(result)
+
+
+@app.route("/api/stream")
+def api_stream():
+    """Server-Sent Events stream of tuner deltas and scan progress.
+
+    The first ``tuners`` event carries the full snapshot (``changes`` holds
+    every field of every tuner of every device); later ones carry only the
+    fields that changed since the previous sample, plus ``device`` and
+    ``index`` to identify the tuner. ``scan`` events carry
+    ``{scan_id, index, group}`` as physical channels are found and
+    ``{scan_id, finished: true}`` when a scan ends.
+    """
+    tuner_sampler.start()
+    relay.start()
+    sub = events.subscribe()
+    timestamp, tuners = tuner_sampler.snapshot()
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            yield format_sse("tuners", {"timestamp": timestamp, "changes": tuners})
+            while not sub.closed:
+                item = sub.get(timeout=STREAM_KEEPALIVE)
+                if item is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_sse(*item)
+        finally:
+            sub.close()
 
-    return jsonify(tuners)
+    resp = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
 
 @app.route("/api/scan/start", methods=["POST"])
 def api_scan_start():
-    """Start a channel scan asynchronously."""
+    """Start a channel scan asynchronously.
+
+    Expects JSON { "device": <id>, "tuner": <index>,
+    "mode": "sequential" | "parallel" | "incremental" }.
+    The parallel mode splits the channel plan across every free tuner and
+    reports per-tuner progress in /api/scan/status. The incremental mode
+    does the same for only the channels worth re-probing (see
+    SCAN_SAMPLE_EVERY) and reports the rest as ``cached``; without a previous
+    scan for the device and channelmap it runs a full parallel scan.
+    Returns { scan_id, mode } with the mode actually used.
+    """
     data = request.json or {}
-    tuner_index = int(data.get("tuner", 0))
+    tuner_index = int(data.get("tuner") or 0)
+    mode = data.get("mode", "sequential")
 
-    device_id, _ = discover_device()
-    if not device_id:
-        return jsonify({"error": "No device found"}), 503
+    device, client = find_device(data.get("device"))
+    if device is None:
+        return jsonify({"error": "No device found"}), 404 if data.get("device") else 503
+    device_id = device.id
+    plan = device_plan(device, client)
 
+    evict_scans()
     scan_id = str(uuid.uuid4())
-    scans[scan_id] = {"finished": False, "results": []}
-    thread = threading.Thread(target=run_scan, args=(scan_id, device_id, tuner_index))
+    previous = scan_store.latest(device_id, plan.name) if mode == "incremental" else None
+    if mode == "incremental" and previous is None:
+        mode = "parallel"
+    if mode in ("parallel", "incremental"):
+        leases = scan_leases(device)
+        if not leases:
+            return jsonify({"error": "No free tuner"}), 409
+        tuners = sorted(lease.tuner for lease in leases)
+        channels = plan.channels
+        if previous is not None:
+            channels = incremental_channels(
+                plan.channels,
+                previous["results"],
+                SCAN_SAMPLE_EVERY,
+                random.randrange(max(SCAN_SAMPLE_EVERY, 1)),
+            )
+        scans[scan_id] = {
+            "finished": False,
+            "results": [],
+            "current": None,
+            "progress": {str(t): {"done": 0, "channel": None} for t in tuners},
+            "total": len(channels),
+        }
+        if previous is not None:
+            probed = set(channels)
+            scans[scan_id]["previous"] = previous["id"]
+            scans[scan_id]["refreshed"] = channels
+            scans[scan_id]["cached"] = [c for c in plan.channels if c not in probed]
+        target, args = run_parallel_scan, (scan_id, client, leases, channels, mode)
+    else:
+        if tuner_index in allocator.leased(device_id):
+            return jsonify({"error": "Tuner is leased"}), 409
+        scans[scan_id] = {"finished": False, "results": [], "current": None}
+        target, args = run_scan, (scan_id, device_id, tuner_index, plan)
+    scan_store.start(
+        scan_id,
+        device_id,
+        None if mode in ("parallel", "incremental") else tuner_index,
+        mode,
+        plan.name,
+    )
+
+    share_scan(scan_id, force=True)
+
+    thread = threading.Thread(target=target, args=args)
     thread.daemon = True
     thread.start()
-    return jsonify({"scan_id": scan_id})
+    return jsonify({"scan_id": scan_id, "mode": mode})
 
 
 @app.route("/api/scan/status/<scan_id>")
 def api_scan_status(scan_id):
-    """Return progress for a running scan."""
+    """Return progress for a running scan.
+
+    Scans started by another worker process are read from the shared state;
+    scans no longer held there are read back from the scan store.
+    """
+    evict_scans()
     data = scans.get(scan_id)
-    if not data:
+    if data:
+        return jsonify(scan_status(data))
+    resp = shared.get("scan", scan_id)
+    if resp is not None:
+        return jsonify(resp)
+    stored = scan_store.get(scan_id)
+    if stored is None:
+        return jsonify({"error": "Invalid scan id"}), 404
+    return jsonify({"finished": stored["finished"] is not None, "results": stored["results"]})
+
+
+@app.route("/api/scans")
+def api_scans():
+    """List stored scans, newest first. Optional ?device=&tuner=&limit= filters."""
+    tuner = request.args.get("tuner", type=int)
+    limit = request.args.get("limit", default=50, type=int)
+    return jsonify(
+        {"scans": scan_store.history(request.args.get("device"), tuner, max(1, min(limit, 500)))}
+    )
+
+
+@app.route("/api/scan/diff")
+def api_scan_diff():
+    """Compare two stored scans: ?from=<scan_id>&to=<scan_id>.
+
+    Returns { gained: [group…], lost: [group…], changed: [ { physical,
+    ss_delta, snq_delta, subchannels_added, subchannels_removed } … ] }.
+    """
+    old = scan_store.get(request.args.get("from", ""))
+    new = scan_store.get(request.args.get("to", ""))
+    if old is None or new is None:
         return jsonify({"error": "Invalid scan id"}), 404
-    return jsonify({"finished": data["finished"], "results": data["results"]})
+    result = diff_scans(old["results"], new["results"])
+    result.update({"from": old["id"], "to": new["id"]})
+    return jsonify(result)
+
+
+def lineup_scans(devices) -> list[tuple]:
+    """``[(device, scan row), ...]`` for each device's latest finished scan."""
+    latest_scans = []
+    for device in sorted(devices, key=lambda d: d.id):
+        plan = device_plan(device, device_client(device.id, device.ip))
+        scan = scan_store.latest(device.id, plan.name, results=False)
+        if scan is not None:
+            latest_scans.append((device, scan))
+    return latest_scans
+
+
+@app.route("/api/lineup.<fmt>")
+def api_lineup(fmt):
+    """
+    Export the subchannels of each device's latest finished scan as an M3U
+    playlist (lineup.m3u), an XMLTV channel list (lineup.xml) or a JSON array
+    (lineup.json), streamed. Optional ?device=<id> limits it to one device;
+    stream URLs point at /api/relay, or with ?stream=device at the device's
+    own HTTP port. Carries an ETag and Last-Modified and answers 304 until a
+    newer scan finishes.
+    """
+    if fmt not in lineup.WRITERS:
+        return jsonify({"error": "Unknown lineup format"}), 404
+    stream = request.args.get("stream", "relay")
+    if stream not in ("relay", "device"):
+        return jsonify({"error": "Invalid stream"}), 400
+    requested = request.args.get("device")
+    if requested:
+        device = registry.get(requested)
+        if device is None:
+            return jsonify({"error": "Unknown device"}), 404
+        devices = [device]
+    else:
+        devices = registry.devices()
+    latest_scans = lineup_scans(devices)
+
+    base = request.url_root
+    version = [
+        fmt,
+        stream,
+        base,
+        [(d.id, d.ip, scan["id"], scan["finished"]) for d, scan in latest_scans],
+    ]
+    etag = hashlib.sha256(json.dumps(version).encode()).hexdigest()[:16]
+    finished = max((scan["finished"] for _, scan in latest_scans), default=None)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        fresh = finished is not None and since is not None and int(finished) <= since.timestamp()
+
+    hosts = {d.id: (d.ip or "").partition(":")[0] for d, _ in latest_scans}
+
+    def stream_url(device_id: str, physical: int, sub: dict) -> str:
+        if stream == "device":
+            return f"http://{hosts[device_id]}:{HDHOMERUN_HTTP_PORT}/auto/v{sub['num']}"
+        params = {"device": device_id, "channel": physical}
+        if sub.get("id") is not None:
+            params["program"] = sub["id"]
+        return f"{base}api/relay?{urlencode(params)}"
+
+    if fresh:
+        resp = Response(status=304)
+    else:
+        items = lineup.entries(
+            ((d.id, scan_store.iter_channels(scan["id"])) for d, scan in latest_scans),
+            stream_url,
+        )
+        if fmt == "m3u":
+            guide = f"{base}api/lineup.xml"
+            if requested:
+                guide += f"?{urlencode({'device': requested})}"
+            parts = lineup.m3u(items, guide)
+        else:
+            parts = lineup.WRITERS[fmt](items)
+        resp = Response(lineup.chunked(parts), content_type=lineup.CONTENT_TYPES[fmt])
+    resp.set_etag(etag)
+    if finished is not None:
+        resp.last_modified = finished
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 
 @app.route("/api/scan", methods=["POST"])
 def scan_channels():
     """
     Perform a channel scan on a given tuner index.
-    Expects JSON { "tuner": <index> }.
-    Returns JSON { "results": [ { physical, lock, ss, snq, subchannels: [ { num, name }, … ] }, … ] }.
+    Expects JSON { "device": <id>, "tuner": <index> }.
+    Returns JSON { "results": [ { physical, lock, ss, snq, subchannels: [ { num, name, id }, … ] }, … ] }.
     """
     data = request.json or {}
     tuner_index = int(data.get("tuner", 0))
 
-    device_id, _ = discover_device()
-    if not device_id:
-        return jsonify({"status": "error", "message": "No device found"}), 503
+    device, client = find_device(data.get("device"))
+    if device is None:
+        return (
+            jsonify({"status": "error", "message": "No device found"}),
+            404 if data.get("device") else 503,
+        )
+    if tuner_index in allocator.leased(device.id):
+        return jsonify({"status": "error", "message": "Tuner is leased"}), 409
+    plan = device_plan(device, client)
 
-    cmd = ["hdhomerun_config", device_id, "scan", f"/tuner{tuner_index}"]
+    cmd = ["hdhomerun_config", device.id, "scan", f"/tuner{tuner_index}"]
+    started = time.monotonic()
     try:
         proc = subprocess.run(
             cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
         )
         lines = proc.stdout.splitlines()
+        metrics.scan_duration_seconds.observe(time.monotonic() - started, "sync")
     except subprocess.CalledProcessError as e:
         # Include scan log in error message
         return jsonify({"status": "error", "message": f"Scan failed: {e.stdout.strip()}"}), 500
 
-    results: list[dict] = []
-    current_group = None
-    capturing = False
-
+    parser = ScanParser(plan.by_frequency)
     for raw in lines:
-        line = raw.strip()
+        parser.feed(raw)
+    parser.finish()
+    results = parser.results
 
-        if line.startswith("SCANNING:"):
-            if current_group is not None and (
-                current_group.get("lock") is not None or current_group.get("subchannels")
-            ):
-                results.append(current_group)
-            capturing = False
+    return jsonify({"status": "success", "results": results})
 
-            parts = line.split()
-            freq = None
-            try:
-                freq = int(parts[1])
-            except (IndexError, ValueError):
-                pass
-
-            m = re.search(r"\((?:us-bcast:)?(\d+)\)", line)
-            phys = int(m.group(1)) if m else None
-            if phys is None and freq is not None:
-                phys = FREQ_TO_CHANNEL.get(freq)
-
-            current_group = {
-                "physical": phys,
-                "lock": None,
-                "ss": 0,
-                "snq": 0,
-                "subchannels": [],
-            }
-
-        elif line.startswith("LOCK:") and current_group is not None:
-            # Example: "LOCK: qam256 (ss=80 snq=90 seq=100)" or "LOCK: none (ss=0 snq=0 seq=0)"
-            m = re.search(r"LOCK:\s+(\S+)(?:\s+\(ss=(\d+)\s+snq=(\d+)\s+seq=(\d+)\))?", line)
-            if m:
-                lock_val, ss_val, snq_val, _ = m.groups()
-                current_group["lock"] = lock_val if lock_val.lower() != "none" else None
-                capturing = lock_val.lower() != "none"
-                if ss_val is not None:
-                    try:
-                        current_group["ss"] = int(ss_val)
-                    except ValueError:
-                        current_group["ss"] = 0
-                if snq_val is not None:
-                    try:
-                        current_group["snq"] = int(snq_val)
-                    except ValueError:
-                        current_group["snq"] = 0
-
-        elif line.startswith("PROGRAM") and capturing and current_group is not None:
-            after_colon = line.split(":", 1)[1].strip()
-            for m in re.finditer(r"(\d+\.\d+)\s+(.+?)(?=\s+\d+\.\d+|$)", after_colon):
-                num = m.group(1).strip()
-                name = m.group(2).strip()
-                current_group["subchannels"].append({"num": num, "name": name})
-
-    if current_group is not None and (
-        current_group.get("lock") is not None or current_group.get("subchannels")
-    ):
-        results.append(current_group)
 
-    return jsonify({"status": "success", "results": results})
+def run_tune(client, tuner: int, channel, deadline: float, lockkey: int | None = None) -> dict:
+    """Tune ``channel`` and wait for lock and PSIP.
+
+    The channel is set with auto-detected modulation, then lock state and
+    streaminfo are polled with backoff until the programs are known. A tuner
+    held by another client's lockkey is left alone and reported as an error.
+    """
+    try:
+        return tune(client, tuner, channel, deadline=deadline, lockkey=lockkey)
+    except DeviceError as exc:
+        return tune_failure(exc)
+
+
+def tune_response(result: dict, tuner: int, lease) -> dict:
+    result = dict(result, tuner=tuner)
+    if lease is not None:
+        result["lease"] = lease.as_dict()
+    return result
+
+
+def tune_failure(exc: DeviceError) -> dict:
+    """Return the tune result reported when the device rejects a command."""
+    return {
+        "subchannels": [],
+        "locked": False,
+        "time_to_lock": None,
+        "time_to_psip": None,
+        "error": str(exc),
+    }
+
+
+def tune_deadline(value) -> float:
+    """Return the requested tune deadline, clamped to TUNE_DEADLINE_MAX."""
+    try:
+        return min(float(value if value is not None else TUNE_DEADLINE), TUNE_DEADLINE_MAX)
+    except (TypeError, ValueError):
+        return TUNE_DEADLINE
+
+
+def create_tune_job(device_id: str, tuner: int, channel) -> str:
+    """Register a new asynchronous tune job and return its id."""
+    cutoff = time.time() - TUNE_JOB_TTL
+    for job_id, job in list(tune_jobs.items()):
+        if job["finished"] and job["finished_at"] < cutoff:
+            tune_jobs.pop(job_id, None)
+
+    job_id = str(uuid.uuid4())
+    job = tune_jobs[job_id] = {
+        "finished": False,
+        "device": device_id,
+        "tuner": tuner,
+        "channel": channel,
+    }
+    share_tune_job(job_id, TUNE_JOB_TTL + TUNE_DEADLINE_MAX)
+    return job_id
+
+
+def share_tune_job(job_id: str, ttl: float) -> None:
+    """Copy a tune job to the shared state so any worker can answer polls for it."""
+    try:
+        shared.put("tune_job", job_id, tune_jobs[job_id], ttl=ttl)
+    except sqlite3.Error as exc:  # this worker still answers for it; the event goes out regardless
+        app.logger.warning("sharing tune job %s failed: %s", job_id, exc)
+
+
+def finish_tune_job(job_id: str, result: dict) -> None:
+    """Store a tune job's result and push it as a ``tune`` event."""
+    job = tune_jobs[job_id]
+    job.update(result, finished=True, finished_at=time.time())
+    share_tune_job(job_id, TUNE_JOB_TTL)
+    publish_shared("tune", {"job_id": job_id, **job})
+
+
+def run_tune_job(job_id: str, client, tuner: int, channel, deadline: float, lease=None) -> None:
+    """Background thread for an asynchronous tune request."""
+    lockkey = lease.lockkey if lease is not None else None
+    finish_tune_job(
+        job_id, tune_response(run_tune(client, tuner, channel, deadline, lockkey), tuner, lease)
+    )
 
 
 @app.route("/api/tune", methods=["POST"])
 def api_tune():
     """
-    Tune a specified tuner to a physical channel and return its subchannels.
-    Expects JSON { "tuner": <index>, "channel": <int> }.
-    Returns { "subchannels": [ { num, name }, … ] }.
+    Tune a tuner to a physical channel and return its subchannels.
+    Expects JSON { "device": <id>, "channel": <int>, "deadline": <s>, "async": <bool> }
+    plus one of "lease": <lease id>, "tuner": <index>, or neither to lease the
+    least disruptive free tuner (optional "ttl", and "wait" seconds to queue).
+    ``device`` defaults to the first device found. A tuner leased by someone
+    else answers 409. Returns { "tuner", "subchannels": [ { id, num, name }, … ],
+    "locked", "time_to_lock", "time_to_psip", "lease" } with times in seconds;
+    ``lease`` is present when the tune ran under one.
+
+    With ``async`` the tune runs in the background: the response is
+    202 { "job_id" }, the result is pushed as a ``tune`` event on
+    /api/stream and can also be read from /api/tune/<job_id>.
     """
     data = request.json or {}
-    tuner = data.get("tuner")
     channel = data.get("channel")
 
-    device_id, _ = discover_device()
-    if not device_id or tuner is None or channel is None:
+    device, client = find_device(data.get("device"))
+    if device is None:
+        return jsonify({"subchannels": []}), 404 if data.get("device") else 503
+    if channel is None:
         return jsonify({"subchannels": []}), 400
+    try:
+        tuner, lease = tune_target(device, data)
+    except LeaseError as exc:
+        return jsonify({"subchannels": [], "error": str(exc)}), exc.status
+    program_changed(device, tuner)
+
+    deadline = tune_deadline(data.get("deadline"))
+    if not data.get("async"):
+        lockkey = lease.lockkey if lease is not None else None
+        result = run_tune(client, tuner, channel, deadline, lockkey)
+        return jsonify(tune_response(result, tuner, lease))
+
+    job_id = create_tune_job(device.id, tuner, channel)
+    thread = threading.Thread(
+        target=run_tune_job, args=(job_id, client, tuner, channel, deadline, lease)
+    )
+    thread.daemon = True
+    thread.start()
+    return jsonify({"job_id": job_id}), 202
+
 
-    # 1) Clear lock
-    subprocess.getoutput(f"hdhomerun_config {device_id} set /tuner{tuner}/lockkey none")
-    time.sleep(0.1)
+@app.route("/api/tune/<job_id>")
+def api_tune_job(job_id):
+    """Return the state of an asynchronous tune job (started by any worker)."""
+    job = tune_jobs.get(job_id) or shared.get("tune_job", job_id)
+    if job is None:
+        return jsonify({"error": "Invalid job id"}), 404
+    return jsonify({"job_id": job_id, **job})
 
-    # 2) Set channel using auto-detected modulation
-    subprocess.getoutput(
-        f"hdhomerun_config {device_id} set /tuner{tuner}/channel auto:{channel}"
+
+PROGRAM_SETTLE = 0.2  # seconds between selecting a program and reading its bitrate
+
+
+@perf.timed("parse")
+def parse_streaminfo_bps(raw: str, pid: int) -> tuple[int | None, int | None]:
+    """Return (bps, peakbps) for a program from streaminfo output."""
+
+    bps = peak = None
+    for line in raw.strip().splitlines():
+        parts = line.split()
+        if not parts or not parts[0].endswith(":"):
+            continue
+        try:
+            prog_id = int(parts[0].rstrip(":"))
+        except ValueError:
+            continue
+
+        if prog_id != pid:
+            continue
+
+        for part in parts[1:]:
+            if part.startswith("bps="):
+                try:
+                    bps = int(part.split("=", 1)[1])
+                except ValueError:
+                    bps = None
+            elif part.startswith("peakbps="):
+                try:
+                    peak = int(part.split("=", 1)[1])
+                except ValueError:
+                    peak = None
+        break
+    return bps, peak
+
+
+def program_bitrates(debug_raw: str, streaminfo_raw: str, program_id: int) -> dict:
+    """Return ``{bitrate, max_bitrate}`` preferring ``/tuner/debug`` values."""
+    debug_ts_bitrate, debug_dev_bitrate = parse_debug_bps(debug_raw)
+    stream_bitrate, stream_peak = parse_streaminfo_bps(streaminfo_raw, program_id)
+
+    bitrate = debug_ts_bitrate if debug_ts_bitrate is not None else stream_bitrate
+    max_bitrate = (
+        debug_dev_bitrate if debug_dev_bitrate is not None else stream_peak
     )
-    time.sleep(1)  # allow PSIP to populate
-
-    # 3) Fetch streaminfo for subchannels. PSIP data may take a moment to
-    # populate, so retry a few times before returning.
-    subchannels = []
-    for _ in range(12):  # up to ~6s total
-        streaminfo_raw = subprocess.getoutput(
-            f"hdhomerun_config {device_id} get /tuner{tuner}/streaminfo"
-        )
-        for line in streaminfo_raw.strip().splitlines():
-            parts = line.split()
-            if not parts or not parts[0].endswith(":"):
-                continue
-            # Example line: "3: 8.2 WAGMFOX bps=1234567 peakbps=2345678"
-            try:
-                prog_id = int(parts[0].rstrip(":"))
-            except ValueError:
-                continue
+    return {"bitrate": bitrate or 0, "max_bitrate": max_bitrate or 0}
+
+
+def read_tuner(device, client, tuner: int, item: str) -> tuple[str, bool]:
+    """Read ``/tuner<N>/<item>`` through ``tuner_reads``; returns ``(value, shared)``."""
+    return tuner_reads.do((device.id, tuner, item), lambda: device_get(client, f"/tuner{tuner}/{item}"))
 
-            if len(parts) < 2 or "." not in parts[1]:
-                continue
-            vchannel = parts[1]
 
-            name_tokens = []
-            idx = 2
-            while idx < len(parts) and "=" not in parts[idx]:
-                name_tokens.append(parts[idx])
-                idx += 1
-            name = " ".join(name_tokens)
+def program_changed(device, tuner: int, program_id: int | None = None) -> None:
+    """Drop cached reads that depend on the tuner's program, noting the new one if known."""
+    tuner_reads.forget(*((device.id, tuner, item) for item in ("program", "debug", "streaminfo")))
+    if program_id is not None:
+        tuner_reads.put((device.id, tuner, "program"), str(program_id))
 
-            if vchannel and name:
-                subchannels.append({"id": prog_id, "num": vchannel, "name": name})
 
-        if subchannels:
-            break
-        time.sleep(0.5)
+def read_program_info(device, client, tuner: int, program_id: int, lockkey: int | None) -> dict:
+    """Select ``program_id`` unless the tuner is already on it, then read its bitrates.
 
-    return jsonify({"subchannels": subchannels})
+    Raises :class:`DeviceError` when the program cannot be selected.
+    """
+    with _program_locks.setdefault((device.id, tuner), threading.Lock()):
+        current, _ = read_tuner(device, client, tuner, "program")
+        if current.strip() != str(program_id):
+            try:
+                client.set(f"/tuner{tuner}/program", program_id, lockkey=lockkey)
+            except DeviceError:
+                program_changed(device, tuner)
+                raise
+            program_changed(device, tuner, program_id)
+            with perf.span("wait", "program_settle"):
+                time.sleep(PROGRAM_SETTLE)
+        debug_raw, debug_cached = read_tuner(device, client, tuner, "debug")
+        streaminfo_raw, streaminfo_cached = read_tuner(device, client, tuner, "streaminfo")
+    info = program_bitrates(debug_raw, streaminfo_raw, program_id)
+    info["cached"] = debug_cached and streaminfo_cached
+    return info
 
 
 @app.route("/api/program_info", methods=["POST"])
@@ -514,6 +1463,10 @@ def api_program_info():
     ``streaminfo`` command. To improve accuracy we parse ``/tunerX/debug``:
     ``ts:bps`` gives the current bitrate while ``dev:bps`` represents the
     maximum possible bitrate. ``streaminfo`` is used only as a fallback.
+
+    The program is only selected when the tuner is not already on it, and
+    ``cached`` is true when the reads were shared with other requests
+    instead of going to the device (see TUNER_READ_TTL).
     """
 
     data = request.json or {}
@@ -526,114 +1479,440 @@ def api_program_info():
     except (TypeError, ValueError):
         return jsonify({"bitrate": None, "max_bitrate": None}), 400
 
-    device_id, _ = discover_device()
-    if not device_id:
-        return jsonify({"bitrate": None, "max_bitrate": None}), 503
+    device, client = find_device(data.get("device"))
+    if device is None:
+        return jsonify({"bitrate": None, "max_bitrate": None}), 404 if data.get("device") else 503
+    try:
+        lockkey = tuner_lockkey(device, tuner, data.get("lease"))
+    except LeaseError as exc:
+        return jsonify({"bitrate": None, "max_bitrate": None, "error": str(exc)}), exc.status
 
-    # Select the program on the tuner
-    subprocess.getoutput(
-        f"hdhomerun_config {device_id} set /tuner{tuner}/program {program_id}"
-    )
-    time.sleep(0.2)
+    try:
+        return jsonify(read_program_info(device, client, tuner, program_id, lockkey))
+    except DeviceError as exc:
+        return jsonify({"bitrate": None, "max_bitrate": None, "error": str(exc)}), 502
 
-    debug_raw = subprocess.getoutput(
-        f"hdhomerun_config {device_id} get /tuner{tuner}/debug"
-    )
 
-    streaminfo_raw = subprocess.getoutput(
-        f"hdhomerun_config {device_id} get /tuner{tuner}/streaminfo"
+def route_ip(host: str) -> str:
+    """Return this host's address on the route to ``host``."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect((host, HDHOMERUN_CONTROL_PORT))
+        return sock.getsockname()[0]
+
+
+def evict_captures() -> None:
+    cutoff = time.time() - ANALYZE_TTL
+    for capture_id, entry in list(captures.items()):
+        finished = entry["capture"].finished
+        if finished is not None and finished < cutoff:
+            captures.pop(capture_id, None)
+
+
+def udp_target(client, host: str, tuner: int, lockkey: int | None, port: int = 0):
+    """Point the tuner's target at a new local UDP socket; returns ``(sock, target)``."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        sock.bind(("", port))
+        target = f"udp://{route_ip(host)}:{sock.getsockname()[1]}"
+        client.set(f"/tuner{tuner}/target", target, lockkey=lockkey)
+    except (OSError, DeviceError):
+        sock.close()
+        raise
+    return sock, target
+
+
+def udp_capture(client, host: str, tuner: int, lockkey: int | None, duration: float):
+    """Point the tuner's target at a local UDP socket and return ``(capture, target)``."""
+    sock, target = udp_target(client, host, tuner, lockkey, ANALYZER_UDP_PORT)
+
+    def finish(_capture):
+        device_set(client, f"/tuner{tuner}/target", "none", lockkey)
+        sock.close()
+
+    return Capture(partial(receive_udp, sock), duration, on_finish=finish), target
+
+
+@app.route("/api/analyze", methods=["POST"])
+def api_analyze():
+    """
+    Start analyzing a tuner's transport stream in the background.
+    Expects JSON { "device": <id>, "tuner": <index>, "lease": <lease id>,
+    "source": "udp" | "http", "duration": <s> }. The udp source points the
+    tuner's target at this host; the http source streams from the device's
+    port 5004 and needs "channel" (and optionally "program"), which the
+    device tunes itself. Returns 202 { analysis_id, target }.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        tuner = int(data.get("tuner"))
+        duration = float(data.get("duration") or ANALYZE_DEFAULT_SECONDS)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid tuner or duration"}), 400
+    duration = max(1.0, min(duration, ANALYZE_MAX_SECONDS))
+    source = data.get("source", "udp")
+    if source not in ("udp", "http"):
+        return jsonify({"error": "Invalid source"}), 400
+    try:
+        channel = int(data.get("channel") or 0)
+        program = int(data.get("program") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid channel or program"}), 400
+
+    device, client = find_device(data.get("device"))
+    if device is None:
+        return jsonify({"error": "No device found"}), 404 if data.get("device") else 503
+    try:
+        lockkey = tuner_lockkey(device, tuner, data.get("lease"))
+    except LeaseError as exc:
+        return jsonify({"error": str(exc)}), exc.status
+    host = (device.ip or "").partition(":")[0]
+
+    if source == "udp":
+        try:
+            capture, target = udp_capture(client, host, tuner, lockkey, duration)
+        except (OSError, DeviceError) as exc:
+            return jsonify({"error": f"Cannot set stream target: {exc}"}), 502
+    else:
+        frequency = device_plan(device, client).frequency(channel)
+        if frequency is None:
+            return jsonify({"error": "Invalid channel"}), 400
+        target = f"http://{host}:{HDHOMERUN_HTTP_PORT}/tuner{tuner}/ch{frequency}"
+        if program:
+            target += f"-{program}"
+        capture = Capture(partial(receive_http, target), duration)
+
+    evict_captures()
+    capture_id = str(uuid.uuid4())
+    captures[capture_id] = {
+        "capture": capture,
+        "device": device.id,
+        "tuner": tuner,
+        "source": source,
+        "target": target,
+    }
+    capture.start()
+    return jsonify({"analysis_id": capture_id, "target": target}), 202
+
+
+@app.route("/api/analyze/<capture_id>", methods=["GET", "DELETE"])
+def api_analyze_status(capture_id):
+    """
+    Return a capture's live figures: totals plus per-PID packets, bitrate
+    (last second), avg_bitrate, cc_errors and, for PCR PIDs, PCR interval and
+    jitter. DELETE stops the capture early.
+    """
+    entry = captures.get(capture_id)
+    if entry is None:
+        return jsonify({"error": "Invalid analysis id"}), 404
+    capture = entry["capture"]
+    if request.method == "DELETE":
+        capture.stop()
+    info = {k: v for k, v in entry.items() if k != "capture"}
+    return jsonify({**info, **capture.status()})
+
+
+def start_relay(device, client, channel: int, program: int | None):
+    """Lease and tune a tuner, point its stream at a new relay and return ``(relay, lease)``.
+
+    Raises :class:`LeaseError` when no tuner is free or the channel has no
+    signal, and :class:`DeviceError` or :class:`OSError` when the stream
+    cannot be set up.
+    """
+    lease = allocator.acquire(device, purpose="relay")
+    if lease is None:
+        raise LeaseError("No free tuner")
+    program_changed(device, lease.tuner)
+    try:
+        result = run_tune(client, lease.tuner, channel, TUNE_DEADLINE, lease.lockkey)
+        if not result["locked"]:
+            raise LeaseError(result.get("error") or "No signal", 504)
+        if program is not None:
+            device_set(client, f"/tuner{lease.tuner}/program", program, lease.lockkey)
+            program_changed(device, lease.tuner, program)
+        sock, _ = udp_target(client, (device.ip or "").partition(":")[0], lease.tuner, lease.lockkey)
+    except BaseException:
+        allocator.release(lease.id, stop=True)
+        raise
+    key = (device.id, channel, program)
+
+    def close(relay):
+        sock.close()
+        if relays.get(key, (None,))[0] is relay:
+            relays.pop(key, None)
+        device_set(client, f"/tuner{lease.tuner}/target", "none", lease.lockkey)
+        allocator.release(lease.id, stop=True)
+
+    def keepalive():
+        if allocator.renew(lease.id) is None:
+            raise LeaseError("Lease expired or was released")
+
+    relay = StreamRelay(
+        partial(receive_udp, sock),
+        capacity=RELAY_BUFFER,
+        linger=RELAY_LINGER,
+        on_close=close,
+        keepalive=keepalive,
     )
+    relays[key] = (relay, lease)
+    relay.start()
+    return relay, lease
 
-    def parse_debug_bps(raw: str) -> tuple[int | None, int | None]:
-        """Return (ts_bps, dev_bps) from ``/tuner/debug`` output."""
-
-        ts_bps = dev_bps = None
-        for line in raw.strip().splitlines():
-            line = line.strip()
-            if line.startswith("ts:"):
-                m = re.search(r"bps=(\d+)", line)
-                if m:
-                    try:
-                        ts_bps = int(m.group(1))
-                    except ValueError:
-                        ts_bps = None
-            elif line.startswith("dev:"):
-                m = re.search(r"bps=(\d+)", line)
-                if m:
-                    try:
-                        dev_bps = int(m.group(1))
-                    except ValueError:
-                        dev_bps = None
-        return ts_bps, dev_bps
-
-    def parse_streaminfo_bps(raw: str, pid: int) -> tuple[int | None, int | None]:
-        """Return (bps, peakbps) for a program from streaminfo output."""
-
-        bps = peak = None
-        for line in raw.strip().splitlines():
-            parts = line.split()
-            if not parts or not parts[0].endswith(":"):
-                continue
-            try:
-                prog_id = int(parts[0].rstrip(":"))
-            except ValueError:
-                continue
-
-            if prog_id != pid:
-                continue
-
-            for part in parts[1:]:
-                if part.startswith("bps="):
-                    try:
-                        bps = int(part.split("=", 1)[1])
-                    except ValueError:
-                        bps = None
-                elif part.startswith("peakbps="):
-                    try:
-                        peak = int(part.split("=", 1)[1])
-                    except ValueError:
-                        peak = None
-            break
-        return bps, peak
 
-    debug_ts_bitrate, debug_dev_bitrate = parse_debug_bps(debug_raw)
-    stream_bitrate, stream_peak = parse_streaminfo_bps(streaminfo_raw, program_id)
+def relay_for(device, client, channel: int, program: int | None) -> StreamRelay:
+    """The running relay for a channel and program, started if there is none."""
+    key = (device.id, channel, program)
+    entry = relays.get(key) or relay_starts.do(
+        key, lambda: start_relay(device, client, channel, program)
+    )[0]
+    return entry[0]
 
-    # Prefer values from /tuner/debug when available.
-    bitrate = debug_ts_bitrate if debug_ts_bitrate is not None else stream_bitrate
-    max_bitrate = (
-        debug_dev_bitrate if debug_dev_bitrate is not None else stream_peak
+
+def relay_args(args) -> tuple[int, int | None]:
+    """Parse ``channel`` and optional ``program`` query arguments (ValueError if invalid)."""
+    channel = int(args.get("channel", ""))
+    program = args.get("program")
+    return channel, int(program) if program not in (None, "") else None
+
+
+@app.route("/api/relay")
+def api_relay():
+    """
+    Stream a physical channel as MPEG-TS (video/mp2t), shared by every viewer.
+    Query ?channel=<physical>&program=<id>&device=<id>; program and device are
+    optional. The first viewer leases and tunes a tuner (409 when none is
+    free, 504 without signal); later viewers join its stream.
+    """
+    try:
+        channel, program = relay_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid channel or program"}), 400
+    device, client = find_device(request.args.get("device"))
+    if device is None:
+        return jsonify({"error": "No device found"}), 404 if request.args.get("device") else 503
+    reader = None
+    try:
+        for _ in range(2):  # the relay may stop between lookup and joining
+            reader = relay_for(device, client, channel, program).open_reader()
+            if reader is not None:
+                break
+    except LeaseError as exc:
+        return jsonify({"error": str(exc)}), exc.status
+    except (OSError, DeviceError) as exc:
+        return jsonify({"error": f"Cannot start stream: {exc}"}), 502
+    if reader is None:
+        return jsonify({"error": "Relay stopped"}), 503
+
+    def generate():
+        for chunk in reader.chunks():
+            yield bytes(chunk)  # WSGI servers only accept bytes
+
+    resp = Response(generate(), mimetype="video/mp2t")
+    resp.call_on_close(reader.close)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+@app.route("/api/relays")
+def api_relays():
+    """Running relays: { relays: [ { device, channel, program, tuner, lease_id, readers, … } ] }."""
+    return jsonify(
+        {
+            "relays": [
+                {
+                    "device": device_id,
+                    "channel": channel,
+                    "program": program,
+                    "tuner": lease.tuner,
+                    "lease_id": lease.id,
+                    **relay.status(),
+                }
+                for (device_id, channel, program), (relay, lease) in list(relays.items())
+            ]
+        }
     )
 
-    if bitrate is None:
-        bitrate = 0
-    if max_bitrate is None:
-        max_bitrate = 0
 
-    return jsonify({"bitrate": bitrate, "max_bitrate": max_bitrate})
+def clear_lock_tuners(device, force: bool) -> tuple[list[int], set[int]]:
+    """Return ``(tuners to clear, leased tuners left alone)``.
+
+    With ``force`` every lease on the device is released first.
+    """
+    if force:
+        for lease in allocator.leases(device.id):
+            allocator.release(lease.id, stop=True)
+    leased = allocator.leased(device.id)
+    return [idx for idx in range(device.tuner_count or 0) if idx not in leased], leased
+
+
+def clear_lock_ops(tuners: list[int]) -> list[dict]:
+    """Batch that stops each tuner's stream and then releases its lock."""
+    ops = []
+    for idx in tuners:
+        ops.append({"op": "set", "name": f"/tuner{idx}/channel", "value": "none"})
+        ops.append({"op": "set", "name": f"/tuner{idx}/lockkey", "value": "none"})
+    return ops
+
+
+def clear_lock_results(tuners: list[int], results: list[dict], leased=()) -> list[dict]:
+    """Map a clear-lock batch's results to ``[{tuner, raw}, ...]``; leased tuners say so."""
+    entries = [
+        {"tuner": idx, "raw": r.get("value", r.get("error"))}
+        for idx, r in zip(tuners, results[1::2])
+    ]
+    entries += [{"tuner": idx, "raw": "leased"} for idx in leased]
+    return sorted(entries, key=lambda e: e["tuner"])
 
 
 @app.route("/api/clear_locks", methods=["POST"])
 def api_clear_locks():
     """
-    Force-unlock all 4 tuners by setting lockkey to none.
-    Returns each tuner’s raw response.
+    Force-unlock every tuner of a device by setting lockkey to none.
+    Optional JSON { "device": <id>, "force": <bool> }. Tuners leased through
+    /api/leases are skipped (reported as "leased") unless ``force`` is set,
+    which releases their leases first. Returns each tuner’s raw response.
+    All tuners are cleared concurrently.
     """
-    device_id, _ = discover_device()
-    if not device_id:
-        return jsonify({"results": []}), 503
+    data = request.get_json(silent=True) or {}
+    device, _ = find_device(data.get("device"))
+    if device is None:
+        return jsonify({"results": []}), 404 if data.get("device") else 503
+    tuners, leased = clear_lock_tuners(device, bool(data.get("force")))
+    results = device_batch(device, clear_lock_ops(tuners))
+    return jsonify({"results": clear_lock_results(tuners, results, leased)})
 
-    results = []
-    for idx in range(4):
-        # Stop any active stream on the tuner before releasing the lock
-        subprocess.getoutput(
-            f"hdhomerun_config {device_id} set /tuner{idx}/channel none"
-        )
-        raw = subprocess.getoutput(
-            f"hdhomerun_config {device_id} set /tuner{idx}/lockkey none"
-        )
-        results.append({"tuner": idx, "raw": raw})
-    return jsonify({"results": results})
+
+@app.route("/api/leases")
+def api_leases():
+    """List active tuner leases. Optional ?device= filter."""
+    return jsonify({"leases": [l.as_dict() for l in allocator.leases(request.args.get("device"))]})
+
+
+@app.route("/api/leases", methods=["POST"])
+def api_lease_acquire():
+    """
+    Lease a tuner. Expects JSON { "device": <id>, "tuner": <index>, "ttl": <s>,
+    "wait": <s>, "purpose": <str> }; all optional. Without ``tuner`` the least
+    disruptive free tuner is picked; ``wait`` queues for up to that many
+    seconds when none is free. Returns the lease (201) or 409.
+    """
+    data = request.get_json(silent=True) or {}
+    device, _ = find_device(data.get("device"))
+    if device is None:
+        return jsonify({"error": "No device found"}), 404 if data.get("device") else 503
+    tuner = data.get("tuner")
+    try:
+        tuner = int(tuner) if tuner is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid tuner"}), 400
+    lease = allocator.acquire(
+        device,
+        tuner,
+        ttl=lease_ttl(data.get("ttl")),
+        wait=lease_wait(data.get("wait")),
+        purpose=str(data.get("purpose") or ""),
+    )
+    if lease is None:
+        return jsonify({"error": "No free tuner" if tuner is None else "Tuner is busy"}), 409
+    return jsonify(lease.as_dict()), 201
+
+
+@app.route("/api/leases/<lease_id>/renew", methods=["POST"])
+def api_lease_renew(lease_id):
+    """Extend a lease by JSON { "ttl": <s> } (default LEASE_TTL) from now."""
+    data = request.get_json(silent=True) or {}
+    lease = allocator.renew(lease_id, lease_ttl(data.get("ttl")))
+    if lease is None:
+        return jsonify({"error": "Unknown lease"}), 404
+    return jsonify(lease.as_dict())
+
+
+@app.route("/api/leases/<lease_id>", methods=["DELETE"])
+def api_lease_release(lease_id):
+    """Release a lease and the tuner's lockkey; ?stop=1 also stops the tuner."""
+    if not allocator.release(lease_id, stop=request.args.get("stop") in ("1", "true")):
+        return jsonify({"error": "Unknown lease"}), 404
+    return jsonify({"released": lease_id})
+
+
+def monitor_baseline(device) -> list[dict]:
+    """Result groups of the device's latest scan with its channelmap."""
+    scan = scan_store.latest(device.id, channel_plans.get_plan(device.channelmap).name)
+    return scan["results"] if scan else []
+
+
+_monitor_webhook = WebhookSender(MONITOR_WEBHOOK) if MONITOR_WEBHOOK else None
+
+
+def handle_monitor_change(event: dict) -> None:
+    publish_shared("monitor", event)
+    app.logger.info(
+        "monitor: %s channel %s %s", event["device"], event["physical"], event["change"]
+    )
+    if _monitor_webhook is not None:
+        _monitor_webhook.send(event)
+
+
+def monitor_leader() -> bool:
+    """Hold the shared "monitor" lock, sharing this worker's monitor status while it does."""
+    try:
+        if not shared.acquire("monitor", WORKER_ID, MONITOR_LEADER_TTL):
+            return False
+        shared.put("monitor", "status", channel_monitor.status(), ttl=MONITOR_LEADER_TTL)
+    except sqlite3.Error as exc:  # stand by; the monitor asks again next interval
+        app.logger.warning("monitor leadership check failed: %s", exc)
+        return False
+    return True
+
+
+channel_monitor = ChannelMonitor(
+    registry.devices,
+    monitor_baseline,
+    device_clients,
+    allocator,
+    on_change=handle_monitor_change,
+    interval=MONITOR_INTERVAL,
+    reserve=MONITOR_RESERVE,
+    leader=monitor_leader,
+)
+if MONITOR_ENABLED:
+    channel_monitor.start()
+
+
+@app.route("/api/monitor")
+def api_monitor():
+    """Channel monitor state: { running, backoff, channels: [group + device, checked_at], events }."""
+    if channel_monitor.running and not channel_monitor.leading:
+        status = shared.get("monitor", "status")
+        if status is not None:
+            return jsonify(status)
+    return jsonify(channel_monitor.status())
+
+
+@app.route("/api/batch", methods=["POST"])
+def api_batch():
+    """Run several get/set operations on one device in a single request.
+
+    Expects JSON { "device": <id>, "ops": [ { "op": "get" | "set", "name",
+    "value", "lockkey" }, … ] }. Different tuners run concurrently and each
+    tuner's operations run in order. Returns { "device", "results": [ { op,
+    name, value } or { op, name, error }, … ] } in request order.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        ops = parse_ops(data.get("ops"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    device, _ = find_device(data.get("device"))
+    if device is None:
+        return jsonify({"error": "No device found"}), 404 if data.get("device") else 503
+    return jsonify({"device": device.id, "results": device_batch(device, ops)})
+
+
+# First discovery, in the background; started last so it may use every
+# helper defined above.
+registry.start()
 
 
 if __name__ == "__main__":
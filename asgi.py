@@ -0,0 +1,569 @@
+"""ASGI server mode: the same API served from an asyncio event loop.
+
+Run it with any ASGI server, for example::
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5070
+
+The dashboard's hot routes (``/api/status``, ``/api/tuners``,
+``/api/stream``, ``/api/relay``, ``/api/tune``, ``/api/program_info``,
+``/api/clear_locks`` and ``/api/batch``) are handled natively. Every device command runs on a
+worker thread under a per-device semaphore (``ASGI_DEVICE_CONCURRENCY``),
+and the waits between polls are ``asyncio.sleep`` calls, so a slow tune
+holds neither a thread nor a device slot while it waits. ``/api/tuners`` is
+answered from the sampler snapshot without touching the device at all.
+
+Every other route is handed to the Flask app through a WSGI bridge on its
+own thread pool (``ASGI_WSGI_THREADS``), so a long synchronous scan cannot
+take the threads that device calls need. Routes and JSON shapes are the
+same as under Gunicorn.
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs
+
+import app as wsgi
+import perf
+from batch import apply_op, group_ops, parse_ops
+from channel_plans import get_plan
+from events import format_sse
+from hdhomerun import DeviceError, parse_status
+from leases import LeaseError
+from tuning import backoff_delays, lock_settled, programs_ready, tune_result
+
+# At most DEVICE_CONCURRENCY commands are in flight per device. The native
+# client serialises commands on its socket anyway; the limit keeps one busy
+# device from tying up the whole DEVICE_THREADS pool.
+DEVICE_CONCURRENCY = int(os.environ.get("ASGI_DEVICE_CONCURRENCY", "4"))
+DEVICE_THREADS = int(os.environ.get("ASGI_DEVICE_THREADS", "32"))
+WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "32"))
+
+_device_pool = ThreadPoolExecutor(DEVICE_THREADS, thread_name_prefix="asgi-device")
+_wsgi_pool = ThreadPoolExecutor(WSGI_THREADS, thread_name_prefix="asgi-wsgi")
+_device_slots: dict[str, asyncio.Semaphore] = {}
+_version_checks: dict[str, asyncio.Future] = {}
+_background: set[asyncio.Task] = set()
+_program_locks: dict[tuple[str, int], asyncio.Lock] = {}
+
+
+async def device_call(device_id: str, fn, *args):
+    """Run the blocking device command ``fn(*args)`` within the device's limit."""
+    slot = _device_slots.get(device_id)
+    if slot is None:
+        slot = _device_slots[device_id] = asyncio.Semaphore(DEVICE_CONCURRENCY)
+    async with slot:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_device_pool, perf.bind(fn, *args))
+
+
+async def blocking(fn, *args):
+    """Run blocking work that is not a device command (discovery, first sample)."""
+    return await asyncio.get_running_loop().run_in_executor(_device_pool, perf.bind(fn, *args))
+
+
+# -- request / response helpers ---------------------------------------------
+
+
+async def read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return bytes(body)
+
+
+def query_params(scope) -> dict:
+    """Return the query string as a dict of first values, like ``request.args``."""
+    return {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+
+
+def request_json(body: bytes) -> dict:
+    """Decode a JSON request body; anything but an object reads as ``{}``."""
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def send_json(send, payload, status: int = 200, headers=()) -> None:
+    # Same encoding as Flask's jsonify: sorted keys, compact, trailing newline.
+    body = (json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n").encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class WSGIBridge:
+    """Serve a WSGI app over ASGI, running each request on ``executor``.
+
+    Responses are buffered, which suits every route left to Flask; the one
+    streaming route is handled natively.
+    """
+
+    def __init__(self, wsgi_app, executor: ThreadPoolExecutor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send) -> None:
+        environ = self._environ(scope, await read_body(receive))
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(self.executor, self._run, environ)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _environ(scope, body: bytes) -> dict:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client")
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+            "PATH_INFO": scope["path"].encode().decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": str(server[0]),
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0] if client else "",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            key = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                key = f"HTTP_{key}"
+                if key in environ:
+                    value = f"{environ[key]},{value}"
+            environ[key] = value
+        return environ
+
+    def _run(self, environ: dict) -> tuple[int, list, bytes]:
+        response = {}
+        chunks: list[bytes] = []
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers
+            ]
+            return chunks.append
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return response["status"], response["headers"], b"".join(chunks)
+
+
+flask_bridge = WSGIBridge(wsgi.app, _wsgi_pool)
+
+
+# -- native routes ------------------------------------------------------------
+
+
+async def find_device(device_id: str | None):
+    """:func:`app.find_device` without blocking the loop on the first discovery."""
+    if wsgi.registry.ready:
+        return wsgi.find_device(device_id)
+    return await blocking(wsgi.find_device, device_id)
+
+
+async def check_device(device_id: str, client) -> str:
+    """Read ``/sys/version``, sharing one in-flight read between concurrent callers.
+
+    A page load from many dashboards at once then costs the device a single
+    command instead of one per client.
+    """
+    check = _version_checks.get(device_id)
+    if check is None:
+        check = asyncio.ensure_future(device_call(device_id, client.get, "/sys/version"))
+        _version_checks[device_id] = check
+        check.add_done_callback(lambda _: _version_checks.pop(device_id, None))
+    return await asyncio.shield(check)
+
+
+async def api_status(data: dict):
+    device, client = await find_device(data.get("device"))
+    if device is None:
+        return wsgi.DISCONNECTED, 404 if data.get("device") else 503
+    try:
+        await check_device(device.id, client)
+    except DeviceError:
+        return wsgi.DISCONNECTED, 503
+    if device.channelmap is None:
+        plan = await device_call(device.id, wsgi.device_plan, device, client)
+    else:
+        plan = get_plan(device.channelmap)
+    return {
+        "connected": True,
+        "device_id": device.id,
+        "device_ip": await blocking(wsgi.local_ip),
+        "tuner_count": device.tuner_count,
+        **wsgi.plan_summary(plan),
+    }, 200
+
+
+async def api_tuners(data: dict):
+    device, _ = await find_device(data.get("device"))
+    if device is None:
+        return [], 404 if data.get("device") else 503
+    wsgi.tuner_sampler.start()
+    timestamp, tuners = wsgi.tuner_sampler.snapshot()
+    if not timestamp:
+        timestamp, tuners = await blocking(wsgi.tuner_snapshot)
+    tuners = wsgi.device_tuners(tuners, device.id)
+    if not tuners:
+        return [], 503
+    return tuners, 200, [(b"x-sample-time", f"{timestamp:.3f}".encode())]
+
+
+async def tune(
+    device_id: str, client, tuner: int, channel, deadline: float, lockkey: int | None = None
+) -> dict:
+    """Event-loop counterpart of :func:`tuning.tune`."""
+    started = time.monotonic()
+    end = started + deadline
+    await device_call(
+        device_id, partial(client.set, lockkey=lockkey), f"/tuner{tuner}/channel", f"auto:{channel}"
+    )
+
+    delays = backoff_delays()
+    while True:
+        fields = parse_status(await device_call(device_id, client.get, f"/tuner{tuner}/status"))
+        now = time.monotonic()
+        if lock_settled(fields, started, end, now):
+            break
+        with perf.span("wait", "tune_poll"):
+            await asyncio.sleep(min(next(delays), max(0.0, end - now)))
+    result = tune_result(fields)
+    if not result["locked"]:
+        return result
+    result["time_to_lock"] = round(time.monotonic() - started, 3)
+
+    delays = backoff_delays()
+    while True:
+        raw = await device_call(device_id, client.get, f"/tuner{tuner}/streaminfo")
+        programs, complete = programs_ready(raw)
+        now = time.monotonic()
+        if complete or now >= end:
+            break
+        with perf.span("wait", "tune_poll"):
+            await asyncio.sleep(min(next(delays), max(0.0, end - now)))
+    result["subchannels"] = programs
+    if programs:
+        result["time_to_psip"] = round(time.monotonic() - started, 3)
+    return result
+
+
+async def run_tune(device_id: str, client, tuner: int, channel, deadline: float, lease) -> dict:
+    """Event-loop counterpart of :func:`app.run_tune` plus :func:`app.tune_response`."""
+    lockkey = lease.lockkey if lease is not None else None
+    try:
+        result = await tune(device_id, client, tuner, channel, deadline, lockkey)
+    except DeviceError as exc:
+        result = wsgi.tune_failure(exc)
+    return wsgi.tune_response(result, tuner, lease)
+
+
+async def run_tune_job(job_id: str, device_id: str, client, tuner: int, channel, deadline, lease):
+    wsgi.finish_tune_job(job_id, await run_tune(device_id, client, tuner, channel, deadline, lease))
+
+
+async def api_tune(data: dict):
+    channel = data.get("channel")
+    device, client = await find_device(data.get("device"))
+    if device is None:
+        return {"subchannels": []}, 404 if data.get("device") else 503
+    if channel is None:
+        return {"subchannels": []}, 400
+    try:
+        tuner, lease = await blocking(wsgi.tune_target, device, data)
+    except LeaseError as exc:
+        return {"subchannels": [], "error": str(exc)}, exc.status
+    wsgi.program_changed(device, tuner)
+
+    deadline = wsgi.tune_deadline(data.get("deadline"))
+    if not data.get("async"):
+        return await run_tune(device.id, client, tuner, channel, deadline, lease), 200
+
+    job_id = wsgi.create_tune_job(device.id, tuner, channel)
+    task = asyncio.create_task(
+        run_tune_job(job_id, device.id, client, tuner, channel, deadline, lease)
+    )
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return {"job_id": job_id}, 202
+
+
+async def api_program_info(data: dict):
+    try:
+        tuner = int(data.get("tuner"))
+        program_id = int(data.get("program"))
+    except (TypeError, ValueError):
+        return {"bitrate": None, "max_bitrate": None}, 400
+
+    device, client = await find_device(data.get("device"))
+    if device is None:
+        return {"bitrate": None, "max_bitrate": None}, 404 if data.get("device") else 503
+    device_id = device.id
+    try:
+        lockkey = wsgi.tuner_lockkey(device, tuner, data.get("lease"))
+    except LeaseError as exc:
+        return {"bitrate": None, "max_bitrate": None, "error": str(exc)}, exc.status
+
+    def read(item: str):
+        return wsgi.tuner_reads.do_async(
+            (device_id, tuner, item),
+            lambda: device_call(device_id, wsgi.device_get, client, f"/tuner{tuner}/{item}"),
+        )
+
+    async with _program_locks.setdefault((device_id, tuner), asyncio.Lock()):
+        current, _ = await read("program")
+        if current.strip() != str(program_id):
+            try:
+                await device_call(
+                    device_id,
+                    partial(client.set, lockkey=lockkey),
+                    f"/tuner{tuner}/program",
+                    program_id,
+                )
+            except DeviceError as exc:
+                wsgi.program_changed(device, tuner)
+                return {"bitrate": None, "max_bitrate": None, "error": str(exc)}, 502
+            wsgi.program_changed(device, tuner, program_id)
+            with perf.span("wait", "program_settle"):
+                await asyncio.sleep(wsgi.PROGRAM_SETTLE)
+        (debug_raw, debug_cached), (streaminfo_raw, streaminfo_cached) = await asyncio.gather(
+            read("debug"), read("streaminfo")
+        )
+    info = wsgi.program_bitrates(debug_raw, streaminfo_raw, program_id)
+    info["cached"] = debug_cached and streaminfo_cached
+    return info, 200
+
+
+async def run_batch(device, ops: list[dict]) -> list[dict]:
+    """Event-loop counterpart of :func:`batch.run_batch`.
+
+    Each tuner's operations are awaited in order; tuners run concurrently
+    within the device's concurrency limit.
+    """
+    clients = wsgi.device_clients(device)
+    results: list[dict | None] = [None] * len(ops)
+
+    async def run_group(client, indexes: list[int]) -> None:
+        for i in indexes:
+            results[i] = await device_call(device.id, apply_op, client, ops[i])
+
+    await asyncio.gather(
+        *(run_group(clients[n % len(clients)], idx) for n, idx in enumerate(group_ops(ops)))
+    )
+    return results
+
+
+async def api_clear_locks(data: dict):
+    device, _ = await find_device(data.get("device"))
+    if device is None:
+        return {"results": []}, 404 if data.get("device") else 503
+    tuners, leased = await blocking(wsgi.clear_lock_tuners, device, bool(data.get("force")))
+    results = await run_batch(device, wsgi.clear_lock_ops(tuners))
+    return {"results": wsgi.clear_lock_results(tuners, results, leased)}, 200
+
+
+async def api_batch(data: dict):
+    try:
+        ops = parse_ops(data.get("ops"))
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    device, _ = await find_device(data.get("device"))
+    if device is None:
+        return {"error": "No device found"}, 404 if data.get("device") else 503
+    return {"device": device.id, "results": await run_batch(device, ops)}, 200
+
+
+async def _wait_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def api_stream(receive, send) -> None:
+    """Server-Sent Events stream; see :func:`app.api_stream`."""
+    wsgi.tuner_sampler.start()
+    wsgi.relay.start()
+    sub = wsgi.events.subscribe_async()
+    timestamp, tuners = wsgi.tuner_sampler.snapshot()
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        first = "retry: 3000\n\n" + format_sse("tuners", {"timestamp": timestamp, "changes": tuners})
+        await send({"type": "http.response.body", "body": first.encode(), "more_body": True})
+        while not sub.closed and not disconnected.done():
+            item = await sub.aget(wsgi.STREAM_KEEPALIVE)
+            chunk = ": keepalive\n\n" if item is None else format_sse(*item)
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    except OSError:
+        pass  # client went away mid-write
+    finally:
+        sub.close()
+        disconnected.cancel()
+
+
+async def api_relay(scope, receive, send) -> None:
+    """MPEG-TS relay stream; see :func:`app.api_relay`."""
+    data = query_params(scope)
+    try:
+        channel, program = wsgi.relay_args(data)
+    except ValueError:
+        await send_json(send, {"error": "Invalid channel or program"}, 400)
+        return
+    device, client = await find_device(data.get("device"))
+    if device is None:
+        await send_json(send, {"error": "No device found"}, 404 if data.get("device") else 503)
+        return
+    reader = None
+    try:
+        for _ in range(2):  # the relay may stop between lookup and joining
+            relay = await blocking(wsgi.relay_for, device, client, channel, program)
+            reader = relay.open_async_reader()
+            if reader is not None:
+                break
+    except LeaseError as exc:
+        await send_json(send, {"error": str(exc)}, exc.status)
+        return
+    except (OSError, DeviceError) as exc:
+        await send_json(send, {"error": f"Cannot start stream: {exc}"}, 502)
+        return
+    if reader is None:
+        await send_json(send, {"error": "Relay stopped"}, 503)
+        return
+
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"video/mp2t"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        async for chunk in reader.achunks():
+            if disconnected.done():
+                break
+            await send({"type": "http.response.body", "body": bytes(chunk), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    except OSError:
+        pass  # client went away mid-write
+    finally:
+        reader.close()
+        disconnected.cancel()
+
+
+ROUTES = {
+    ("GET", "/api/status"): api_status,
+    ("GET", "/api/tuners"): api_tuners,
+    ("POST", "/api/tune"): api_tune,
+    ("POST", "/api/program_info"): api_program_info,
+    ("POST", "/api/clear_locks"): api_clear_locks,
+    ("POST", "/api/batch"): api_batch,
+}
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            wsgi.tuner_sampler.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            wsgi.tuner_sampler.stop()
+            wsgi.channel_monitor.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send) -> None:
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        raise RuntimeError(f"unsupported ASGI scope type {scope['type']!r}")
+
+    key = (scope["method"], scope["path"])
+    if key == ("GET", "/api/stream"):
+        await api_stream(receive, send)
+        return
+    if key == ("GET", "/api/relay"):
+        await api_relay(scope, receive, send)
+        return
+    handler = ROUTES.get(key)
+    if handler is None:
+        await flask_bridge(scope, receive, send)
+        return
+    if scope["method"] == "GET":
+        data = query_params(scope)
+    else:
+        data = request_json(await read_body(receive))
+    headers = dict(scope.get("headers") or ())
+    if not (wsgi.PERF_SERVER_TIMING or headers.get(b"x-perf-trace") == b"1"):
+        await send_json(send, *await handler(data))
+        return
+    started = time.perf_counter()
+    token = perf.start_trace()
+    try:
+        payload, status, *extra = await handler(data)
+    finally:
+        trace = perf.end_trace(token)
+    timing = perf.server_timing(trace, time.perf_counter() - started)
+    headers = [*(extra[0] if extra else ()), (b"server-timing", timing.encode())]
+    await send_json(send, payload, status, headers)
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError as exc:  # pragma: no cover - runtime guard only
+        raise ImportError(
+            "An ASGI server is required to run the async mode, e.g. 'pip install uvicorn'."
+        ) from exc
+    uvicorn.run(application, host="0.0.0.0", port=5070)
@@ -0,0 +1,268 @@
+"""Fingerprinted, precompressed static assets for the web UI.
+
+Everything under ``static/`` is served at ``/static/<name>.<hash>.<ext>``,
+where the hash is taken from the file's contents, so a URL's bytes never
+change and browsers may keep them for a year without asking again. The page
+(``index.html``) is the one resource revalidated on every visit: its
+``static/...`` references are rewritten to the fingerprinted URLs, so a new
+build is picked up by the next page load and an unchanged page is a 304.
+
+Each file is held in memory with gzip (and, when the optional ``brotli``
+module is installed, brotli) variants, each with its own strong ETag. The
+variants are read from ``<file>.gz``/``<file>.br`` when ``python assets.py
+build`` has written them and are compressed at startup otherwise.
+
+Third-party files listed in :data:`VENDOR` are committed under ``static/``
+and (re)downloaded by ``python assets.py fetch``; should one be missing,
+the page loads it from its CDN URL.
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+import urllib.request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MIN_COMPRESS = 512  # bytes; smaller files are sent as they are
+COMPRESSED = (".gz", ".br")
+
+# Vendored third-party files (path under static/) and where they come from.
+# Bump the version here and run "python assets.py fetch --force" to upgrade.
+VENDOR = {
+    "vendor/echarts.min.js": "https://cdn.jsdelivr.net/npm/echarts@5.6.0/dist/echarts.min.js",
+}
+
+REFERENCE = re.compile(r'(\b(?:src|href)=")static/([^"?#]+)(")')
+
+
+def content_type(name: str) -> str:
+    ctype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if ctype.startswith("text/") or ctype in ("application/javascript", "application/json"):
+        ctype += "; charset=utf-8"
+    return ctype
+
+
+def fingerprint(name: str, digest: str) -> str:
+    """``app-script.js`` -> ``app-script.<digest>.js``."""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+def encodings() -> tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class Asset:
+    """One resource's bytes, its compressed variants and their ETags."""
+
+    def __init__(self, name: str, data: bytes, path: str | None = None):
+        self.name = name
+        self.content_type = content_type(name)
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        self.variants = {"identity": data}
+        if len(data) < MIN_COMPRESS:
+            return
+        for encoding in ("br", "gzip"):
+            encoded = self._read(path, encoding) if path else None
+            if encoded is None and encoding in encodings():
+                encoded = compress(data, encoding)
+            if encoded is not None and len(encoded) < len(data):
+                self.variants[encoding] = encoded
+
+    @staticmethod
+    def _read(path: str, encoding: str) -> bytes | None:
+        """A variant written by ``build``, if it is at least as new as the file."""
+        encoded = path + (".br" if encoding == "br" else ".gz")
+        try:
+            if os.path.getmtime(encoded) < os.path.getmtime(path):
+                return None
+            with open(encoded, "rb") as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+    def negotiate(self, accept_encoding: str) -> str:
+        """The best variant the client accepts, by our preference (br, gzip, identity)."""
+        accepted = {}
+        for part in accept_encoding.lower().split(","):
+            coding, _, params = part.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[coding.strip()] = q
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return "identity"
+
+    def respond(
+        self, accept_encoding: str, if_none_match: str, cache_control: str
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        """Return ``(status, headers, body)`` for a GET with the given request headers."""
+        encoding = self.negotiate(accept_encoding)
+        etag = self.etag(encoding)
+        headers = [("ETag", etag), ("Cache-Control", cache_control), ("Vary", "Accept-Encoding")]
+        # If-None-Match uses the weak comparison; proxies that recompress
+        # (Cloudflare among them) hand back our ETag marked W/.
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return 304, headers, b""
+        headers.append(("Content-Type", self.content_type))
+        if encoding != "identity":
+            headers.append(("Content-Encoding", encoding))
+        return 200, headers, self.variants[encoding]
+
+
+class AssetStore:
+    """Every file under ``root`` plus the page, keyed by the names they are served under."""
+
+    def __init__(self, root: str = STATIC_DIR, page: str = os.path.join(ROOT, "index.html")):
+        self.root = root
+        self.page_path = page
+        self.page: Asset | None = None
+        self._files: dict[str, Asset] = {}  # served name -> asset
+        self._urls: dict[str, str] = {}  # file name -> fingerprinted name
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _sources(self) -> dict[str, str]:
+        sources = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith(".") or filename.endswith(COMPRESSED):
+                    continue
+                path = os.path.join(dirpath, filename)
+                sources[os.path.relpath(path, self.root).replace(os.sep, "/")] = path
+        return sources
+
+    def refresh(self) -> None:
+        """Reload the files and the page when any of them changed on disk.
+
+        Cheap when nothing changed (a stat per file), so the page handler
+        calls it and edits show up on the next page load.
+        """
+        sources = self._sources()
+        try:
+            stamp = tuple(sorted((name, os.stat(path).st_mtime_ns) for name, path in sources.items()))
+            stamp += (os.stat(self.page_path).st_mtime_ns,)
+        except OSError:
+            return
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            files, urls = {}, {}
+            for name, path in sources.items():
+                with open(path, "rb") as fh:
+                    asset = Asset(name, fh.read(), path)
+                urls[name] = fingerprint(name, asset.digest)
+                files[urls[name]] = asset
+            with open(self.page_path, encoding="utf-8") as fh:
+                html = fh.read()
+            self._files, self._urls = files, urls
+            self.page = Asset(os.path.basename(self.page_path), self.render(html).encode("utf-8"))
+            self._stamp = stamp
+
+    def url(self, name: str) -> str | None:
+        """The URL a page should use for ``static/<name>``."""
+        if name in self._urls:
+            return "static/" + self._urls[name]
+        return VENDOR.get(name)
+
+    def render(self, html: str) -> str:
+        """Point the page's ``static/...`` src/href attributes at fingerprinted URLs."""
+
+        def replace(match):
+            url = self.url(match.group(2))
+            return match.group(1) + url + match.group(3) if url else match.group(0)
+
+        return REFERENCE.sub(replace, html)
+
+    def lookup(self, name: str) -> Asset | None:
+        """The asset served as ``/static/<name>`` (fingerprinted names only)."""
+        return self._files.get(name)
+
+
+# -- command line -------------------------------------------------------------
+
+
+def fetch(root: str = STATIC_DIR, force: bool = False) -> int:
+    """Download the :data:`VENDOR` files; returns how many could not be fetched."""
+    failed = 0
+    for name, url in VENDOR.items():
+        path = os.path.join(root, name)
+        if os.path.exists(path) and not force:
+            print(f"{name}: present")
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=30) as resp:
+                data = resp.read()
+        except OSError as exc:
+            print(f"{name}: {url}: {exc}", file=sys.stderr)
+            failed += 1
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as fh:
+            fh.write(data)
+        os.replace(path + ".tmp", path)
+        print(f"{name}: {len(data)} bytes from {url}")
+    return failed
+
+
+def build(root: str = STATIC_DIR) -> None:
+    """Write ``.gz`` (and ``.br``) variants next to every static file."""
+    store = AssetStore(root)
+    for name in store._urls:
+        asset = store.lookup(store._urls[name])
+        sizes = [f"{len(asset.variants['identity'])} bytes"]
+        for encoding, data in asset.variants.items():
+            if encoding == "identity":
+                continue
+            with open(os.path.join(root, name) + (".br" if encoding == "br" else ".gz"), "wb") as fh:
+                fh.write(data)
+            sizes.append(f"{encoding} {len(data)}")
+        print(f"static/{store._urls[name]}: {', '.join(sizes)}")
+    if brotli is None:
+        print("brotli is not installed; only gzip variants were written", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor and precompress the web UI's static files.")
+    parser.add_argument("command", choices=("fetch", "build"))
+    parser.add_argument("--force", action="store_true", help="fetch: download again")
+    args = parser.parse_args()
+    if args.command == "fetch":
+        sys.exit(1 if fetch(force=args.force) else 0)
+    build()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Run a batch of get/set operations against one device.
+
+Operations are grouped by tuner (``/tuner2/...`` -> ``tuner2``; anything else
+by its top-level node, e.g. ``sys``). Groups run concurrently, each on its
+own control connection, while the operations inside a group run in the order
+given. A batch therefore takes about as long as its slowest tuner rather
+than the sum of every round trip.
+
+Each operation is ``{"op": "get" | "set", "name": str, "value": ..., "lockkey": int}``
+and yields ``{"op", "name", "value"}`` or ``{"op", "name", "error"}``; a
+failed operation does not stop the rest of its group.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import perf
+from hdhomerun import DeviceError
+
+MAX_OPS = 256
+BATCH_WORKERS = 16
+
+_pool = ThreadPoolExecutor(BATCH_WORKERS, thread_name_prefix="batch")
+
+
+def parse_ops(raw) -> list[dict]:
+    """Validate a list of operations, raising ``ValueError`` with the reason."""
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("ops must be a non-empty list")
+    if len(raw) > MAX_OPS:
+        raise ValueError(f"at most {MAX_OPS} ops per batch")
+    ops = []
+    for i, item in enumerate(raw):
+        if not isinstance(item, dict):
+            raise ValueError(f"op {i} must be an object")
+        kind = item.get("op")
+        name = item.get("name")
+        if kind not in ("get", "set"):
+            raise ValueError(f"op {i}: op must be 'get' or 'set'")
+        if not isinstance(name, str) or not name.startswith("/"):
+            raise ValueError(f"op {i}: name must be a path such as /tuner0/status")
+        op = {"op": kind, "name": name}
+        if kind == "set":
+            if "value" not in item:
+                raise ValueError(f"op {i}: set needs a value")
+            op["value"] = str(item["value"])
+            if item.get("lockkey") is not None:
+                try:
+                    op["lockkey"] = int(item["lockkey"])
+                except (TypeError, ValueError):
+                    raise ValueError(f"op {i}: lockkey must be an integer") from None
+        ops.append(op)
+    return ops
+
+
+def op_group(name: str) -> str:
+    """Return the ordering group of ``name``: its top-level node."""
+    return name.strip("/").split("/", 1)[0]
+
+
+def group_ops(ops: list[dict]) -> list[list[int]]:
+    """Return op indexes per group, groups in order of first appearance."""
+    groups: dict[str, list[int]] = {}
+    for i, op in enumerate(ops):
+        groups.setdefault(op_group(op["name"]), []).append(i)
+    return list(groups.values())
+
+
+def apply_op(client, op: dict) -> dict:
+    """Run one operation and return its result entry."""
+    result = {"op": op["op"], "name": op["name"]}
+    try:
+        if op["op"] == "get":
+            result["value"] = client.get(op["name"])
+        else:
+            result["value"] = client.set(op["name"], op["value"], lockkey=op.get("lockkey"))
+    except DeviceError as exc:
+        result["error"] = str(exc)
+    return result
+
+
+def run_batch(clients: list, ops: list[dict]) -> list[dict]:
+    """Run ``ops`` and return their results in the same order.
+
+    Group ``n`` uses ``clients[n % len(clients)]``; pass one client per
+    concurrent group (e.g. one connection per tuner) to run them in parallel.
+    """
+    results: list[dict | None] = [None] * len(ops)
+
+    def run_group(client, indexes: list[int]) -> None:
+        for i in indexes:
+            results[i] = apply_op(client, ops[i])
+
+    groups = group_ops(ops)
+    if len(groups) == 1:
+        run_group(clients[0], groups[0])
+    else:
+        futures = [
+            _pool.submit(perf.bind(run_group, clients[n % len(clients)], indexes))
+            for n, indexes in enumerate(groups)
+        ]
+        for future in futures:
+            future.result()
+    return results
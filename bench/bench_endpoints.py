@@ -0,0 +1,202 @@
+"""End-to-end endpoint benchmarks against the simulated device.
+
+Starts a :class:`FakeDeviceServer` with scripted lock and PSIP timing,
+points the Flask app at it and measures, in-process:
+
+* ``tuners``: ``GET /api/tuners`` from ``--concurrency`` threads
+* ``tune``: ``POST /api/tune`` on every tuner at once, cycling live and dead
+  channels
+* ``program_info``: ``POST /api/program_info`` on every tuned tuner at once
+* ``scan_parallel`` and ``scan_sequential``: full scans started through
+  ``/api/scan/start`` and polled until finished; the sequential scan runs
+  ``bench/bin/hdhomerun_config`` (the fake command-line tool)
+
+Each scenario reports requests, throughput and latency percentiles.
+``--save`` writes the results as JSON; ``--baseline`` compares against a
+saved run and exits non-zero when a scenario's p50/p95 latency grew, or its
+throughput fell, by more than ``--tolerance``.
+
+    python bench/bench_endpoints.py --save bench/baseline.json
+    python bench/bench_endpoints.py --baseline bench/baseline.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from fake_hdhomerun import FakeDevice, FakeDeviceServer  # noqa: E402
+
+SCENARIOS = ("tuners", "tune", "program_info", "scan_parallel", "scan_sequential")
+CHANNELS = (8, 9, 16, 30, 22)  # live and dead channels alternate
+LATENCY_SLACK_MS = 2.0  # latency growth below this is noise, whatever the tolerance
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round((values[-1] if values else 0.0) * 1000, 2),
+    }
+
+
+def timed_calls(calls, concurrency: int) -> dict:
+    """Run ``calls`` (callables returning an HTTP status) on ``concurrency`` threads."""
+
+    def one(call):
+        start = time.perf_counter()
+        status = call()
+        return time.perf_counter() - start, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, calls))
+    elapsed = time.perf_counter() - started
+    return summarize([r[0] for r in results], sum(1 for r in results if r[1] >= 400), elapsed)
+
+
+def bench_tuners(client, args) -> dict:
+    client.get("/api/tuners")  # first sample
+    calls = [lambda: client.get("/api/tuners").status_code] * args.requests
+    return timed_calls(calls, args.concurrency)
+
+
+def bench_tune(client, args, tuners: int) -> dict:
+    def tune(n):
+        body = {"tuner": n % tuners, "channel": CHANNELS[n // tuners % len(CHANNELS)]}
+        return lambda: client.post("/api/tune", json=body).status_code
+
+    return timed_calls([tune(n) for n in range(args.tunes * tuners)], tuners)
+
+
+def bench_program_info(client, args, tuners: int) -> dict:
+    for tuner in range(tuners):
+        client.post("/api/tune", json={"tuner": tuner, "channel": 8})
+
+    def info(n):
+        body = {"tuner": n % tuners, "program": 3 + n // tuners % 2}
+        return lambda: client.post("/api/program_info", json=body).status_code
+
+    return timed_calls([info(n) for n in range(args.tunes * tuners)], tuners)
+
+
+def bench_scan(client, args, mode: str) -> dict:
+    client.post("/api/clear_locks", json={"force": True})
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(args.scans):
+        start = time.perf_counter()
+        resp = client.post("/api/scan/start", json={"tuner": 0, "mode": mode})
+        if resp.status_code >= 400:
+            errors += 1
+            continue
+        scan_id = resp.get_json()["scan_id"]
+        while not client.get(f"/api/scan/status/{scan_id}").get_json()["finished"]:
+            time.sleep(0.05)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a line per metric that regressed beyond ``tolerance``."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if current[key] > before[key] * (1 + tolerance) + LATENCY_SLACK_MS:
+                regressions.append(f"{name} {key}: {before[key]} -> {current[key]}")
+        if before["rps"] and current["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name} rps: {before['rps']} -> {current['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated")
+    parser.add_argument("--tuners", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.005, help="fake device reply delay")
+    parser.add_argument("--lock-delay", type=float, default=0.3)
+    parser.add_argument("--psip-delay", type=float, default=0.5)
+    parser.add_argument("--requests", type=int, default=2000, help="/api/tuners requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="/api/tuners threads")
+    parser.add_argument("--tunes", type=int, default=5, help="tunes and program_info calls per tuner")
+    parser.add_argument("--scans", type=int, default=1, help="full scans per scan scenario")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against saved results")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    device = FakeDevice(args.tuners, lock_delay=args.lock_delay, psip_delay=args.psip_delay)
+    server = FakeDeviceServer(device=device, latency=args.latency)
+    server.start()
+    os.environ["HDHOMERUN_DEVICE"] = f"FAKE0001@127.0.0.1:{server.port}"
+    os.environ["PATH"] = os.path.join(ROOT, "bench", "bin") + os.pathsep + os.environ["PATH"]
+    os.environ.setdefault("SCAN_DB", os.path.join(tempfile.mkdtemp(), "scans.db"))
+
+    import app
+
+    client = app.app.test_client()
+    runners = {
+        "tuners": lambda: bench_tuners(client, args),
+        "tune": lambda: bench_tune(client, args, args.tuners),
+        "program_info": lambda: bench_program_info(client, args, args.tuners),
+        "scan_parallel": lambda: bench_scan(client, args, "parallel"),
+        "scan_sequential": lambda: bench_scan(client, args, "sequential"),
+    }
+    print(
+        f"{args.tuners} tuners, device latency {args.latency * 1000:.0f} ms,"
+        f" lock {args.lock_delay * 1000:.0f} ms, PSIP {args.psip_delay * 1000:.0f} ms"
+    )
+    print(
+        f"{'scenario':<16} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}"
+        f" {'p99 ms':>9} {'max ms':>9} {'errors':>7}"
+    )
+    results = {}
+    for name in args.scenarios.split(","):
+        result = results[name] = runners[name]()
+        print(
+            f"{name:<16} {result['requests']:>9} {result['rps']:>9.1f} {result['p50_ms']:>9.1f}"
+            f" {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['max_ms']:>9.1f}"
+            f" {result['errors']:>7}"
+        )
+
+    settings = {k: getattr(args, k) for k in ("tuners", "latency", "lock_delay", "psip_delay")}
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump({"settings": settings, "results": results}, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline.get("settings") != settings:
+            print("\nwarning: baseline was recorded with different settings")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
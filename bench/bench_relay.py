@@ -0,0 +1,178 @@
+"""Measure the transport stream relay serving many HTTP viewers at once.
+
+Feeds a recorded ``.ts`` file (looped), or a synthetic 19.39 Mbps mux from
+the fake device, into a :class:`StreamRelay` at ``--speed`` times real time
+and serves it from a threaded WSGI server exactly as ``/api/relay`` does.
+``--clients`` viewers, spread over ``--procs`` client processes, read it
+for ``--seconds``; ``--slow`` of them read at a tenth of the stream rate
+and should be disconnected once they fall a buffer behind.
+
+Reports the stream rate each viewer received, how many chunks did not
+start on a TS packet boundary (should be 0), the relay's dropped readers
+and the server process's CPU use.
+
+    python bench/bench_relay.py --clients 120
+    python bench/bench_relay.py capture.ts --clients 200 --procs 8 --slow 5
+"""
+
+import argparse
+import http.client
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fake_hdhomerun import DEFAULT_STATIONS, SyntheticMux  # noqa: E402
+from ts_analyzer import ATSC_MUX_BPS, TS_PACKET_SIZE, UDP_DATAGRAM  # noqa: E402
+from ts_relay import StreamRelay  # noqa: E402
+
+FEED_INTERVAL = 0.01  # seconds between source writes, like batched UDP receives
+
+
+def paced_source(data: bytes, bps: float):
+    """A relay ``receive`` function looping ``data`` at ``bps`` bits per second."""
+
+    def receive(relay, stop):
+        view = memoryview(data)
+        started = time.monotonic()
+        sent = 0
+        while not stop.is_set():
+            due = int((time.monotonic() - started) * bps / 8)
+            due -= due % UDP_DATAGRAM
+            while sent < due:
+                start = sent % len(view)
+                size = min(due - sent, len(view) - start)
+                relay.feed(view[start : start + size])
+                sent += size
+            time.sleep(FEED_INTERVAL)
+
+    return receive
+
+
+def wsgi_app(relay):
+    def application(environ, start_response):
+        reader = relay.open_reader()
+        if reader is None:
+            start_response("503 Service Unavailable", [("Content-Type", "text/plain")])
+            return [b"relay stopped"]
+        start_response("200 OK", [("Content-Type", "video/mp2t")])
+        return (bytes(chunk) for chunk in reader.chunks())
+
+    return application
+
+
+def viewer(port: int, seconds: float, rate: float | None) -> tuple[int, int, float]:
+    """Read the stream; returns ``(bytes, misaligned chunks, seconds read)``."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/")
+    resp = conn.getresponse()
+    received = misaligned = 0
+    started = time.monotonic()
+    end = started + seconds
+    pending = b""
+    try:
+        while time.monotonic() < end:
+            data = resp.read1(256 * 1024)
+            if not data:
+                break
+            data = pending + data
+            aligned = len(data) - len(data) % TS_PACKET_SIZE
+            misaligned += any(data[i] != 0x47 for i in range(0, aligned, TS_PACKET_SIZE))
+            pending = data[aligned:]
+            received += len(data) - len(pending)
+            if rate:
+                time.sleep(max(0.0, received / rate - (time.monotonic() - started)))
+    except OSError:
+        pass
+    finally:
+        conn.close()
+    return received, misaligned, time.monotonic() - started
+
+
+def run_viewers(port: int, count: int, seconds: float, rate: float | None) -> list:
+    results = [None] * count
+
+    def one(i):
+        results[i] = viewer(port, seconds, rate)
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("path", nargs="?", help="recorded .ts file (default: synthetic mux)")
+    ap.add_argument("--clients", type=int, default=120)
+    ap.add_argument("--procs", type=int, default=4, help="client processes")
+    ap.add_argument("--slow", type=int, default=2, help="viewers reading at a tenth of the rate")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--speed", type=float, default=1.0, help="source rate, times real time")
+    ap.add_argument("--buffer", type=int, default=8 * 1024 * 1024, help="ring buffer bytes")
+    args = ap.parse_args()
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no line per viewer
+
+    if args.path:
+        with open(args.path, "rb") as fh:
+            data = fh.read()
+        data = data[: len(data) - len(data) % TS_PACKET_SIZE]
+    else:
+        mux = SyntheticMux([prog for prog, _, _ in DEFAULT_STATIONS[8][2]], ATSC_MUX_BPS)
+        data = mux.packets(int(10 * ATSC_MUX_BPS / (TS_PACKET_SIZE * 8)), 0.0)
+    bps = ATSC_MUX_BPS * args.speed
+
+    relay = StreamRelay(paced_source(data, bps), capacity=args.buffer, linger=60.0)
+    relay.start()
+    server = make_server("127.0.0.1", 0, wsgi_app(relay), threaded=True)
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    fast = args.clients - args.slow
+    jobs = [(fast // args.procs + (i < fast % args.procs), None) for i in range(args.procs)]
+    jobs.append((args.slow, bps / 8 / 10))
+    cpu, wall = time.process_time(), time.monotonic()
+    with ProcessPoolExecutor(len(jobs), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(run_viewers, server.server_port, count, args.seconds, rate)
+            for count, rate in jobs
+            if count
+        ]
+        results = [f.result() for f in futures]
+    cpu, wall = time.process_time() - cpu, time.monotonic() - wall
+    slow = results.pop() if args.slow else []
+    fast_results = [r for group in results for r in group]
+    status = relay.status()
+    relay.stop()
+    server.shutdown()
+
+    mbps = sorted(r[0] * 8 / r[2] / 1e6 for r in fast_results if r[2] > 0)
+    print(
+        f"source {bps / 1e6:.2f} Mbps, buffer {relay.capacity / 1e6:.1f} MB,"
+        f" {args.clients} viewers ({args.slow} slow) for {args.seconds:.0f} s"
+    )
+    print(
+        f"viewer Mbps: min {mbps[0]:.2f}  median {statistics.median(mbps):.2f}  max {mbps[-1]:.2f}"
+    )
+    print(f"delivered    {sum(r[0] for r in fast_results) * 8 / wall / 1e6:.1f} Mbps in total")
+    print(f"misaligned   {sum(r[1] for r in fast_results + slow)} chunks")
+    print(
+        f"dropped      {status['readers_dropped']} readers"
+        f" (slow viewers read {[round(r[0] / 1e6, 1) for r in slow]} MB)"
+    )
+    print(f"server CPU   {cpu / wall:.0%} of one core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Replay recorded ``hdhomerun_config scan`` transcripts through ScanParser.
+
+Transcripts are tiled until each run reaches the requested line count, then
+parsed while recording wall time and memory. Parsing should be linear: time
+per line stays flat as the transcript grows, and the transient allocation
+overhead (peak minus retained results) stays bounded.
+
+    python bench/bench_scan_parser.py
+    python bench/bench_scan_parser.py my_scan.txt --sizes 10000 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from scan_parser import ScanParser  # noqa: E402
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(__file__), "data", "scan_us_bcast.txt")
+
+
+def tiled(lines: list[str], count: int) -> list[str]:
+    reps = -(-count // len(lines))
+    return (lines * reps)[:count]
+
+
+def run(lines: list[str]) -> tuple[float, int, int, int]:
+    """Return (seconds, channels, retained_bytes, overhead_bytes) for one pass."""
+    parser = ScanParser()
+    start = time.perf_counter()
+    for line in lines:
+        parser.feed(line)
+    parser.finish()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    parser = ScanParser()
+    for line in lines:
+        parser.feed(line)
+    parser.finish()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, len(parser.results), retained, peak - retained
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("transcripts", nargs="*", default=[DEFAULT_TRANSCRIPT])
+    ap.add_argument("--sizes", nargs="+", type=int, default=[10_000, 20_000, 40_000, 80_000])
+    args = ap.parse_args()
+
+    lines: list[str] = []
+    for path in args.transcripts:
+        with open(path, encoding="utf-8") as fh:
+            lines.extend(fh.read().splitlines())
+
+    print(f"{'lines':>8} {'ms':>9} {'us/line':>8} {'channels':>9} {'retained KB':>12} {'overhead KB':>12}")
+    run(tiled(lines, args.sizes[0]))  # warm up
+    per_line = []
+    for size in args.sizes:
+        elapsed, channels, retained, overhead = run(tiled(lines, size))
+        per_line.append(elapsed / size)
+        print(
+            f"{size:>8} {elapsed * 1000:>9.2f} {elapsed / size * 1e6:>8.3f} {channels:>9}"
+            f" {retained / 1024:>12.1f} {overhead / 1024:>12.1f}"
+        )
+
+    ratio = max(per_line) / min(per_line)
+    print(f"\nper-line time spread: {ratio:.2f}x (~1.0 means linear)")
+
+
+if __name__ == "__main__":
+    main()
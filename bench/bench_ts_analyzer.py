@@ -0,0 +1,78 @@
+"""Measure TSAnalyzer throughput against the real-time rate of an ATSC mux.
+
+Runs a recorded ``.ts`` file, or a synthetic 19.39 Mbps mux from the fake
+device, through the pure-Python and (when installed) NumPy paths in
+buffers of the given size and reports packets per second and how many
+times faster than real time each path is on one core. ``--drop`` removes
+every Nth packet so the continuity counter errors found can be checked.
+
+    python bench/bench_ts_analyzer.py
+    python bench/bench_ts_analyzer.py capture.ts --chunk 1316
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import ts_analyzer  # noqa: E402
+from fake_hdhomerun import DEFAULT_STATIONS, SyntheticMux  # noqa: E402
+from ts_analyzer import ATSC_MUX_BPS, TS_PACKET_SIZE, TSAnalyzer  # noqa: E402
+
+
+def synthetic(seconds: float, drop: int) -> bytes:
+    mux = SyntheticMux([prog for prog, _, _ in DEFAULT_STATIONS[8][2]], ATSC_MUX_BPS)
+    count = int(seconds * ATSC_MUX_BPS / (TS_PACKET_SIZE * 8))
+    data = mux.packets(count, 0.0)
+    if drop:
+        data = b"".join(
+            data[i : i + TS_PACKET_SIZE]
+            for i in range(0, len(data), TS_PACKET_SIZE)
+            if (i // TS_PACKET_SIZE) % drop != drop - 1
+        )
+    return data
+
+
+def run(data: bytes, chunk: int, use_numpy: bool) -> tuple[float, dict]:
+    analyzer = TSAnalyzer(ATSC_MUX_BPS, use_numpy=use_numpy)
+    view = memoryview(data)
+    start = time.perf_counter()
+    for i in range(0, len(view), chunk):
+        analyzer.feed(view[i : i + chunk])
+    return time.perf_counter() - start, analyzer.stats()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("path", nargs="?", help="recorded .ts file (default: synthetic mux)")
+    ap.add_argument("--seconds", type=float, default=10.0, help="length of the synthetic mux")
+    ap.add_argument("--chunk", type=int, default=ts_analyzer.RECEIVE_BUFFER, help="bytes per feed")
+    ap.add_argument("--drop", type=int, default=0, help="drop every Nth packet")
+    args = ap.parse_args()
+
+    if args.path:
+        with open(args.path, "rb") as fh:
+            data = fh.read()
+    else:
+        data = synthetic(args.seconds, args.drop)
+    stream_seconds = len(data) * 8 / ATSC_MUX_BPS
+
+    paths = [False] + ([True] if ts_analyzer.np is not None else [])
+    print(f"{len(data) // TS_PACKET_SIZE} packets, {stream_seconds:.1f} s at 19.39 Mbps, chunk {args.chunk}")
+    print(f"{'path':>7} {'ms':>9} {'kpkt/s':>8} {'x realtime':>11} {'cc errors':>10} {'pids':>5}")
+    for use_numpy in paths:
+        run(data[: args.chunk * 16], args.chunk, use_numpy)  # warm up
+        elapsed, stats = run(data, args.chunk, use_numpy)
+        print(
+            f"{'numpy' if use_numpy else 'python':>7} {elapsed * 1000:>9.1f}"
+            f" {stats['packets'] / elapsed / 1000:>8.1f} {stream_seconds / elapsed:>11.1f}"
+            f" {stats['cc_errors']:>10} {len(stats['pids']):>5}"
+        )
+    if ts_analyzer.np is None:
+        print("\nNumPy is not installed; only the pure-Python path was measured.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Load-test the ASGI server mode against a fake device.
+
+Starts a :class:`FakeDeviceServer` with a per-command latency, points the app
+at it with ``HDHOMERUN_DEVICE`` and drives ``asgi.application`` in-process
+with:
+
+* ``--clients`` dashboard clients that, like the web UI, call
+  ``GET /api/status`` once and then poll ``GET /api/tuners`` every
+  ``--poll`` seconds
+* ``--streams`` clients holding ``GET /api/stream`` open
+* ``--busy`` clients looping synchronous ``POST /api/tune`` and
+  ``POST /api/program_info``, the slow calls that tie up threaded workers
+
+It reports throughput, the slowest one-second window and latency
+percentiles per route. Dashboard latency should stay flat while the busy
+clients keep the device saturated.
+
+    python bench/load_asgi.py
+    python bench/load_asgi.py --clients 500 --duration 20 --latency 0.03
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fake_hdhomerun import FakeDeviceServer  # noqa: E402
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.per_second: dict[str, Counter] = defaultdict(Counter)
+        self.events = 0
+
+    def add(self, route: str, status: int, elapsed: float) -> None:
+        self.latencies[route].append(elapsed)
+        self.per_second[route][int(time.monotonic())] += 1
+        if status >= 400:
+            self.errors[route] += 1
+
+
+async def call(application, method: str, path: str, body=None) -> tuple[int, bytes]:
+    """Issue one request to an ASGI app and return ``(status, body)``."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 5070),
+    }
+    response = {"status": 0, "body": bytearray()}
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] += message.get("body", b"")
+
+    await application(scope, receive, send)
+    return response["status"], bytes(response["body"])
+
+
+async def dashboard(application, stats: Stats, stop: asyncio.Event, poll: float) -> None:
+    route = "/api/status"
+    while not stop.is_set():
+        start = time.perf_counter()
+        status, _ = await call(application, "GET", route)
+        stats.add(route, status, time.perf_counter() - start)
+        route = "/api/tuners"
+        await asyncio.sleep(poll)
+
+
+async def busy(application, stats: Stats, stop: asyncio.Event, tuner: int) -> None:
+    # Alternate a live channel with a dead one so both lock paths are exercised.
+    channels = (8, 9, 16, 30)
+    n = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        status, body = await call(
+            application, "POST", "/api/tune", {"tuner": tuner, "channel": channels[n % 4]}
+        )
+        stats.add("/api/tune", status, time.perf_counter() - start)
+        subchannels = json.loads(body).get("subchannels") or []
+        if subchannels:
+            start = time.perf_counter()
+            status, _ = await call(
+                application,
+                "POST",
+                "/api/program_info",
+                {"tuner": tuner, "program": subchannels[0]["id"]},
+            )
+            stats.add("/api/program_info", status, time.perf_counter() - start)
+        n += 1
+
+
+async def stream(application, stats: Stats, stop: asyncio.Event) -> None:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/stream",
+        "query_string": b"",
+        "headers": [],
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await stop.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        stats.events += message.get("body", b"").count(b"event: ")
+
+    await application(scope, receive, send)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def report(stats: Stats, duration: float) -> None:
+    print(
+        f"{'route':<20} {'requests':>9} {'req/s':>8} {'min 1s':>7}"
+        f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    )
+    for route, values in sorted(stats.latencies.items()):
+        values.sort()
+        # Ignore the partial first and last seconds for the sustained minimum.
+        seconds = sorted(stats.per_second[route].items())[1:-1]
+        worst = min((count for _, count in seconds), default=0)
+        print(
+            f"{route:<20} {len(values):>9} {len(values) / duration:>8.0f} {worst:>7}"
+            f" {percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f}"
+            f" {percentile(values, 99) * 1000:>8.1f} {stats.errors[route]:>7}"
+        )
+    print(f"stream events received: {stats.events}")
+
+
+async def run(args) -> None:
+    import asgi
+
+    stats = Stats()
+    stop = asyncio.Event()
+    await call(asgi.application, "GET", "/api/tuners")  # first sample
+
+    tasks = [
+        asyncio.create_task(dashboard(asgi.application, stats, stop, args.poll))
+        for _ in range(args.clients)
+    ]
+    tasks += [
+        asyncio.create_task(busy(asgi.application, stats, stop, idx % 4))
+        for idx in range(args.busy)
+    ]
+    tasks += [asyncio.create_task(stream(asgi.application, stats, stop)) for _ in range(args.streams)]
+
+    started = time.monotonic()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    report(stats, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=300, help="dashboard clients")
+    parser.add_argument("--streams", type=int, default=100, help="open /api/stream clients")
+    parser.add_argument("--busy", type=int, default=4, help="clients looping /api/tune")
+    parser.add_argument("--poll", type=float, default=0.05, help="dashboard poll interval (s)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake device reply delay")
+    args = parser.parse_args()
+
+    server = FakeDeviceServer(latency=args.latency)
+    server.start()
+    os.environ["HDHOMERUN_DEVICE"] = f"FAKE0001@127.0.0.1:{server.port}"
+    os.environ.setdefault("SCAN_DB", os.path.join(tempfile.mkdtemp(), "scans.db"))
+
+    print(
+        f"{args.clients} dashboard clients, {args.streams} streams, {args.busy} busy clients,"
+        f" device latency {args.latency * 1000:.0f} ms, {args.duration:.0f} s"
+    )
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
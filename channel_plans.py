@@ -0,0 +1,134 @@
+"""Channel plans (channelmaps) and frequency <-> channel lookups.
+
+Each plan is generated from band definitions, the same ``(first, last,
+first frequency, spacing)`` ranges libhdhomerun uses, and built once at
+import into two dicts: channel -> frequency and frequency -> channel. Exact
+lookups are a single dict probe; a frequency that is slightly off (a tuner
+reporting a measured or offset carrier) is matched to the nearest channel
+within a tolerance by probing 1 MHz buckets around it.
+
+The device's channelmap is read from ``/tunerN/channelmap``; names follow
+the device's (``us-bcast``, ``us-cable``, ``us-hrc``, ``us-irc``,
+``eu-bcast``, ``au-bcast``).
+"""
+
+DEFAULT_CHANNELMAP = "us-bcast"
+DEFAULT_TOLERANCE = 500_000  # Hz
+MIN_FREQUENCY = 1_000_000  # values below this in a "ch=" field are channel numbers
+
+_BUCKET = 1_000_000  # Hz; must be >= the largest tolerance used
+
+# channelmap -> [(first channel, last channel, frequency of first, spacing)], Hz
+BANDS = {
+    "us-bcast": [
+        (2, 4, 57_000_000, 6_000_000),
+        (5, 6, 79_000_000, 6_000_000),
+        (7, 13, 177_000_000, 6_000_000),
+        (14, 51, 473_000_000, 6_000_000),
+    ],
+    "us-cable": [
+        (2, 4, 57_000_000, 6_000_000),
+        (5, 6, 79_000_000, 6_000_000),
+        (7, 13, 177_000_000, 6_000_000),
+        (14, 22, 123_000_000, 6_000_000),
+        (23, 94, 219_000_000, 6_000_000),
+        (95, 99, 93_000_000, 6_000_000),
+        (100, 158, 651_000_000, 6_000_000),
+    ],
+    "us-hrc": [
+        (2, 4, 55_752_700, 6_000_300),
+        (5, 6, 79_753_900, 6_000_300),
+        (7, 13, 175_758_700, 6_000_300),
+        (14, 22, 121_756_000, 6_000_300),
+        (23, 94, 217_760_800, 6_000_300),
+        (95, 99, 91_754_500, 6_000_300),
+        (100, 158, 649_782_400, 6_000_300),
+    ],
+    "us-irc": [
+        (2, 4, 57_012_500, 6_000_000),
+        (5, 6, 81_012_500, 6_000_000),
+        (7, 13, 177_012_500, 6_000_000),
+        (14, 22, 123_012_500, 6_000_000),
+        (23, 41, 219_012_500, 6_000_000),
+        (42, 42, 333_025_000, 6_000_000),
+        (43, 94, 339_012_500, 6_000_000),
+        (95, 97, 93_012_500, 6_000_000),
+        (98, 99, 111_025_000, 6_000_000),
+        (100, 158, 651_012_500, 6_000_000),
+    ],
+    "eu-bcast": [
+        (5, 12, 177_500_000, 7_000_000),
+        (21, 69, 474_000_000, 8_000_000),
+    ],
+    "au-bcast": [
+        (6, 9, 177_500_000, 7_000_000),
+        (10, 12, 212_500_000, 7_000_000),
+        (21, 69, 480_500_000, 7_000_000),
+    ],
+}
+
+
+class ChannelPlan:
+    """One channelmap's channels with O(1) lookups in both directions."""
+
+    def __init__(self, name: str, bands: list[tuple[int, int, int, int]]):
+        self.name = name
+        self.frequencies: dict[int, int] = {}  # channel -> Hz
+        for first, last, frequency, spacing in bands:
+            for channel in range(first, last + 1):
+                self.frequencies[channel] = frequency + (channel - first) * spacing
+        self.channels = sorted(self.frequencies)
+        self.by_frequency = {f: c for c, f in self.frequencies.items()}
+        self._buckets: dict[int, list[tuple[int, int]]] = {}
+        for channel, frequency in self.frequencies.items():
+            self._buckets.setdefault(frequency // _BUCKET, []).append((frequency, channel))
+
+    def frequency(self, channel: int) -> int | None:
+        """Return the center frequency of ``channel`` in Hz."""
+        return self.frequencies.get(channel)
+
+    def channel(self, frequency: int, tolerance: int = DEFAULT_TOLERANCE) -> int | None:
+        """Return the channel at ``frequency``, or the nearest one within ``tolerance`` Hz."""
+        channel = self.by_frequency.get(frequency)
+        if channel is not None or tolerance <= 0:
+            return channel
+        bucket = frequency // _BUCKET
+        best = None
+        for key in (bucket - 1, bucket, bucket + 1):
+            for center, candidate in self._buckets.get(key, ()):
+                offset = abs(center - frequency)
+                if offset <= tolerance and (best is None or offset < best[0]):
+                    best = (offset, candidate)
+        return best[1] if best else None
+
+
+PLANS = {name: ChannelPlan(name, bands) for name, bands in BANDS.items()}
+
+
+def get_plan(name: str | None) -> ChannelPlan:
+    """Return the plan called ``name``, or the default plan if it is unknown."""
+    return PLANS.get(name or "", PLANS[DEFAULT_CHANNELMAP])
+
+
+def parse_channelmap(value: str) -> str | None:
+    """Return the known channelmap named in a ``/tunerN/channelmap`` reply."""
+    for name in value.split():
+        if name in PLANS:
+            return name
+    return None
+
+
+def status_channel(value: str | None, plan: ChannelPlan) -> int | None:
+    """Return the physical channel of a status ``ch=`` value such as ``8vsb:485000000``.
+
+    The device reports either a channel number or a frequency in Hz.
+    """
+    if not value:
+        return None
+    number = value.rsplit(":", 1)[-1].strip()
+    if not number.isdigit():
+        return None
+    number = int(number)
+    if number < MIN_FREQUENCY:
+        return number if number in plan.frequencies else None
+    return plan.channel(number)
@@ -0,0 +1,111 @@
+"""Request coalescing for repeated device reads.
+
+Several dashboards watching one tuner ask the device the same thing at the
+same time. :class:`SingleFlight` runs one call per key and hands its result
+to every caller that asked while it was in flight, then keeps it for a short
+TTL so callers arriving just after are served from memory too. Errors are
+passed to the callers waiting at the time but never cached.
+
+Threads use :meth:`SingleFlight.do`; coroutines use
+:meth:`SingleFlight.do_async`, which waits without blocking the event loop.
+Both share the cache.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Coalesce concurrent calls per key and cache results for ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = 0.5):
+        self.ttl = ttl
+        self._cache: dict[Hashable, tuple[object, float]] = {}
+        self._inflight: dict[Hashable, Future] = {}
+        self._async_inflight: dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key: Hashable):
+        entry = self._cache.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry
+        return None
+
+    def _store(self, key: Hashable, value, ttl: float | None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if ttl > 0:
+                self._cache[key] = (value, time.monotonic() + ttl)
+            if len(self._cache) > 1024:
+                now = time.monotonic()
+                self._cache = {k: e for k, e in self._cache.items() if e[1] > now}
+
+    def do(self, key: Hashable, fn: Callable[[], object], ttl: float | None = None) -> tuple[object, bool]:
+        """Return ``(value, shared)`` for ``key``, calling ``fn`` only if needed.
+
+        ``shared`` is true when the value came from the cache or from another
+        caller's call. ``ttl`` overrides the default (0 coalesces without
+        caching).
+        """
+        with self._lock:
+            entry = self._cached(key)
+            if entry is not None:
+                return entry[0], True
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            value = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            self._store(key, value, ttl)
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def do_async(
+        self, key: Hashable, fn: Callable[[], Awaitable], ttl: float | None = None
+    ) -> tuple[object, bool]:
+        """Coroutine version of :meth:`do`; ``fn`` returns an awaitable."""
+        with self._lock:
+            entry = self._cached(key)
+            if entry is not None:
+                return entry[0], True
+            future = self._async_inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+        if not leader:
+            return await asyncio.shield(future), True
+        try:
+            value = await fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved, so an unawaited failure is not logged
+            raise
+        else:
+            self._store(key, value, ttl)
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                self._async_inflight.pop(key, None)
+
+    def put(self, key: Hashable, value, ttl: float | None = None) -> None:
+        """Cache ``value`` for ``key`` as if a call had just returned it."""
+        self._store(key, value, ttl)
+
+    def forget(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
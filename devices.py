@@ -0,0 +1,204 @@
+"""Registry of every HDHomeRun device on the network.
+
+Discovery runs once up front (in the background when :meth:`DeviceRegistry.start`
+is called at startup) and then stale-while-revalidate: when the list is
+older than ``ttl`` seconds the next lookup starts a refresh thread and keeps
+answering from the cached list, so no request waits on discovery after the
+first one. New devices (or devices whose address changed) have their tuner
+count taken from the discover reply or, failing that, read from the device.
+"""
+
+import ipaddress
+import logging
+import re
+import threading
+import time
+from typing import Callable
+
+from hdhomerun import HDHOMERUN_CONTROL_PORT, DeviceError
+
+MAX_TUNERS = 16  # upper bound when probing a device for its tuners
+MAX_UNICAST_HOSTS = 1024  # larger subnets get their broadcast address instead
+
+log = logging.getLogger(__name__)
+
+_DISCOVER_RE = re.compile(r"hdhomerun device (\w+) found at ([\d.]+)")
+
+
+class Device:
+    """One discovered device: id, control address, tuner count and channelmap.
+
+    ``channelmap`` is filled in by the first status sample (see
+    :mod:`channel_plans`).
+    """
+
+    def __init__(self, device_id: str, ip: str, tuner_count: int | None = None):
+        self.id = device_id
+        self.ip = ip
+        self.tuner_count = tuner_count
+        self.channelmap: str | None = None
+        self.last_seen = time.time()
+
+    def as_dict(self) -> dict:
+        return {
+            "device_id": self.id,
+            "device_ip": self.ip,
+            "tuner_count": self.tuner_count,
+            "channelmap": self.channelmap,
+            "last_seen": self.last_seen,
+        }
+
+
+def parse_discover_output(out: str) -> list[tuple[str, str]]:
+    """Return ``[(device_id, ip), ...]`` from ``hdhomerun_config discover``."""
+    return _DISCOVER_RE.findall(out)
+
+
+def parse_discover_targets(spec: str) -> list[tuple[str, int]]:
+    """Parse ``"<ip>[:<port>],<subnet>/<bits>,..."`` into discover destinations.
+
+    A subnet expands to each of its hosts (so devices answer even where
+    routers drop directed broadcasts), or to its broadcast address when it
+    has more than ``MAX_UNICAST_HOSTS``. Raises :class:`ValueError` on a bad entry.
+    """
+    targets = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        if "/" in item:
+            network = ipaddress.IPv4Network(item, strict=False)
+            if network.num_addresses > MAX_UNICAST_HOSTS:
+                hosts = [network.broadcast_address]
+            else:
+                hosts = list(network.hosts()) or [network.network_address]
+            targets.extend((str(host), HDHOMERUN_CONTROL_PORT) for host in hosts)
+        else:
+            host, _, port = item.partition(":")
+            targets.append((str(ipaddress.IPv4Address(host)), int(port or HDHOMERUN_CONTROL_PORT)))
+    return targets
+
+
+def parse_device_list(spec: str) -> list[tuple[str, str]]:
+    """Parse ``"<id>@<ip>[:<port>],..."`` into ``[(device_id, address), ...]``."""
+    devices = []
+    for item in spec.split(","):
+        device_id, _, address = item.strip().partition("@")
+        if device_id and address:
+            devices.append((device_id, address))
+    return devices
+
+
+def count_tuners(client, limit: int = MAX_TUNERS) -> int | None:
+    """Return how many ``/tunerN`` nodes the device has, or ``None`` if unreachable."""
+    for idx in range(limit):
+        try:
+            client.get(f"/tuner{idx}/status")
+        except DeviceError:
+            return idx or None
+    return limit
+
+
+class DeviceRegistry:
+    """Keep the set of known devices current.
+
+    ``discover()`` returns ``[(device_id, ip), ...]``, or
+    ``[(device_id, ip, tuner_count), ...]`` when discovery reports tuner
+    counts, and raises :class:`DeviceError` when discovery itself fails (the
+    previous list is then kept). ``probe(device_id, ip)`` returns the
+    device's tuner count or ``None``; devices with an unknown count are
+    probed again on every refresh.
+    """
+
+    def __init__(
+        self,
+        discover: Callable[[], list[tuple[str, str]]],
+        probe: Callable[[str, str], int | None],
+        ttl: float = 60.0,
+    ):
+        self.discover = discover
+        self.probe = probe
+        self.ttl = ttl
+        self._devices: dict[str, Device] = {}
+        self._updated = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def ready(self) -> bool:
+        """True once the first discovery has finished; lookups no longer block."""
+        return bool(self._updated)
+
+    def devices(self) -> list[Device]:
+        """Return known devices ordered by id, refreshing in the background if stale."""
+        if not self._updated:
+            with self._refresh_lock:
+                if not self._updated:  # another caller may have finished it meanwhile
+                    self._refresh()
+        elif time.monotonic() - self._updated >= self.ttl:
+            self._refresh_async()
+        with self._lock:
+            return [self._devices[k] for k in sorted(self._devices)]
+
+    def get(self, device_id: str | None = None) -> Device | None:
+        """Return ``device_id``, or the first device when it is empty."""
+        devices = self.devices()
+        if not device_id:
+            return devices[0] if devices else None
+        with self._lock:
+            return self._devices.get(device_id)
+
+    def start(self) -> None:
+        """Run the first discovery in the background, e.g. at startup."""
+        if not self._updated:
+            threading.Thread(target=self.devices, name="device-discovery", daemon=True).start()
+
+    def refresh(self) -> None:
+        """Run discovery now and update the registry."""
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        try:
+            self._update()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _update(self) -> None:
+        try:
+            found = self.discover()
+        except DeviceError:
+            found = None
+        except Exception:  # keep the previous list and keep refreshing
+            log.exception("device discovery failed")
+            found = None
+        now = time.time()
+        with self._lock:
+            current = dict(self._devices)
+        if found is not None:
+            devices = {}
+            for device_id, ip, *count in found:
+                device = current.get(device_id)
+                if device is None or device.ip != ip:
+                    device = Device(device_id, ip)
+                if count and count[0]:
+                    device.tuner_count = count[0]
+                device.last_seen = now
+                devices[device_id] = device
+        else:
+            devices = current
+        for device in devices.values():
+            if device.tuner_count is None:
+                try:
+                    device.tuner_count = self.probe(device.id, device.ip)
+                except Exception:  # probed again on the next refresh
+                    log.exception("probing %s for its tuner count failed", device.id)
+        with self._lock:
+            self._devices = devices
+            self._updated = time.monotonic()
+
+    def _refresh_async(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="device-discovery", daemon=True).start()
@@ -0,0 +1,116 @@
+"""In-process publish/subscribe broker for pushing events to clients.
+
+Producers (the tuner sampler, scan threads) call :meth:`EventBroker.publish`;
+each streaming client holds a :class:`Subscription` with a bounded queue. A
+client that falls too far behind is dropped rather than buffered without
+limit; browsers' ``EventSource`` reconnects and resynchronises from a fresh
+snapshot.
+
+Subscribers on an asyncio event loop use :meth:`EventBroker.subscribe_async`;
+publishing stays thread-safe and only wakes the loop with
+``call_soon_threadsafe``.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+
+
+class Subscription:
+    """A single client's view of the event stream."""
+
+    def __init__(self, broker: "EventBroker", maxsize: int):
+        self._broker = broker
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self.closed = False
+
+    def put(self, item: tuple[str, dict]) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout: float | None = None) -> tuple[str, dict] | None:
+        """Return the next ``(event, data)`` pair, or ``None`` on timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self._broker.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """A subscription consumed from an asyncio event loop."""
+
+    def __init__(self, broker: "EventBroker", maxsize: int, loop: asyncio.AbstractEventLoop):
+        super().__init__(broker, maxsize)
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def put(self, item: tuple[str, dict]) -> bool:
+        if not super().put(item):
+            return False
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:  # loop closed
+            return False
+        return True
+
+    async def aget(self, timeout: float | None = None) -> tuple[str, dict] | None:
+        """Await the next ``(event, data)`` pair, or ``None`` on timeout."""
+        while True:
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._ready.clear()
+            # An item may have arrived between the first check and the clear.
+            if not self._queue.empty():
+                continue
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+
+class EventBroker:
+    """Fan events out to every current subscriber."""
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self, self.queue_size)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def subscribe_async(self) -> AsyncSubscription:
+        """Subscribe from a coroutine running on the current event loop."""
+        sub = AsyncSubscription(self, self.queue_size, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        sub.closed = True
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event: str, data: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if not sub.put((event, data)):
+                self.unsubscribe(sub)
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,565 @@
+"""Fake HDHomeRun device speaking the TCP control protocol.
+
+Lets the app and :mod:`hdhomerun` be exercised without hardware::
+
+    python fake_hdhomerun.py --port 65001
+
+Point the app at it with ``HDHOMERUN_DEVICE=1FA4E000@127.0.0.1:<port>``, or
+use :class:`FakeDeviceServer` directly from a script. Each device also
+answers UDP discovery on its port (:class:`DiscoveryResponder`), so
+``HDHOMERUN_DISCOVER_TARGETS=127.0.0.1:<port>`` finds it without a fixed list. Lock and PSIP timing
+can be scripted per device or per channel (``--lock-delay``,
+``--psip-delay``) so tunes and scans take realistic time.
+
+``bench/bin/hdhomerun_config`` stands in for SiliconDust's command-line tool
+(``discover``, ``get``, ``set`` and ``scan``) on top of the same servers;
+put ``bench/bin`` first on ``PATH`` to exercise the subprocess code paths.
+"""
+
+import argparse
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+from channel_plans import DEFAULT_CHANNELMAP, MIN_FREQUENCY, PLANS, get_plan, parse_channelmap
+from devices import parse_device_list
+from hdhomerun import (
+    HDHOMERUN_CONTROL_PORT,
+    HDHOMERUN_DEVICE_ID_WILDCARD,
+    HDHOMERUN_DEVICE_TYPE_TUNER,
+    HDHOMERUN_DEVICE_TYPE_WILDCARD,
+    HDHOMERUN_TAG_BASE_URL,
+    HDHOMERUN_TAG_DEVICE_ID,
+    HDHOMERUN_TAG_DEVICE_TYPE,
+    HDHOMERUN_TAG_TUNER_COUNT,
+    HDHOMERUN_TYPE_DISCOVER_REQ,
+    HDHOMERUN_TYPE_DISCOVER_RPY,
+    HDHOMERUN_TAG_ERROR_MESSAGE,
+    HDHOMERUN_TAG_GETSET_LOCKKEY,
+    HDHOMERUN_TAG_GETSET_NAME,
+    HDHOMERUN_TAG_GETSET_VALUE,
+    HDHOMERUN_TYPE_GETSET_REQ,
+    HDHOMERUN_TYPE_GETSET_RPY,
+    ControlClient,
+    DeviceError,
+    decode_packet,
+    encode_packet,
+    recv_packet,
+)
+from tuning import wait_for_lock, wait_for_programs
+
+# Physical channel -> (ss, snq, [(program, vchannel, name), ...])
+DEFAULT_STATIONS = {
+    8: (85, 92, [(3, "8.1", "WAGM-HD"), (4, "8.2", "WAGMFOX")]),
+    16: (71, 80, [(1, "16.1", "WMEB-HD"), (2, "16.2", "CREATE")]),
+    22: (64, 70, [(1, "22.1", "WVII-HD")]),
+}
+
+
+class SyntheticMux:
+    """Endless ATSC-like transport stream for a station's programs.
+
+    Each program gets a video PID (carrying the PCR) and an audio PID; PAT
+    and PMTs repeat every 100 ms and null packets pad the mux to
+    ``bitrate``. Packets are stamped on an arrival clock passed by the
+    caller, so PCRs match the time they are sent (or the byte position, for
+    a recorded file).
+    """
+
+    PCR_INTERVAL = 0.03  # seconds
+    TABLE_INTERVAL = 0.1
+
+    def __init__(self, programs: list[int], bitrate: int = 19_392_658):
+        self.bitrate = bitrate
+        self.pids = [0x0000]
+        pattern = []
+        for n, _ in enumerate(programs):
+            video, audio = 0x31 + 0x10 * n, 0x34 + 0x10 * n
+            self.pids += [0x30 + 0x10 * n, video, audio]
+            pattern += [video] * 6 + [audio]
+        self.pcr_pids = {0x31 + 0x10 * n for n in range(len(programs))}
+        # Fill roughly 90% of the mux with program data, the rest with nulls.
+        nulls = max(1, len(pattern) // 9)
+        self.pattern = pattern + [0x1FFF] * nulls
+        self._cc = dict.fromkeys(self.pids, 0)
+        self._position = 0
+        self._last_pcr = dict.fromkeys(self.pcr_pids, -1.0)
+        self._last_tables = -1.0
+        self._tables: list[int] = []
+
+    def packets(self, count: int, clock: float) -> bytes:
+        """Return the next ``count`` packets, the first sent at ``clock`` seconds."""
+        out = bytearray(count * 188)
+        step = 188 * 8 / self.bitrate
+        for n in range(count):
+            at = clock + n * step
+            if at - self._last_tables >= self.TABLE_INTERVAL:
+                self._last_tables = at
+                self._tables = [self.pids[0], *self.pids[1::3]]  # PAT, then each PMT
+            if self._tables:
+                pid = self._tables.pop(0)
+            else:
+                pid = self.pattern[self._position % len(self.pattern)]
+                self._position += 1
+            self._packet(out, n * 188, pid, at)
+        return bytes(out)
+
+    def _packet(self, out: bytearray, off: int, pid: int, at: float) -> None:
+        out[off] = 0x47
+        out[off + 1] = pid >> 8
+        out[off + 2] = pid & 0xFF
+        if pid == 0x1FFF:
+            out[off + 3] = 0x10
+            return
+        cc = self._cc[pid]
+        self._cc[pid] = (cc + 1) & 0x0F
+        if pid in self.pcr_pids and at - self._last_pcr[pid] >= self.PCR_INTERVAL:
+            self._last_pcr[pid] = at
+            pcr = int(at * 27_000_000) % ((1 << 33) * 300)
+            base, ext = divmod(pcr, 300)
+            out[off + 3] = 0x30 | cc
+            out[off + 4] = 7
+            out[off + 5] = 0x10
+            struct.pack_into(">IH", out, off + 6, base >> 1, (base & 1) << 15 | 0x7E00 | ext)
+        else:
+            out[off + 3] = 0x10 | cc
+
+
+class FakeTuner:
+    def __init__(self):
+        self.channel = None
+        self.program = 0
+        self.lockkey = None
+        self.channelmap = DEFAULT_CHANNELMAP
+        self.target = None
+        self.tuned_at = 0.0
+
+
+class FakeDevice:
+    """In-memory model of a device's get/set tree.
+
+    After a channel change a station's tuner reports no lock for
+    ``lock_delay`` seconds and lists its programs unnamed for another
+    ``psip_delay`` seconds; ``timing`` overrides both per channel as
+    ``{channel: (lock_delay, psip_delay)}``.
+    """
+
+    def __init__(
+        self,
+        tuner_count: int = 4,
+        stations: dict | None = None,
+        lock_delay: float = 0.0,
+        psip_delay: float = 0.0,
+        timing: dict[int, tuple[float, float]] | None = None,
+    ):
+        self.tuners = [FakeTuner() for _ in range(tuner_count)]
+        self.stations = DEFAULT_STATIONS if stations is None else stations
+        self.lock_delay = lock_delay
+        self.psip_delay = psip_delay
+        self.timing = timing or {}
+        self._lock = threading.Lock()
+        self._streamer: threading.Thread | None = None
+
+    def _tuner(self, name: str) -> tuple[FakeTuner, str]:
+        parts = name.strip("/").split("/", 1)
+        if len(parts) != 2 or not parts[0].startswith("tuner"):
+            raise DeviceError("ERROR: unknown getset variable")
+        try:
+            return self.tuners[int(parts[0][5:])], parts[1]
+        except (ValueError, IndexError):
+            raise DeviceError("ERROR: unknown getset variable") from None
+
+    def get(self, name: str) -> str:
+        if name == "/sys/version":
+            return "20231214"
+        if name == "/sys/model":
+            return "hdhomerun5_atsc"
+        with self._lock:
+            tuner, item = self._tuner(name)
+            station = self.stations.get(tuner.channel)
+            phase = self._phase(tuner) if station is not None else 2
+            if item == "status":
+                return self._status(tuner, station, phase)
+            if item == "streaminfo":
+                return self._streaminfo(station, phase)
+            if item == "debug":
+                return self._debug(tuner, station)
+            if item == "channel":
+                return f"auto:{tuner.channel}" if tuner.channel else "none"
+            if item == "program":
+                return str(tuner.program)
+            if item == "lockkey":
+                return "none" if tuner.lockkey is None else str(tuner.lockkey)
+            if item == "channelmap":
+                return tuner.channelmap
+            if item == "target":
+                return tuner.target or "none"
+        raise DeviceError("ERROR: unknown getset variable")
+
+    def set(self, name: str, value: str, lockkey: int | None = None) -> str:
+        with self._lock:
+            tuner, item = self._tuner(name)
+            if item == "lockkey":
+                if value == "force" or (value == "none" and lockkey == tuner.lockkey):
+                    tuner.lockkey = None
+                elif value == "none":
+                    if tuner.lockkey is not None:
+                        raise DeviceError("ERROR: resource locked")
+                elif tuner.lockkey not in (None, lockkey):
+                    raise DeviceError("ERROR: resource locked")
+                else:
+                    tuner.lockkey = int(value)
+                return value
+            if tuner.lockkey is not None and lockkey != tuner.lockkey:
+                raise DeviceError("ERROR: resource locked")
+            if item == "channel":
+                tuner.program = 0
+                if value == "none":
+                    tuner.channel = None
+                else:
+                    try:
+                        number = int(value.rsplit(":", 1)[-1])
+                    except ValueError:
+                        raise DeviceError("ERROR: invalid channel") from None
+                    if number >= MIN_FREQUENCY:
+                        number = get_plan(tuner.channelmap).channel(number) or number
+                    tuner.channel = number
+                    tuner.tuned_at = time.monotonic()
+                return value
+            if item == "program":
+                tuner.program = int(value)
+                return value
+            if item == "channelmap":
+                if value not in PLANS:
+                    raise DeviceError("ERROR: invalid channelmap")
+                tuner.channelmap = value
+                return value
+            if item == "target":
+                if value != "none" and not value.startswith(("udp://", "rtp://")):
+                    raise DeviceError("ERROR: invalid target")
+                tuner.target = None if value == "none" else value
+                if tuner.target:
+                    self._start_streamer()
+                return value
+        raise DeviceError("ERROR: unknown getset variable")
+
+    def _start_streamer(self) -> None:
+        if self._streamer is None:
+            self._streamer = threading.Thread(target=self._stream, name="fake-ts", daemon=True)
+            self._streamer.start()
+
+    def _stream(self) -> None:
+        """Send each targeted, locked tuner's mux to its UDP target in 7-packet datagrams."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        muxes: dict[int, tuple] = {}
+        started = time.monotonic()
+        sent: dict[int, int] = {}
+        while True:
+            time.sleep(0.005)
+            now = time.monotonic()
+            with self._lock:
+                active = [
+                    (idx, t.target, t.channel, self.stations.get(t.channel))
+                    for idx, t in enumerate(self.tuners)
+                    if t.target and t.channel is not None
+                ]
+            for idx, target, channel, station in active:
+                if station is None:
+                    continue
+                key = muxes.get(idx)
+                if key is None or key[0] != (target, channel):
+                    mux = SyntheticMux([prog for prog, _, _ in station[2]])
+                    muxes[idx] = key = ((target, channel), mux)
+                    sent[idx] = int((now - started) * mux.bitrate / 1504)
+                mux = key[1]
+                host, _, port = target.split("://", 1)[1].rpartition(":")
+                due = int((now - started) * mux.bitrate / 1504) - sent[idx]
+                for _ in range(min(due // 7, 200)):
+                    data = mux.packets(7, sent[idx] * 1504 / mux.bitrate)
+                    sent[idx] += 7
+                    try:
+                        sock.sendto(data, (host, int(port)))
+                    except OSError:
+                        break
+
+    def _phase(self, tuner: FakeTuner) -> int:
+        """0 before lock, 1 locked without PSIP, 2 programs named."""
+        lock_delay, psip_delay = self.timing.get(tuner.channel, (self.lock_delay, self.psip_delay))
+        elapsed = time.monotonic() - tuner.tuned_at
+        if elapsed < lock_delay:
+            return 0
+        return 1 if elapsed < lock_delay + psip_delay else 2
+
+    @staticmethod
+    def _status(tuner: FakeTuner, station, phase: int) -> str:
+        if tuner.channel is None:
+            return "ch=none lock=none ss=0 snq=0 seq=0 bps=0 pps=0"
+        freq = get_plan(tuner.channelmap).frequency(tuner.channel) or tuner.channel
+        if station is None:
+            return f"ch=auto:{freq} lock=none ss=12 snq=0 seq=0 bps=0 pps=0"
+        ss, snq, _ = station
+        if phase == 0:
+            return f"ch=auto:{freq} lock=none ss={ss} snq=0 seq=0 bps=0 pps=0"
+        return f"ch=auto:{freq} lock=8vsb ss={ss} snq={snq} seq=100 bps=19394080 pps=1842"
+
+    @staticmethod
+    def _streaminfo(station, phase: int) -> str:
+        if station is None or phase == 0:
+            return "none"
+        if phase == 1:
+            lines = [f"{prog}: 0" for prog, _, _ in station[2]]
+        else:
+            lines = [f"{prog}: {vch} {name}" for prog, vch, name in station[2]]
+        lines.append("tsid=0x0451")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _debug(tuner: FakeTuner, station) -> str:
+        locked = station is not None
+        dev_bps = 19394080 if locked else 0
+        ts_bps = (6000000 if tuner.program else dev_bps) if locked else 0
+        return "\n".join(
+            [
+                f"tun: ch=auto:{tuner.channel or 'none'} lock={'8vsb' if locked else 'none'}",
+                f"dev: bps={dev_bps} resync=0 overflow=0",
+                "cc:  bps=0 resync=0 overflow=0",
+                f"ts:  bps={ts_bps} te=0 crc=0",
+                "net: pps=0 err=0 stop=0",
+            ]
+        )
+
+
+class _ControlHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        device = self.server.device
+        latency = self.server.latency
+        while True:
+            try:
+                packet_type, tags = decode_packet(recv_packet(self.request))
+            except (OSError, DeviceError):
+                return
+            if packet_type != HDHOMERUN_TYPE_GETSET_REQ:
+                continue
+
+            name = value = lockkey = None
+            for tag, data in tags:
+                if tag == HDHOMERUN_TAG_GETSET_NAME:
+                    name = data.rstrip(b"\0").decode()
+                elif tag == HDHOMERUN_TAG_GETSET_VALUE:
+                    value = data.rstrip(b"\0").decode()
+                elif tag == HDHOMERUN_TAG_GETSET_LOCKKEY:
+                    (lockkey,) = struct.unpack(">I", data)
+
+            reply = [(HDHOMERUN_TAG_GETSET_NAME, (name or "").encode() + b"\0")]
+            try:
+                if value is None:
+                    result = device.get(name or "")
+                else:
+                    result = device.set(name or "", value, lockkey)
+                reply.append((HDHOMERUN_TAG_GETSET_VALUE, result.encode() + b"\0"))
+            except DeviceError as exc:
+                reply.append((HDHOMERUN_TAG_ERROR_MESSAGE, str(exc).encode() + b"\0"))
+            if latency:
+                time.sleep(latency)
+            try:
+                self.request.sendall(encode_packet(HDHOMERUN_TYPE_GETSET_RPY, reply))
+            except OSError:
+                return
+
+
+class FakeDeviceServer(socketserver.ThreadingTCPServer):
+    """Threaded control-protocol server backed by a :class:`FakeDevice`.
+
+    Bind to port 0 to get an ephemeral port, available as :attr:`port`.
+    ``latency`` delays every reply by that many seconds to mimic a real
+    device's command round trip.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        device: FakeDevice | None = None,
+        latency: float = 0.0,
+    ):
+        super().__init__((host, port), _ControlHandler)
+        self.device = device or FakeDevice()
+        self.latency = latency
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> threading.Thread:
+        """Serve in a daemon thread and return it."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _DiscoverHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        try:
+            packet_type, tags = decode_packet(data)
+        except DeviceError:
+            return
+        if packet_type != HDHOMERUN_TYPE_DISCOVER_REQ:
+            return
+        fields = {tag: struct.unpack(">I", value)[0] for tag, value in tags if len(value) == 4}
+        server = self.server
+        device_type = fields.get(HDHOMERUN_TAG_DEVICE_TYPE, HDHOMERUN_DEVICE_TYPE_WILDCARD)
+        device_id = fields.get(HDHOMERUN_TAG_DEVICE_ID, HDHOMERUN_DEVICE_ID_WILDCARD)
+        if device_type not in (HDHOMERUN_DEVICE_TYPE_TUNER, HDHOMERUN_DEVICE_TYPE_WILDCARD):
+            return
+        if device_id not in (server.device_id, HDHOMERUN_DEVICE_ID_WILDCARD):
+            return
+        host = sock.getsockname()[0]
+        reply = encode_packet(
+            HDHOMERUN_TYPE_DISCOVER_RPY,
+            [
+                (HDHOMERUN_TAG_DEVICE_TYPE, struct.pack(">I", HDHOMERUN_DEVICE_TYPE_TUNER)),
+                (HDHOMERUN_TAG_DEVICE_ID, struct.pack(">I", server.device_id)),
+                (HDHOMERUN_TAG_TUNER_COUNT, bytes([len(server.device.tuners)])),
+                (HDHOMERUN_TAG_BASE_URL, f"http://{host}:80".encode()),
+            ],
+        )
+        sock.sendto(reply, self.client_address)
+
+
+FAKE_DEVICE_ID = 0x1FA4E000  # the first fake device; --devices counts up from it
+
+
+class DiscoveryResponder(socketserver.ThreadingUDPServer):
+    """Answer UDP discover requests for a :class:`FakeDeviceServer`.
+
+    Binds the UDP port with the control server's number, as a real device
+    does on 65001, so the reply's source address leads to the control port.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, control: FakeDeviceServer, device_id: int = FAKE_DEVICE_ID):
+        super().__init__(control.server_address, _DiscoverHandler)
+        self.device = control.device
+        self.device_id = device_id
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+# -- hdhomerun_config stand-in ---------------------------------------------------
+
+SCAN_LOCK_TIMEOUT = 2.5  # seconds, as in parallel_scan
+SCAN_PSIP_TIMEOUT = 5.0
+
+
+def scan_tuner(client, tuner: int, out) -> None:
+    """Write ``hdhomerun_config scan`` output for every channel of the tuner's plan."""
+    plan = get_plan(parse_channelmap(client.get(f"/tuner{tuner}/channelmap")))
+    for channel in plan.channels:
+        out.write(f"SCANNING: {plan.frequency(channel)} ({plan.name}:{channel})\n")
+        out.flush()
+        client.set(f"/tuner{tuner}/channel", f"auto:{plan.frequency(channel)}")
+        started = time.monotonic()
+        fields = wait_for_lock(client, tuner, started + SCAN_LOCK_TIMEOUT, started)
+        lock = fields.get("lock", "none")
+        levels = " ".join(f"{key}={fields.get(key, 0)}" for key in ("ss", "snq", "seq"))
+        out.write(f"LOCK: {lock} ({levels})\n")
+        if lock != "none":
+            programs = wait_for_programs(client, tuner, time.monotonic() + SCAN_PSIP_TIMEOUT)
+            tsid = client.get(f"/tuner{tuner}/streaminfo").rpartition("tsid=")[2]
+            if tsid:
+                out.write(f"TSID: {tsid}\n")
+            for program in programs:
+                out.write(f"PROGRAM {program['id']}: {program['num']} {program['name']}\n")
+        out.flush()
+    client.set(f"/tuner{tuner}/channel", "none")
+
+
+def config_main(argv: list[str], out=sys.stdout, err=sys.stderr) -> int:
+    """Emulate ``hdhomerun_config`` against the devices in ``HDHOMERUN_DEVICE``.
+
+    ``FAKE_HDHOMERUN_DEVICES`` takes precedence, so discovery can be
+    exercised with ``HDHOMERUN_DEVICE`` unset.
+    """
+    spec = os.environ.get("FAKE_HDHOMERUN_DEVICES") or os.environ.get("HDHOMERUN_DEVICE", "")
+    devices = dict(parse_device_list(spec)) if spec else {}
+    if argv[:1] == ["discover"]:
+        if not devices:
+            out.write("no devices found\n")
+            return 1
+        for device_id, address in devices.items():
+            out.write(f"hdhomerun device {device_id} found at {address.partition(':')[0]}\n")
+        return 0
+    if len(argv) < 3 or argv[1] not in ("get", "set", "scan"):
+        err.write("usage: hdhomerun_config <id> get|set|scan <item> [<value>]\n")
+        return 1
+    address = devices.get(argv[0])
+    if address is None:
+        err.write(f"hdhomerun_device_create: device {argv[0]} not found\n")
+        return 1
+    host, _, port = address.partition(":")
+    client = ControlClient(host, int(port or HDHOMERUN_CONTROL_PORT))
+    try:
+        if argv[1] == "scan":
+            scan_tuner(client, int(argv[2].strip("/").removeprefix("tuner")), out)
+        elif argv[1] == "get":
+            out.write(client.get(argv[2]) + "\n")
+        else:
+            client.set(argv[2], argv[3] if len(argv) > 3 else "")
+    except DeviceError as exc:
+        out.write(f"{exc}\n")  # the real tool reports device errors on stdout
+    except (OSError, ValueError) as exc:
+        err.write(f"communication error: {exc}\n")
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=HDHOMERUN_CONTROL_PORT)
+    parser.add_argument("--tuners", type=int, default=4)
+    parser.add_argument("--devices", type=int, default=1, help="devices on consecutive ports")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every reply")
+    parser.add_argument("--lock-delay", type=float, default=0.0, help="seconds until a station locks")
+    parser.add_argument("--psip-delay", type=float, default=0.0, help="seconds from lock to PSIP")
+    args = parser.parse_args()
+
+    servers = [
+        FakeDeviceServer(
+            args.host,
+            args.port + n,
+            FakeDevice(args.tuners, lock_delay=args.lock_delay, psip_delay=args.psip_delay),
+            args.latency,
+        )
+        for n in range(args.devices)
+    ]
+    for n, server in enumerate(servers):
+        DiscoveryResponder(server, FAKE_DEVICE_ID + n).start()
+    for server in servers[1:]:
+        server.start()
+    spec = ",".join(
+        f"{FAKE_DEVICE_ID + n:08X}@127.0.0.1:{server.port}" for n, server in enumerate(servers)
+    )
+    targets = ",".join(f"127.0.0.1:{server.port}" for server in servers)
+    print(f"fake HDHomeRun listening; HDHOMERUN_DEVICE={spec}")
+    print(f"or discover them with HDHOMERUN_DISCOVER_TARGETS={targets}")
+    servers[0].serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""Client for the HDHomeRun TCP control protocol.
+
+The device exposes its configuration tree (``/sys/version``,
+``/tuner0/status``, ...) through a small binary get/set protocol on TCP port
+65001. ``hdhomerun_config`` is a thin wrapper around the same protocol, so
+talking to the device directly saves a fork+exec on every call.
+
+Every packet is framed as::
+
+    type (u16 BE) | length (u16 BE) | payload | crc32 (u32 LE)
+
+where the payload is a sequence of tag/length/value entries. Lengths use a
+one or two byte variable-length encoding. Devices are found by sending the
+same kind of packet as a UDP broadcast to port 65001 (:func:`discover`).
+"""
+
+import socket
+import struct
+import subprocess
+import threading
+import time
+import zlib
+from typing import Callable
+
+HDHOMERUN_CONTROL_PORT = 65001
+HDHOMERUN_HTTP_PORT = 5004  # streaming: http://<ip>:5004/tunerN/ch<frequency>[-<program>]
+
+HDHOMERUN_TYPE_DISCOVER_REQ = 0x0002
+HDHOMERUN_TYPE_DISCOVER_RPY = 0x0003
+HDHOMERUN_TYPE_GETSET_REQ = 0x0004
+HDHOMERUN_TYPE_GETSET_RPY = 0x0005
+
+HDHOMERUN_TAG_DEVICE_TYPE = 0x01
+HDHOMERUN_TAG_DEVICE_ID = 0x02
+HDHOMERUN_TAG_GETSET_NAME = 0x03
+HDHOMERUN_TAG_GETSET_VALUE = 0x04
+HDHOMERUN_TAG_ERROR_MESSAGE = 0x05
+HDHOMERUN_TAG_TUNER_COUNT = 0x10
+HDHOMERUN_TAG_GETSET_LOCKKEY = 0x15
+HDHOMERUN_TAG_BASE_URL = 0x2A
+
+HDHOMERUN_DEVICE_TYPE_TUNER = 0x00000001
+HDHOMERUN_DEVICE_TYPE_WILDCARD = 0xFFFFFFFF
+HDHOMERUN_DEVICE_ID_WILDCARD = 0xFFFFFFFF
+
+_HEADER = struct.Struct(">HH")
+_CRC = struct.Struct("<I")
+_U32 = struct.Struct(">I")
+
+DISCOVER_BROADCAST = "255.255.255.255"
+
+
+class DeviceError(Exception):
+    """Raised when a device rejects a command or cannot be reached."""
+
+
+def encode_packet(packet_type: int, tags: list[tuple[int, bytes]]) -> bytes:
+    """Return a framed packet of ``packet_type`` carrying ``tags``."""
+
+    payload = bytearray()
+    for tag, value in tags:
+        length = len(value)
+        payload.append(tag)
+        if length <= 127:
+            payload.append(length)
+        else:
+            payload.append((length & 0x7F) | 0x80)
+            payload.append(length >> 7)
+        payload += value
+    frame = _HEADER.pack(packet_type, len(payload)) + payload
+    return frame + _CRC.pack(zlib.crc32(frame))
+
+
+def decode_packet(frame: bytes) -> tuple[int, list[tuple[int, bytes]]]:
+    """Validate ``frame`` and return ``(packet_type, tags)``."""
+
+    if len(frame) < _HEADER.size + _CRC.size:
+        raise DeviceError("short packet")
+    packet_type, length = _HEADER.unpack_from(frame)
+    end = _HEADER.size + length
+    if len(frame) != end + _CRC.size:
+        raise DeviceError("bad packet length")
+    (crc,) = _CRC.unpack_from(frame, end)
+    if crc != zlib.crc32(frame[:end]):
+        raise DeviceError("bad packet crc")
+
+    tags = []
+    pos = _HEADER.size
+    while pos < end:
+        if pos + 2 > end:
+            raise DeviceError("truncated tag")
+        tag = frame[pos]
+        tag_len = frame[pos + 1]
+        pos += 2
+        if tag_len & 0x80:
+            if pos >= end:
+                raise DeviceError("truncated tag")
+            tag_len = (tag_len & 0x7F) | (frame[pos] << 7)
+            pos += 1
+        if pos + tag_len > end:
+            raise DeviceError("truncated tag")
+        tags.append((tag, frame[pos : pos + tag_len]))
+        pos += tag_len
+    return packet_type, tags
+
+
+def _recv_exact(sock: socket.socket, count: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < count:
+        chunk = sock.recv(count - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed by device")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_packet(sock: socket.socket) -> bytes:
+    """Read one complete framed packet from a stream socket."""
+
+    header = _recv_exact(sock, _HEADER.size)
+    _, length = _HEADER.unpack(header)
+    return header + _recv_exact(sock, length + _CRC.size)
+
+
+def _cstr(value: str) -> bytes:
+    return value.encode() + b"\0"
+
+
+def _text(value: bytes) -> str:
+    return value.rstrip(b"\0").decode(errors="replace")
+
+
+def _timed(on_request, op: str, name: str, fn, *args) -> str:
+    if on_request is None:
+        return fn(*args)
+    started = time.perf_counter()
+    ok = False
+    try:
+        result = fn(*args)
+        ok = True
+        return result
+    finally:
+        on_request(op, name, time.perf_counter() - started, ok)
+
+
+class ControlClient:
+    """Persistent control connection to a single device.
+
+    The socket is opened lazily and reused for every request. Devices drop
+    idle connections, so a request that fails on a reused socket is retried
+    once on a fresh connection before raising :class:`DeviceError`.
+
+    ``on_request(op, name, seconds, ok)`` is called after every get/set with
+    its duration, including time spent waiting for the connection.
+    """
+
+    supports_lockkey = True  # sets can pass the lockkey of a locked tuner
+
+    def __init__(
+        self,
+        host: str,
+        port: int = HDHOMERUN_CONTROL_PORT,
+        timeout: float = 2.5,
+        on_request: Callable[[str, str, float, bool], None] | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.on_request = on_request
+        self._sock: socket.socket | None = None
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> str:
+        """Return the value of ``name``."""
+        return _timed(self.on_request, "get", name, self._request, name)
+
+    def set(self, name: str, value, lockkey: int | None = None) -> str:
+        """Set ``name`` to ``value`` and return the value echoed by the device."""
+        return _timed(self.on_request, "set", name, self._request, name, str(value), lockkey)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_socket()
+
+    def _close_socket(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _request(self, name: str, value: str | None = None, lockkey: int | None = None) -> str:
+        tags = [(HDHOMERUN_TAG_GETSET_NAME, _cstr(name))]
+        if value is not None:
+            tags.append((HDHOMERUN_TAG_GETSET_VALUE, _cstr(value)))
+        if lockkey is not None:
+            tags.append((HDHOMERUN_TAG_GETSET_LOCKKEY, struct.pack(">I", lockkey)))
+        request = encode_packet(HDHOMERUN_TYPE_GETSET_REQ, tags)
+
+        with self._lock:
+            for attempt in range(2):
+                fresh = self._sock is None
+                try:
+                    if fresh:
+                        self._sock = socket.create_connection(
+                            (self.host, self.port), timeout=self.timeout
+                        )
+                        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self._sock.sendall(request)
+                    reply = recv_packet(self._sock)
+                    break
+                except OSError as exc:
+                    self._close_socket()
+                    if fresh or attempt:
+                        raise DeviceError(
+                            f"communication error with {self.host}: {exc}"
+                        ) from exc
+
+        packet_type, reply_tags = decode_packet(reply)
+        if packet_type != HDHOMERUN_TYPE_GETSET_RPY:
+            raise DeviceError(f"unexpected reply type 0x{packet_type:04x}")
+
+        result = None
+        for tag, data in reply_tags:
+            if tag == HDHOMERUN_TAG_ERROR_MESSAGE:
+                raise DeviceError(_text(data))
+            if tag == HDHOMERUN_TAG_GETSET_VALUE:
+                result = _text(data)
+        if result is None:
+            raise DeviceError(f"no value returned for {name}")
+        return result
+
+
+def discover_request(device_id: int = HDHOMERUN_DEVICE_ID_WILDCARD) -> bytes:
+    """The UDP discover packet asking every tuner device (or ``device_id``) to reply."""
+    return encode_packet(
+        HDHOMERUN_TYPE_DISCOVER_REQ,
+        [
+            (HDHOMERUN_TAG_DEVICE_TYPE, _U32.pack(HDHOMERUN_DEVICE_TYPE_TUNER)),
+            (HDHOMERUN_TAG_DEVICE_ID, _U32.pack(device_id)),
+        ],
+    )
+
+
+def parse_discover_reply(frame: bytes) -> tuple[str, int | None] | None:
+    """Return ``(device_id, tuner_count)`` from a tuner's discover reply, else ``None``."""
+    try:
+        packet_type, tags = decode_packet(frame)
+    except DeviceError:
+        return None
+    if packet_type != HDHOMERUN_TYPE_DISCOVER_RPY:
+        return None
+    fields = dict(tags)
+    device_type = fields.get(HDHOMERUN_TAG_DEVICE_TYPE)
+    device_id = fields.get(HDHOMERUN_TAG_DEVICE_ID)
+    if device_id is None or len(device_id) != 4:
+        return None
+    if device_type is not None and _U32.unpack(device_type)[0] != HDHOMERUN_DEVICE_TYPE_TUNER:
+        return None  # e.g. a DVR storage engine
+    count = fields.get(HDHOMERUN_TAG_TUNER_COUNT)
+    return f"{_U32.unpack(device_id)[0]:08X}", count[0] if count else None
+
+
+def discover(
+    targets: list[tuple[str, int]] = (),
+    timeout: float = 0.5,
+    broadcast: bool = True,
+) -> list[tuple[str, str, int | None]]:
+    """Find devices by sending UDP discover requests and collecting replies.
+
+    The request is broadcast on port 65001 (unless ``broadcast`` is false)
+    and sent to every ``(host, port)`` in ``targets``, e.g. devices on other
+    subnets. Replies are collected until ``timeout`` seconds have passed.
+    Returns ``[(device_id, address, tuner_count), ...]`` ordered by id;
+    ``address`` carries ``:port`` when the device did not answer from 65001.
+    Raises :class:`DeviceError` when no request could be sent.
+    """
+    request = discover_request()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.bind(("", 0))
+        destinations = list(targets)
+        if broadcast:
+            destinations.insert(0, (DISCOVER_BROADCAST, HDHOMERUN_CONTROL_PORT))
+        sent = 0
+        error = None
+        for destination in destinations:
+            try:
+                sock.sendto(request, destination)
+                sent += 1
+            except OSError as exc:  # e.g. no route for broadcasts
+                error = exc
+        if not sent:
+            raise DeviceError(f"discovery failed: {error}")
+
+        found = {}
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            sock.settimeout(remaining)
+            try:
+                frame, (host, port) = sock.recvfrom(2048)
+            except socket.timeout:
+                break
+            except OSError:  # e.g. ICMP port unreachable from a unicast target
+                continue
+            reply = parse_discover_reply(frame)
+            if reply is not None:
+                address = host if port == HDHOMERUN_CONTROL_PORT else f"{host}:{port}"
+                found[reply[0]] = (reply[0], address, reply[1])
+        return [found[device_id] for device_id in sorted(found)]
+    finally:
+        sock.close()
+
+
+class SubprocessClient:
+    """Fallback client that shells out to ``hdhomerun_config``.
+
+    Exposes the same interface as :class:`ControlClient`. ``hdhomerun_config``
+    has no way to pass a lockkey with a set, so ``lockkey`` is ignored.
+    """
+
+    supports_lockkey = False
+
+    def __init__(
+        self,
+        device_id: str,
+        timeout: float = 10.0,
+        on_request: Callable[[str, str, float, bool], None] | None = None,
+    ):
+        self.device_id = device_id
+        self.timeout = timeout
+        self.on_request = on_request
+
+    def get(self, name: str) -> str:
+        return _timed(self.on_request, "get", name, self._run, "get", name)
+
+    def set(self, name: str, value, lockkey: int | None = None) -> str:
+        return _timed(self.on_request, "set", name, self._run, "set", name, str(value))
+
+    def close(self) -> None:
+        pass
+
+    def _run(self, *args: str) -> str:
+        cmd = ["hdhomerun_config", self.device_id, *args]
+        try:
+            proc = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=self.timeout
+            )
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            raise DeviceError(str(exc)) from exc
+        out = proc.stdout.strip()
+        if proc.returncode != 0:
+            raise DeviceError(proc.stderr.strip() or out or "hdhomerun_config failed")
+        if out.startswith("ERROR"):
+            raise DeviceError(out)
+        return out
+
+
+def parse_status(line: str) -> dict[str, str]:
+    """Split a ``/tunerN/status`` line into its ``key=value`` fields.
+
+    Example: ``ch=8vsb:485000000 lock=8vsb ss=85 snq=90 seq=100 bps=... pps=0``
+    """
+    fields = {}
+    for part in line.split():
+        key, sep, value = part.partition("=")
+        if sep:
+            fields[key] = value
+    return fields
+
+
+def parse_streaminfo(raw: str) -> list[dict]:
+    """Return ``[{id, num, name}, ...]`` for programs listed in streaminfo.
+
+    Example line: ``3: 8.2 WAGMFOX``. Programs without a virtual channel or
+    name (e.g. ``5: 0``) are skipped.
+    """
+    programs = []
+    for line in raw.strip().splitlines():
+        parts = line.split()
+        if not parts or not parts[0].endswith(":"):
+            continue
+        try:
+            prog_id = int(parts[0].rstrip(":"))
+        except ValueError:
+            continue
+
+        if len(parts) < 2 or "." not in parts[1]:
+            continue
+        vchannel = parts[1]
+
+        name_tokens = []
+        idx = 2
+        while idx < len(parts) and "=" not in parts[idx]:
+            name_tokens.append(parts[idx])
+            idx += 1
+        name = " ".join(name_tokens)
+
+        if vchannel and name:
+            programs.append({"id": prog_id, "num": vchannel, "name": name})
+    return programs
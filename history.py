@@ -0,0 +1,146 @@
+"""Compact in-memory time series of tuner signal samples.
+
+Each series keeps three ring-buffer tiers fed from the 1 Hz samples:
+
+* 1 s resolution for the last hour
+* 10 s averages for the last day
+* 1 min averages for the last week
+
+Values live in ``array`` columns (one byte per percentage, four bytes per
+timestamp and bitrate), so a week of data for one tuner is about 250 KB.
+"""
+
+import threading
+import time
+from array import array
+
+# (resolution seconds, number of slots)
+DEFAULT_TIERS = ((1, 3600), (10, 8640), (60, 10080))
+
+FIELDS = ("ss", "snq", "seq", "bitrate")
+
+
+class _Tier:
+    """One fixed-resolution ring buffer plus the bucket being accumulated."""
+
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.times = array("I", bytes(4 * capacity))
+        self.ss = array("B", bytes(capacity))
+        self.snq = array("B", bytes(capacity))
+        self.seq = array("B", bytes(capacity))
+        self.bitrate = array("I", bytes(4 * capacity))
+        self._bucket = -1
+        self._sums = [0, 0, 0, 0]
+        self._count = 0
+
+    def add(self, ts: int, values: tuple[int, int, int, int]) -> None:
+        bucket = ts - ts % self.resolution
+        if bucket != self._bucket:
+            self._bucket = bucket
+            self._sums = [0, 0, 0, 0]
+            self._count = 0
+        sums = self._sums
+        for i, v in enumerate(values):
+            sums[i] += v
+        self._count += 1
+        # The open bucket is rewritten on every sample, so queries see it as
+        # a running average and nothing is lost when sampling stops.
+        self._store()
+
+    def _store(self) -> None:
+        slot = (self._bucket // self.resolution) % self.capacity
+        n = self._count
+        self.times[slot] = self._bucket
+        self.ss[slot] = self._sums[0] // n
+        self.snq[slot] = self._sums[1] // n
+        self.seq[slot] = self._sums[2] // n
+        self.bitrate[slot] = min(self._sums[3] // n, 0xFFFFFFFF)
+
+    def oldest(self, now: int) -> int:
+        return now - self.resolution * self.capacity
+
+    def rows(self, start: int, end: int):
+        """Yield ``(time, ss, snq, seq, bitrate)`` for stored buckets in range."""
+        res = self.resolution
+        first = max(start - start % res, end - end % res - res * (self.capacity - 1))
+        for bucket in range(first, end + 1, res):
+            slot = (bucket // res) % self.capacity
+            if self.times[slot] == bucket:
+                yield bucket, self.ss[slot], self.snq[slot], self.seq[slot], self.bitrate[slot]
+
+
+class HistoryRecorder:
+    """Record samples per series key and answer downsampled range queries."""
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = tiers
+        self._series: dict = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, key, timestamp: float, ss: int, snq: int, seq: int, bitrate: int | None
+    ) -> None:
+        values = (
+            max(0, min(int(ss), 255)),
+            max(0, min(int(snq), 255)),
+            max(0, min(int(seq), 255)),
+            max(0, int(bitrate or 0)),
+        )
+        ts = int(timestamp)
+        with self._lock:
+            tiers = self._series.get(key)
+            if tiers is None:
+                tiers = self._series[key] = [_Tier(res, cap) for res, cap in self.tiers]
+            for tier in tiers:
+                tier.add(ts, values)
+
+    def query(self, key, start: float, end: float, step: float | None = None) -> dict:
+        """Return points for ``key`` between ``start`` and ``end``.
+
+        Uses the finest tier that still covers ``start`` and is no finer than
+        ``step``, then averages its buckets into ``step``-second points.
+        Without ``step`` the range is split into at most ~1000 points.
+        """
+        start_i, end_i = int(start), int(end)
+        if step is None or step <= 0:
+            step = max(1, (end_i - start_i) // 1000)
+        step = int(max(1, step))
+        now = int(time.time())
+
+        with self._lock:
+            tiers = self._series.get(key)
+            if tiers is None:
+                return {"resolution": None, "step": step, "points": []}
+
+            chosen = tiers[-1]
+            for tier in tiers:
+                if tier.resolution <= step and tier.oldest(now) <= start_i:
+                    chosen = tier
+                    break
+            step = max(step, chosen.resolution)
+            rows = list(chosen.rows(start_i, end_i))
+
+        points = []
+        bucket = None
+        sums = [0, 0, 0, 0]
+        count = 0
+        for t, *values in rows:
+            b = t - t % step
+            if b != bucket:
+                if count:
+                    points.append([bucket] + [s // count for s in sums])
+                bucket, sums, count = b, [0, 0, 0, 0], 0
+            for i, v in enumerate(values):
+                sums[i] += v
+            count += 1
+        if count:
+            points.append([bucket] + [s // count for s in sums])
+
+        return {
+            "resolution": chosen.resolution,
+            "step": step,
+            "fields": ["time", *FIELDS],
+            "points": points,
+        }
@@ -0,0 +1,242 @@
+"""Tuner leases: who is using which tuner, for how long.
+
+:class:`TunerAllocator` hands tuners out as leases with a TTL. Taking a
+lease also takes the tuner's device lockkey, so other clients of the device
+(other workers, other apps) cannot change it either, and every command made
+under the lease passes that lockkey. A backend that cannot pass a lockkey
+(``hdhomerun_config``) would lock itself out, so there leases are kept by
+the allocator only and ``lockkey`` is ``None``. Expired leases are released
+by a reaper thread.
+
+Without a specific tuner the allocator picks the least disruptive one: an
+idle tuner (untuned, unlocked) first, then one left tuned to a channel
+without signal, highest index first. Tuners held by another lease or by
+someone else's lockkey are never taken; a tuner asked for by index only
+needs to be unlocked. When nothing is free, callers may wait; waiters for
+an automatic pick on a device are served in arrival order.
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable
+
+from hdhomerun import DeviceError
+from parallel_scan import tuner_states
+
+LEASE_POLL = 1.0  # seconds between device re-checks while queued
+
+
+class LeaseError(Exception):
+    """A tuner cannot be used as asked; ``status`` is the HTTP status to answer."""
+
+    def __init__(self, message: str, status: int = 409):
+        super().__init__(message)
+        self.status = status
+
+
+class Lease:
+    """One tuner held by one caller until ``expires`` (``time.time()``)."""
+
+    def __init__(self, device, tuner: int, lockkey: int | None, ttl: float, purpose: str):
+        self.id = str(uuid.uuid4())
+        self.device = device
+        self.device_id = device.id
+        self.tuner = tuner
+        self.lockkey = lockkey
+        self.purpose = purpose
+        self.created = time.time()
+        self.expires = self.created + ttl
+
+    def as_dict(self) -> dict:
+        return {
+            "lease_id": self.id,
+            "device": self.device_id,
+            "tuner": self.tuner,
+            "lockkey": self.lockkey,
+            "purpose": self.purpose,
+            "created": self.created,
+            "expires": self.expires,
+        }
+
+
+def disruption(state: dict | None) -> int | None:
+    """Rank how disruptive taking a tuner would be; ``None`` means never."""
+    if state is None or state["lockkey"] != "none":
+        return None
+    if state["channel"] == "none":
+        return 0
+    if state["lock"] == "none":
+        return 1  # tuned, but nothing is being received
+    return None
+
+
+class TunerAllocator:
+    """Lease tuners of the devices returned by the registry.
+
+    ``clients(device)`` returns the device's control clients (see
+    :func:`batch.run_batch`); the first is used for lockkey commands.
+    """
+
+    def __init__(self, clients: Callable[[object], list], ttl: float = 300.0):
+        self.clients = clients
+        self.ttl = ttl
+        self._leases: dict[str, Lease] = {}
+        self._by_tuner: dict[tuple[str, int], Lease | None] = {}  # None: being acquired
+        self._queues: dict[str, deque] = {}
+        self._cond = threading.Condition()
+        self._reaper: threading.Thread | None = None
+
+    # -- queries ------------------------------------------------------------
+
+    def get(self, lease_id: str) -> Lease | None:
+        with self._cond:
+            return self._leases.get(lease_id)
+
+    def leases(self, device_id: str | None = None) -> list[Lease]:
+        with self._cond:
+            leases = list(self._leases.values())
+        return [
+            lease
+            for lease in sorted(leases, key=lambda l: (l.device_id, l.tuner))
+            if device_id is None or lease.device_id == device_id
+        ]
+
+    def leased(self, device_id: str) -> set[int]:
+        """Return the tuners of ``device_id`` currently leased (or being leased)."""
+        with self._cond:
+            return {tuner for (dev, tuner) in self._by_tuner if dev == device_id}
+
+    # -- acquire / renew / release -------------------------------------------
+
+    def acquire(
+        self,
+        device,
+        tuner: int | None = None,
+        ttl: float | None = None,
+        wait: float = 0.0,
+        purpose: str = "",
+        reserve: int = 0,
+    ) -> Lease | None:
+        """Lease ``tuner`` (or the least disruptive free tuner) of ``device``.
+
+        Waits up to ``wait`` seconds in the device's queue when none is free.
+        ``reserve`` leaves that many other free tuners untouched (only for
+        automatic picks). Returns ``None`` if no tuner could be leased.
+        """
+        self._ensure_reaper()
+        deadline = time.monotonic() + wait
+        ticket = object()
+        with self._cond:
+            queue = self._queues.setdefault(device.id, deque())
+            if tuner is None:
+                queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    first = tuner is not None or queue[0] is ticket
+                if first:
+                    lease = self._try_acquire(device, tuner, ttl or self.ttl, purpose, reserve)
+                    if lease is not None:
+                        return lease
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                with self._cond:
+                    self._cond.wait(min(remaining, LEASE_POLL))
+        finally:
+            with self._cond:
+                if tuner is None:
+                    queue.remove(ticket)
+                self._cond.notify_all()
+
+    def renew(self, lease_id: str, ttl: float | None = None) -> Lease | None:
+        with self._cond:
+            lease = self._leases.get(lease_id)
+            if lease is not None:
+                lease.expires = time.time() + (ttl or self.ttl)
+            return lease
+
+    def release(self, lease_id: str, stop: bool = False) -> bool:
+        """End a lease, releasing the device lockkey (and stopping the tuner if ``stop``)."""
+        with self._cond:
+            lease = self._leases.pop(lease_id, None)
+        if lease is None:
+            return False
+        self._unlock(lease, stop)
+        with self._cond:
+            self._by_tuner.pop((lease.device_id, lease.tuner), None)
+            self._cond.notify_all()
+        return True
+
+    def expire(self) -> None:
+        """Release every lease past its expiry time."""
+        now = time.time()
+        with self._cond:
+            expired = [l.id for l in self._leases.values() if l.expires <= now]
+        for lease_id in expired:
+            self.release(lease_id, stop=True)
+
+    # -- internals ------------------------------------------------------------
+
+    def _try_acquire(self, device, tuner, ttl, purpose, reserve) -> Lease | None:
+        clients = self.clients(device)
+        states = tuner_states(clients, device.tuner_count or 0)
+        with self._cond:
+            candidates = []
+            for state in states:
+                if state is None or (device.id, state["tuner"]) in self._by_tuner:
+                    continue
+                if tuner is None:
+                    rank = disruption(state)
+                    if rank is not None:
+                        candidates.append((rank, -state["tuner"]))
+                elif state["tuner"] == tuner and state["lockkey"] == "none":
+                    candidates.append((0, -tuner))
+            if tuner is None and len(candidates) <= reserve:
+                return None
+            if not candidates:
+                return None
+            _, neg = min(candidates)
+            chosen = -neg
+            self._by_tuner[(device.id, chosen)] = None  # claim before talking to the device
+
+        device_lock = getattr(clients[0], "supports_lockkey", True)
+        lockkey = random.randrange(1, 2**31) if device_lock else None
+        lease = Lease(device, chosen, lockkey, ttl, purpose)
+        if device_lock:
+            try:
+                clients[0].set(f"/tuner{chosen}/lockkey", lease.lockkey)
+            except DeviceError:
+                with self._cond:
+                    self._by_tuner.pop((device.id, chosen), None)
+                return None  # someone else locked it first; the caller retries
+        with self._cond:
+            self._leases[lease.id] = lease
+            self._by_tuner[(device.id, chosen)] = lease
+        return lease
+
+    def _unlock(self, lease: Lease, stop: bool) -> None:
+        client = self.clients(lease.device)[0]
+        names = [f"/tuner{lease.tuner}/channel"] if stop else []
+        if lease.lockkey is not None:
+            names.append(f"/tuner{lease.tuner}/lockkey")
+        for name in names:
+            try:
+                client.set(name, "none", lockkey=lease.lockkey)
+            except DeviceError:
+                pass
+
+    def _ensure_reaper(self) -> None:
+        with self._cond:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap, name="lease-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(LEASE_POLL)
+            self.expire()
@@ -0,0 +1,104 @@
+"""Channel lineups built from stored scans, for players and guide tools.
+
+A lineup is every subchannel of each device's latest finished scan, as
+:func:`entries` yields them: ``{device, physical, program, num, name, url}``.
+The writers turn entries into an M3U playlist, an XMLTV channel list or a
+JSON array. Everything is a generator, and :func:`chunked` batches the
+output into blocks for the response, so a lineup of several devices and
+thousands of subchannels never sits in memory whole.
+"""
+
+import json
+from typing import Callable, Iterable, Iterator
+from xml.sax.saxutils import escape, quoteattr
+
+CHUNK_SIZE = 16 * 1024  # bytes per response block
+
+CONTENT_TYPES = {
+    "m3u": "audio/x-mpegurl; charset=utf-8",
+    "xml": "application/xml; charset=utf-8",
+    "json": "application/json",
+}
+
+
+def entries(
+    scans: Iterable[tuple[str, Iterable[dict]]],
+    stream_url: Callable[[str, int, dict], str],
+) -> Iterator[dict]:
+    """Flatten ``[(device_id, result groups), ...]`` into one entry per subchannel.
+
+    ``stream_url(device_id, physical, subchannel)`` gives each entry's URL.
+    """
+    for device_id, groups in scans:
+        for group in groups:
+            for sub in group.get("subchannels") or ():
+                yield {
+                    "device": device_id,
+                    "physical": group["physical"],
+                    "program": sub.get("id"),
+                    "num": sub["num"],
+                    "name": sub["name"],
+                    "url": stream_url(device_id, group["physical"], sub),
+                }
+
+
+def channel_id(entry: dict) -> str:
+    """The id shared by an M3U entry's ``tvg-id`` and its XMLTV channel."""
+    return f"{entry['num']}.{entry['device']}"
+
+
+def m3u(items: Iterable[dict], guide_url: str | None = None) -> Iterator[str]:
+    header = "#EXTM3U"
+    if guide_url:
+        header += f' x-tvg-url="{guide_url}"'
+    yield header + "\n"
+    for entry in items:
+        name = entry["name"].replace('"', "'")
+        yield (
+            f'#EXTINF:-1 tvg-id="{channel_id(entry)}" tvg-chno="{entry["num"]}"'
+            f' tvg-name="{name}" group-title="{entry["device"]}",{entry["num"]} {entry["name"]}\n'
+            f"{entry['url']}\n"
+        )
+
+
+def xmltv(items: Iterable[dict], generator: str = "HDHomerunTuner") -> Iterator[str]:
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
+        f"<tv generator-info-name={quoteattr(generator)}>\n"
+    )
+    for entry in items:
+        yield (
+            f"  <channel id={quoteattr(channel_id(entry))}>\n"
+            f"    <display-name>{escape(entry['num'])} {escape(entry['name'])}</display-name>\n"
+            f"    <display-name>{escape(entry['num'])}</display-name>\n"
+            f"    <display-name>{escape(entry['name'])}</display-name>\n"
+            "  </channel>\n"
+        )
+    yield "</tv>\n"
+
+
+def json_array(items: Iterable[dict]) -> Iterator[str]:
+    yield "["
+    separator = "\n"
+    for entry in items:
+        yield separator + json.dumps(entry)
+        separator = ",\n"
+    yield "\n]\n"
+
+
+WRITERS = {"m3u": m3u, "xml": xmltv, "json": json_array}
+
+
+def chunked(parts: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode ``parts`` and yield them in blocks of about ``size`` bytes."""
+    buffer, length = [], 0
+    for part in parts:
+        data = part.encode("utf-8")
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
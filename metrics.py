@@ -0,0 +1,142 @@
+"""Prometheus text exposition for tuner metrics.
+
+Gauges are rendered from the background sampler's snapshot at scrape time,
+so a scrape never talks to a device. Histograms (device command latency,
+scan duration) are updated as the work happens. Everything is kept in
+process; with several worker processes each worker reports its own
+histograms.
+
+The format is the plain-text exposition format (version 0.0.4), which both
+Prometheus and OpenMetrics scrapers accept.
+"""
+
+import bisect
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+COMMAND_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SCAN_BUCKETS = (10.0, 30.0, 60.0, 120.0, 180.0, 300.0, 600.0, 900.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...], labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labels, counts in sorted(series.items()):
+            total = 0
+            for bound, count in zip(self.buckets, counts):
+                total += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {total}")
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {counts[-1]}")
+            plain = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {_number(counts[-2])}")
+            lines.append(f"{self.name}_count{plain} {counts[-1]}")
+        return lines
+
+
+def gauge(name: str, help_text: str, samples: list[tuple[dict, float]]) -> list[str]:
+    """Render one gauge family from ``[(labels, value), ...]``; ``None`` values are skipped."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+    return lines
+
+
+device_command_seconds = Histogram(
+    "hdhomerun_device_command_seconds",
+    "Latency of device get/set commands.",
+    COMMAND_BUCKETS,
+    ("backend", "op", "result"),
+)
+scan_duration_seconds = Histogram(
+    "hdhomerun_scan_duration_seconds",
+    "Wall-clock duration of channel scans.",
+    SCAN_BUCKETS,
+    ("mode",),
+)
+
+# Per-tuner gauges rendered from sampler snapshots: (name, help, tuner field).
+TUNER_GAUGES = (
+    ("hdhomerun_tuner_locked", "1 if the tuner holds a signal lock.", "locked"),
+    ("hdhomerun_tuner_signal_strength", "Signal strength (ss), percent.", "ss"),
+    ("hdhomerun_tuner_signal_quality", "Signal-to-noise quality (snq), percent.", "snq"),
+    ("hdhomerun_tuner_symbol_quality", "Symbol error quality (seq), percent.", "seq"),
+    ("hdhomerun_tuner_ts_bps", "Transport stream bitrate, bits per second.", "bitrate"),
+    ("hdhomerun_tuner_dev_bps", "Device-side bitrate, bits per second.", "max_bitrate"),
+    ("hdhomerun_tuner_stale", "1 if the last successful read is older than the stale limit.", "stale"),
+    ("hdhomerun_tuner_sampled_timestamp_seconds", "Time of the tuner's last successful read.", "sampled_at"),
+)
+
+
+def render(devices: list, sample_time: float, tuners: list[dict]) -> str:
+    """Return the full exposition for ``devices`` and a sampler snapshot."""
+    lines = gauge(
+        "hdhomerun_device_tuners",
+        "Number of tuners on the device.",
+        [({"device": d.id}, d.tuner_count) for d in devices],
+    )
+    lines += gauge(
+        "hdhomerun_device_last_seen_timestamp_seconds",
+        "Time the device was last found by discovery.",
+        [({"device": d.id}, d.last_seen) for d in devices],
+    )
+    lines += gauge(
+        "hdhomerun_sample_timestamp_seconds",
+        "Time of the latest tuner sample.",
+        [({}, sample_time)] if sample_time else [],
+    )
+    for name, help_text, field in TUNER_GAUGES:
+        samples = []
+        for t in tuners:
+            value = t.get(field)
+            if isinstance(value, bool):
+                value = int(value)
+            samples.append(({"device": t["device"], "tuner": t["index"]}, value))
+        lines += gauge(name, help_text, samples)
+    lines += device_command_seconds.render()
+    lines += scan_duration_seconds.render()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,251 @@
+"""Background monitoring of known channels on a spare tuner.
+
+:class:`ChannelMonitor` walks each device's known physical channels (those
+that locked in its latest scan, plus any it has seen since) one probe at a
+time. A probe leases a tuner from the :class:`leases.TunerAllocator` only
+when at least ``reserve`` other tuners stay free, and releases it right
+after, so recordings and other clients are never disturbed. When no spare
+tuner is available the monitor backs off exponentially up to
+``backoff_max`` seconds.
+
+Each probe is compared with the previous result for that channel and a
+change (lock gained or lost, subchannels added or removed) is handed to
+``on_change``. :class:`WebhookSender` posts such events to a URL from its
+own thread.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from typing import Callable
+
+from hdhomerun import DeviceError
+from parallel_scan import probe_channel
+
+log = logging.getLogger(__name__)
+
+PROBE_LEASE_TTL = 60.0  # seconds; comfortably longer than one probe
+
+
+def _locked(group: dict | None) -> bool:
+    return group is not None and bool(group.get("lock") or group.get("subchannels"))
+
+
+def channel_changes(old: dict | None, new: dict) -> list[dict]:
+    """Return the changes between two probes of one physical channel.
+
+    Each change is ``{"change": "lock_gained" | "lock_lost" |
+    "subchannels_changed", "added": [...], "removed": [...]}``. Signal level
+    drift is not a change.
+    """
+    if not _locked(old):
+        if not _locked(new):
+            return []
+        return [{"change": "lock_gained", "added": new["subchannels"], "removed": []}]
+    if not _locked(new):
+        return [{"change": "lock_lost", "added": [], "removed": old["subchannels"]}]
+    before = {(s["num"], s["name"]) for s in old["subchannels"]}
+    after = {(s["num"], s["name"]) for s in new["subchannels"]}
+    if before == after:
+        return []
+    return [
+        {
+            "change": "subchannels_changed",
+            "added": [{"num": n, "name": m} for n, m in sorted(after - before)],
+            "removed": [{"num": n, "name": m} for n, m in sorted(before - after)],
+        }
+    ]
+
+
+class ChannelMonitor:
+    """Rotate a spare tuner through every device's known channels.
+
+    ``devices()`` returns the current devices, ``baseline(device)`` the
+    result groups of its latest scan, and ``clients(device)`` its control
+    clients (the first is used for probes). Tuners are leased from
+    ``allocator``. With several processes, ``leader()`` is asked before
+    every round and every ``interval`` while waiting; only the process it
+    returns true for probes, the others stand by.
+    """
+
+    def __init__(
+        self,
+        devices: Callable[[], list],
+        baseline: Callable[[object], list[dict]],
+        clients: Callable[[object], list],
+        allocator,
+        on_change: Callable[[dict], None] | None = None,
+        interval: float = 30.0,
+        reserve: int = 1,
+        backoff_max: float = 600.0,
+        probe: Callable[..., dict] = probe_channel,
+        leader: Callable[[], bool] | None = None,
+    ):
+        self.devices = devices
+        self.baseline = baseline
+        self.clients = clients
+        self.allocator = allocator
+        self.on_change = on_change
+        self.interval = interval
+        self.reserve = reserve
+        self.backoff_max = backoff_max
+        self.probe = probe
+        self.leader = leader
+        self.leading = leader is None
+        self.events: deque[dict] = deque(maxlen=100)
+        self._channels: dict[str, dict[int, dict]] = {}  # device -> physical -> last group
+        self._next: dict[str, int] = {}
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="channel-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _lead(self) -> bool:
+        if self.leader is not None:
+            self.leading = bool(self.leader())
+        return self.leading
+
+    def _pause(self, seconds: float) -> None:
+        """Wait ``seconds``, renewing leadership every ``interval`` meanwhile."""
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.wait(min(remaining, self.interval)):
+                return
+            if time.monotonic() < deadline:
+                self._lead()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self._lead():
+                self._stop.wait(self.interval)  # another process is monitoring
+                continue
+            busy = False
+            for device in self.devices():
+                try:
+                    busy |= not self.step(device)
+                except Exception:  # keep monitoring through unexpected errors
+                    log.exception("monitor probe on %s failed", device.id)
+            self._busy = self._busy + 1 if busy else 0
+            delay = self.interval * 2 ** min(self._busy, 16)
+            self._pause(min(delay, max(self.backoff_max, self.interval)))
+
+    def step(self, device) -> bool:
+        """Probe the device's next known channel; ``False`` when no tuner was spare."""
+        channels = self._known(device)
+        if not channels:
+            return True
+        order = sorted(channels)
+        with self._lock:
+            position = self._next.get(device.id, 0) % len(order)
+            self._next[device.id] = position + 1
+        physical = order[position]
+
+        lease = self.allocator.acquire(
+            device, ttl=PROBE_LEASE_TTL, purpose="monitor", reserve=self.reserve
+        )
+        if lease is None:
+            return False
+        try:
+            group = self.probe(self.clients(device)[0], lease.tuner, physical, lockkey=lease.lockkey)
+        except DeviceError:
+            return True
+        finally:
+            self.allocator.release(lease.id, stop=True)
+        self._record(device.id, physical, group)
+        return True
+
+    def _known(self, device) -> list[int]:
+        baseline = self.baseline(device)
+        with self._lock:
+            channels = self._channels.setdefault(device.id, {})
+            for group in baseline:
+                if _locked(group) and group["physical"] is not None:
+                    channels.setdefault(group["physical"], group)
+            return list(channels)
+
+    def _record(self, device_id: str, physical: int, group: dict) -> None:
+        now = time.time()
+        group = dict(group, checked_at=now)
+        with self._lock:
+            previous = self._channels[device_id].get(physical)
+            self._channels[device_id][physical] = group
+        for change in channel_changes(previous, group):
+            event = {
+                "device": device_id,
+                "physical": physical,
+                "lock": group["lock"],
+                "ss": group["ss"],
+                "snq": group["snq"],
+                "timestamp": now,
+                **change,
+            }
+            self.events.append(event)
+            if self.on_change is not None:
+                self.on_change(event)
+
+    def status(self) -> dict:
+        """Return ``{running, backoff, channels: [...], events: [...]}``."""
+        with self._lock:
+            channels = [
+                dict(group, device=device_id)
+                for device_id, groups in sorted(self._channels.items())
+                for _, group in sorted(groups.items())
+            ]
+        return {
+            "running": self.running,
+            "backoff": self._busy,
+            "channels": channels,
+            "events": list(self.events),
+        }
+
+
+class WebhookSender:
+    """POST JSON events to ``url`` from a background thread, dropping them on failure."""
+
+    def __init__(self, url: str, timeout: float = 5.0, queue_size: int = 256):
+        self.url = url
+        self.timeout = timeout
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        threading.Thread(target=self._run, name="monitor-webhook", daemon=True).start()
+
+    def send(self, event: dict) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            log.warning("monitor webhook queue full; dropping event")
+
+    def _run(self) -> None:
+        while True:
+            event = self._queue.get()
+            request = urllib.request.Request(
+                self.url,
+                data=json.dumps(event).encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+            except (OSError, urllib.error.URLError) as exc:
+                log.warning("monitor webhook to %s failed: %s", self.url, exc)
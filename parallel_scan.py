@@ -0,0 +1,189 @@
+"""Channel scan that spreads the channel plan across several tuners.
+
+``hdhomerun_config scan`` walks every channel on a single tuner. Here each
+free tuner runs a worker that pulls the next channel from a shared queue,
+tunes it with ``set /tunerN/channel auto:X``, waits for lock and reads the
+programs from ``streaminfo``. Faster tuners simply take more channels, so a
+four-tuner device finishes roughly four times sooner.
+
+An incremental rescan (:func:`incremental_channels`) probes only the
+channels that locked last time plus a rotating sample of the rest; the
+others are taken from the previous scan.
+"""
+
+import bisect
+import queue
+import threading
+import time
+from typing import Callable
+
+from batch import run_batch
+from hdhomerun import DeviceError, parse_status
+from tuning import wait_for_lock, wait_for_programs
+
+LOCK_TIMEOUT = 2.5  # seconds to wait for a demodulator lock
+PSIP_TIMEOUT = 5.0  # seconds to wait for programs once locked
+
+
+def probe_channel(
+    client,
+    tuner: int,
+    channel: int,
+    lock_timeout: float | None = None,
+    psip_timeout: float | None = None,
+    lockkey: int | None = None,
+) -> dict:
+    """Tune ``channel`` on ``tuner`` and return a scan-result group.
+
+    The group has the same shape as the scan parser's:
+    ``{physical, lock, ss, snq, subchannels: [{num, name, id}, ...]}``. Pass
+    ``lockkey`` when the caller holds the tuner's lock.
+    """
+    lock_timeout = LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+    psip_timeout = PSIP_TIMEOUT if psip_timeout is None else psip_timeout
+
+    group = {"physical": channel, "lock": None, "ss": 0, "snq": 0, "subchannels": []}
+    client.set(f"/tuner{tuner}/channel", f"auto:{channel}", lockkey=lockkey)
+
+    started = time.monotonic()
+    fields = wait_for_lock(client, tuner, started + lock_timeout, started)
+    lock = fields.get("lock", "none")
+    try:
+        group["ss"] = int(fields.get("ss", 0))
+        group["snq"] = int(fields.get("snq", 0))
+    except ValueError:
+        pass
+    if lock == "none":
+        return group
+    group["lock"] = lock.split(":", 1)[0]
+
+    programs = wait_for_programs(client, tuner, time.monotonic() + psip_timeout)
+    group["subchannels"] = [{"num": p["num"], "name": p["name"], "id": p["id"]} for p in programs]
+    return group
+
+
+def tuner_states(clients: list, tuner_count: int) -> list[dict | None]:
+    """Return ``{tuner, channel, lock, lockkey}`` per tuner, ``None`` if unreadable.
+
+    ``channel`` and ``lock`` are the raw status ``ch``/``lock`` values and
+    ``lockkey`` is ``"none"`` for an unlocked tuner. Every tuner is read
+    concurrently; see :func:`batch.run_batch` for ``clients``.
+    """
+    ops = []
+    for idx in range(tuner_count):
+        ops.append({"op": "get", "name": f"/tuner{idx}/status"})
+        ops.append({"op": "get", "name": f"/tuner{idx}/lockkey"})
+    results = run_batch(clients, ops) if ops else []
+    states = []
+    for idx in range(tuner_count):
+        status, lockkey = results[2 * idx], results[2 * idx + 1]
+        if "error" in status or "error" in lockkey:
+            states.append(None)
+            continue
+        fields = parse_status(status["value"])
+        states.append(
+            {
+                "tuner": idx,
+                "channel": fields.get("ch", "none"),
+                "lock": fields.get("lock", "none"),
+                "lockkey": lockkey["value"],
+            }
+        )
+    return states
+
+
+def incremental_channels(
+    channels: list[int], previous: list[dict], sample_every: int, offset: int = 0
+) -> list[int]:
+    """Return the channels an incremental rescan should probe.
+
+    That is every channel in ``channels`` that locked in ``previous`` (scan
+    results), plus every ``sample_every``-th other channel starting at
+    ``offset``, so successive rescans with different offsets cover the whole
+    plan. ``sample_every`` of 0 probes only the previously locked channels.
+    """
+    locked = {g["physical"] for g in previous if g.get("lock") or g.get("subchannels")}
+    others = [c for c in channels if c not in locked]
+    sample = others[offset % sample_every :: sample_every] if sample_every > 0 else []
+    return sorted(locked.intersection(channels) | set(sample))
+
+
+class ParallelScan:
+    """Scan ``channels`` using every tuner in ``tuners`` concurrently.
+
+    ``results`` is kept sorted by physical channel as groups arrive.
+    ``progress`` maps each tuner to ``{"done": n, "channel": current}``.
+    ``on_group(group)`` is called for every channel that locked, and
+    ``on_progress(progress)`` after every probed channel. ``lockkeys`` maps
+    tuners the caller holds locked to their lockkey.
+    """
+
+    def __init__(
+        self,
+        client,
+        tuners: list[int],
+        channels: list[int],
+        on_group: Callable[[dict], None] | None = None,
+        on_progress: Callable[[dict], None] | None = None,
+        probe: Callable[..., dict] = probe_channel,
+        lockkeys: dict[int, int] | None = None,
+    ):
+        self.client = client
+        self.tuners = list(tuners)
+        self.channels = list(channels)
+        self.on_group = on_group
+        self.on_progress = on_progress
+        self.probe = probe
+        self.lockkeys = lockkeys or {}
+        self.results: list[dict] = []
+        self.progress = {str(t): {"done": 0, "channel": None} for t in self.tuners}
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> int:
+        return sum(p["done"] for p in self.progress.values())
+
+    def run(self) -> list[dict]:
+        """Probe every channel, then release the tuners. Blocks until done."""
+        for channel in self.channels:
+            self._queue.put(channel)
+        workers = [
+            threading.Thread(target=self._worker, args=(t,), daemon=True) for t in self.tuners
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return self.results
+
+    def _worker(self, tuner: int) -> None:
+        progress = self.progress[str(tuner)]
+        lockkey = self.lockkeys.get(tuner)
+        try:
+            while True:
+                try:
+                    channel = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                progress["channel"] = channel
+                try:
+                    group = self.probe(self.client, tuner, channel, lockkey=lockkey)
+                except DeviceError:
+                    group = None
+                with self._lock:
+                    progress["done"] += 1
+                    if group is not None and (group["lock"] or group["subchannels"]):
+                        bisect.insort(self.results, group, key=lambda g: g["physical"])
+                    else:
+                        group = None
+                if group is not None and self.on_group is not None:
+                    self.on_group(group)
+                if self.on_progress is not None:
+                    self.on_progress(self.progress)
+        finally:
+            progress["channel"] = None
+            try:
+                self.client.set(f"/tuner{tuner}/channel", "none", lockkey=lockkey)
+            except DeviceError:
+                pass
@@ -0,0 +1,156 @@
+"""Lightweight timing of device commands, parsers and waits.
+
+Every timed call is folded into per-name counters plus a window of the last
+``PERF_WINDOW`` durations, from which p50/p95/p99 are computed on demand.
+Recording costs two clock reads, a lock and a deque append, so it stays on
+in production; ``/api/debug/perf`` reports the summary.
+
+A request can additionally opt in to a trace: every timed call made while
+handling it (including on worker threads started through :func:`bind`) is
+collected and returned as a ``Server-Timing`` header grouped by kind
+(``device``, ``parse``, ``wait``).
+"""
+
+import contextvars
+import functools
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PERF_WINDOW = 1024  # recent samples kept per name for percentiles
+
+_DIGITS_RE = re.compile(r"\d+")
+
+_stats: dict[tuple[str, str], list] = {}  # (kind, name) -> [count, errors, total, deque]
+_lock = threading.Lock()
+_started = time.time()
+_trace: contextvars.ContextVar[list | None] = contextvars.ContextVar("perf_trace", default=None)
+
+
+def command_name(name: str) -> str:
+    """Collapse tuner numbers so ``/tuner3/status`` and ``/tuner0/status`` share a name."""
+    return _DIGITS_RE.sub("N", name)
+
+
+def record(kind: str, name: str, seconds: float, ok: bool = True) -> None:
+    """Add one timed call to the totals and to the current trace, if any."""
+    key = (kind, name)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = [0, 0, 0.0, deque(maxlen=PERF_WINDOW)]
+        entry[0] += 1
+        if not ok:
+            entry[1] += 1
+        entry[2] += seconds
+        entry[3].append(seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((kind, seconds))
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Time the enclosed block as one call."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record(kind, name, time.perf_counter() - started, ok)
+
+
+def timed(kind: str, name: str | None = None):
+    """Decorator timing every call of the wrapped function."""
+
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def bind(fn, *args):
+    """Return ``fn(*args)`` as a callable that runs in a copy of the current context.
+
+    Executors do not carry context variables over to their threads; wrap work
+    submitted on behalf of a request so its calls land in the request's trace.
+    """
+    if _trace.get() is None:
+        return functools.partial(fn, *args)
+    return functools.partial(contextvars.copy_context().run, fn, *args)
+
+
+def start_trace() -> contextvars.Token:
+    """Begin collecting a trace for the current request."""
+    return _trace.set([])
+
+
+def end_trace(token: contextvars.Token) -> list[tuple[str, float]]:
+    """Stop the trace started with ``token`` and return its ``(kind, seconds)`` entries."""
+    trace = _trace.get() or []
+    _trace.reset(token)
+    return trace
+
+
+def server_timing(trace: list[tuple[str, float]], total: float) -> str:
+    """Format a trace as a ``Server-Timing`` header value (durations in ms)."""
+    kinds: dict[str, list] = {}
+    for kind, seconds in trace:
+        entry = kinds.setdefault(kind, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+    parts = [
+        f'{kind};dur={seconds * 1000:.2f};desc="{count} calls"'
+        for kind, (count, seconds) in sorted(kinds.items())
+    ]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summary(kind: str | None = None) -> dict:
+    """Return per-name counters and latency percentiles (ms), slowest total first."""
+    with _lock:
+        entries = [
+            (k, count, errors, total, sorted(window))
+            for k, (count, errors, total, window) in _stats.items()
+            if kind is None or k[0] == kind
+        ]
+    rows = [
+        {
+            "kind": k[0],
+            "name": k[1],
+            "count": count,
+            "errors": errors,
+            "total_ms": round(total * 1000, 3),
+            "mean_ms": round(total / count * 1000, 3),
+            "p50_ms": round(_percentile(window, 50) * 1000, 3),
+            "p95_ms": round(_percentile(window, 95) * 1000, 3),
+            "p99_ms": round(_percentile(window, 99) * 1000, 3),
+        }
+        for k, count, errors, total, window in entries
+    ]
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return {"since": _started, "window": PERF_WINDOW, "stats": rows}
+
+
+def reset() -> None:
+    """Clear every counter."""
+    global _started
+    with _lock:
+        _stats.clear()
+        _started = time.time()
@@ -0,0 +1,106 @@
+"""Background tuner-status sampler shared by every client.
+
+A single thread polls the device once per interval and keeps the latest
+snapshot in memory, so serving tuner status costs the same whether one
+dashboard is open or fifty.
+"""
+
+import threading
+import time
+from typing import Callable
+
+
+class TunerSampler:
+    """Periodically call ``collect`` and keep the latest per-tuner results.
+
+    ``collect`` returns a dict mapping a tuner key (e.g. ``(device, index)``)
+    to a status dict, or to ``None`` when that tuner could not be read. A
+    failed read keeps the previous value for the tuner, which is then
+    reported as stale once it is older than ``stale_after`` seconds. Tuners
+    missing from the result (a device went away) are dropped.
+
+    ``on_sample`` is called after every sample with the sample timestamp and
+    a list of per-tuner deltas: the tuner's ``key_fields`` plus the fields
+    that changed.
+    """
+
+    def __init__(
+        self,
+        collect: Callable[[], dict[object, dict | None] | None],
+        interval: float = 1.0,
+        stale_after: float = 5.0,
+        on_sample: Callable[[float, list[dict]], None] | None = None,
+        key_fields: tuple[str, ...] = ("index",),
+    ):
+        self.collect = collect
+        self.interval = interval
+        self.stale_after = stale_after
+        self.on_sample = on_sample
+        self.key_fields = key_fields
+        self._tuners: dict[object, dict] = {}
+        self._timestamp = 0.0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start the sampling thread if it is not already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tuner-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.sample()
+            elapsed = time.monotonic() - started
+            self._stop.wait(max(0.0, self.interval - elapsed))
+
+    def sample(self) -> None:
+        """Take one sample immediately and publish it as the new snapshot."""
+        try:
+            results = self.collect()
+        except Exception:  # keep sampling through unexpected errors
+            results = None
+        now = time.time()
+        if results is None:
+            return
+
+        with self._lock:
+            previous = self._tuners
+            tuners = {}
+            changes = []
+            for key, result in results.items():
+                if result is not None:
+                    tuners[key] = dict(result, sampled_at=now)
+                    old = previous.get(key, {})
+                    delta = {k: v for k, v in result.items() if k not in old or old[k] != v}
+                    if delta:
+                        delta.update((f, result.get(f)) for f in self.key_fields)
+                        changes.append(delta)
+                elif key in previous:
+                    tuners[key] = previous[key]
+            self._tuners = tuners
+            self._timestamp = now
+
+        if self.on_sample is not None:
+            self.on_sample(now, changes)
+
+    def snapshot(self) -> tuple[float, list[dict]]:
+        """Return ``(timestamp, tuners)`` for the latest sample.
+
+        The timestamp is 0 until the first sample completes. Each tuner dict
+        carries its own ``sampled_at`` time and a ``stale`` flag.
+        """
+        with self._lock:
+            timestamp, tuners = self._timestamp, list(self._tuners.values())
+        now = time.time()
+        return timestamp, [
+            dict(t, stale=now - t["sampled_at"] > self.stale_after) for t in tuners
+        ]
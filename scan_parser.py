@@ -0,0 +1,129 @@
+"""Incremental parser for ``hdhomerun_config scan`` output.
+
+Both the synchronous ``/api/scan`` endpoint and the background scan thread
+feed lines through :class:`ScanParser`, which turns the
+``SCANNING``/``LOCK``/``PROGRAM`` state machine into typed events::
+
+    SCANNING: 485000000 (us-bcast:16)
+    LOCK: 8vsb (ss=85 snq=88 seq=100)
+    TSID: 0x0451
+    PROGRAM 1: 16.1 WMEB-HD
+
+Finished physical-channel groups are appended to :attr:`ScanParser.results`
+and never copied, so parsing a full-band transcript is linear in its length.
+"""
+
+import re
+from typing import NamedTuple
+
+SCANNING_RE = re.compile(r"SCANNING:\s+(\d+)?")
+PHYSICAL_RE = re.compile(r"\((?:[\w-]+:)?(\d+)\)")
+LOCK_RE = re.compile(r"LOCK:\s+(\S+)(?:\s+\(ss=(\d+)\s+snq=(\d+)\s+seq=(\d+)\))?")
+PROGRAM_RE = re.compile(r"(\d+\.\d+)\s+(.+?)(?=\s+\d+\.\d+|$)")
+PROGRAM_ID_RE = re.compile(r"PROGRAM\s+(\d+)")
+
+
+class ChannelStarted(NamedTuple):
+    """A new physical channel is being scanned."""
+
+    frequency: int | None
+    group: dict
+
+
+class ChannelLocked(NamedTuple):
+    """The current channel reported its lock state and signal levels."""
+
+    group: dict
+
+
+class ProgramFound(NamedTuple):
+    """A subchannel was added to the current channel."""
+
+    group: dict
+    subchannel: dict
+
+
+class ChannelFinished(NamedTuple):
+    """A channel with a lock or subchannels was appended to the results."""
+
+    index: int
+    group: dict
+
+
+def _new_group(physical: int | None) -> dict:
+    return {"physical": physical, "lock": None, "ss": 0, "snq": 0, "subchannels": []}
+
+
+def _reportable(group: dict | None) -> bool:
+    return group is not None and (group["lock"] is not None or bool(group["subchannels"]))
+
+
+class ScanParser:
+    """Push-style scan parser: call :meth:`feed` per line, then :meth:`finish`.
+
+    ``freq_to_channel`` maps frequencies to physical channels for SCANNING
+    lines that do not carry a channel number.
+    """
+
+    def __init__(self, freq_to_channel: dict[int, int] | None = None):
+        self.freq_to_channel = freq_to_channel or {}
+        self.results: list[dict] = []
+        self.current: dict | None = None
+        self._capturing = False
+
+    def feed(self, raw: str) -> list:
+        """Consume one output line and return the events it produced."""
+        line = raw.strip()
+        events = []
+
+        if line.startswith("SCANNING:"):
+            self._close_current(events)
+            freq = None
+            m = SCANNING_RE.match(line)
+            if m and m.group(1):
+                freq = int(m.group(1))
+            m = PHYSICAL_RE.search(line)
+            phys = int(m.group(1)) if m else None
+            if phys is None and freq is not None:
+                phys = self.freq_to_channel.get(freq)
+            self.current = _new_group(phys)
+            events.append(ChannelStarted(freq, self.current))
+
+        elif line.startswith("LOCK:") and self.current is not None:
+            # Example: "LOCK: 8vsb (ss=85 snq=88 seq=100)" or "LOCK: none (ss=0 snq=0 seq=0)"
+            m = LOCK_RE.match(line)
+            if m:
+                lock_val, ss_val, snq_val, _ = m.groups()
+                locked = lock_val.lower() != "none"
+                self.current["lock"] = lock_val if locked else None
+                self._capturing = locked
+                if ss_val is not None:
+                    self.current["ss"] = int(ss_val)
+                if snq_val is not None:
+                    self.current["snq"] = int(snq_val)
+                events.append(ChannelLocked(self.current))
+
+        elif line.startswith("PROGRAM") and self._capturing and self.current is not None:
+            after_colon = line.split(":", 1)[1].strip() if ":" in line else ""
+            prog = PROGRAM_ID_RE.match(line)
+            for m in PROGRAM_RE.finditer(after_colon):
+                sub = {"num": m.group(1).strip(), "name": m.group(2).strip()}
+                if prog:
+                    sub["id"] = int(prog.group(1))
+                self.current["subchannels"].append(sub)
+                events.append(ProgramFound(self.current, sub))
+
+        return events
+
+    def finish(self) -> list:
+        """Flush the last channel once the scan output ends."""
+        events = []
+        self._close_current(events)
+        return events
+
+    def _close_current(self, events: list) -> None:
+        if _reportable(self.current):
+            self.results.append(self.current)
+            events.append(ChannelFinished(len(self.results) - 1, self.current))
+        self.current = None
+        self._capturing = False
@@ -0,0 +1,285 @@
+"""SQLite-backed history of channel scans.
+
+Scan threads hand records to :class:`ScanStore`, which queues them and lets
+one writer thread commit them in batches, so a slow disk never stalls a
+scan. Reads open their own connections; the database runs in WAL mode so
+readers (including other gunicorn workers) never block the writer.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Iterator
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id TEXT PRIMARY KEY,
+    device_id TEXT,
+    tuner INTEGER,
+    mode TEXT,
+    channelmap TEXT,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS scans_device ON scans (device_id, started);
+CREATE INDEX IF NOT EXISTS scans_tuner ON scans (tuner, started);
+CREATE INDEX IF NOT EXISTS scans_started ON scans (started);
+CREATE TABLE IF NOT EXISTS scan_channels (
+    scan_id TEXT NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    physical INTEGER,
+    lock TEXT,
+    ss INTEGER,
+    snq INTEGER,
+    subchannels TEXT NOT NULL,
+    UNIQUE (scan_id, physical)
+);
+"""
+
+# Applied after SCHEMA to databases created before the column existed.
+MIGRATIONS = [
+    ("channelmap", "ALTER TABLE scans ADD COLUMN channelmap TEXT"),
+]
+INDEXES = """
+CREATE INDEX IF NOT EXISTS scans_device_map ON scans (device_id, channelmap, started);
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class ScanStore:
+    """Persist scans and their channel groups.
+
+    ``start``, ``add_channel`` and ``finish`` only enqueue; the writer thread
+    commits whatever has accumulated every ``flush_interval`` seconds, or at
+    once when a scan finishes.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.5, batch_size: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue()
+        self._local = threading.local()
+        self._writer: threading.Thread | None = None
+        self._writer_lock = threading.Lock()
+        with _connect(path) as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(scans)")}
+            for column, statement in MIGRATIONS:
+                if column not in columns:
+                    conn.execute(statement)
+            conn.executescript(INDEXES)
+
+    # -- writes -------------------------------------------------------------
+
+    def start(
+        self,
+        scan_id: str,
+        device_id: str,
+        tuner: int | None,
+        mode: str,
+        channelmap: str | None = None,
+    ) -> None:
+        self._put(("start", (scan_id, device_id, tuner, mode, channelmap, time.time())))
+
+    def add_channel(self, scan_id: str, group: dict) -> None:
+        self._put(
+            (
+                "channel",
+                (
+                    scan_id,
+                    group.get("physical"),
+                    group.get("lock"),
+                    group.get("ss", 0),
+                    group.get("snq", 0),
+                    json.dumps(group.get("subchannels", [])),
+                ),
+            )
+        )
+
+    def finish(self, scan_id: str) -> None:
+        self._put(("finish", (time.time(), scan_id)))
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until everything queued so far has been committed."""
+        done = threading.Event()
+        self._put(("flush", done))
+        done.wait(timeout)
+
+    def _put(self, item) -> None:
+        self._ensure_writer()
+        self._queue.put(item)
+
+    def _ensure_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="scan-store-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] not in ("finish", "flush"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            waiters = [payload for kind, payload in batch if kind == "flush"]
+            for attempt in (1, 2):
+                try:
+                    self._commit(conn, batch)
+                    break
+                except sqlite3.Error as exc:
+                    if attempt == 1:
+                        log.warning(
+                            "scan store write of %d records failed, retrying: %s", len(batch), exc
+                        )
+                        time.sleep(self.flush_interval)
+                    else:  # drop the batch rather than kill the writer
+                        log.error("scan store dropped %d records: %s", len(batch), exc)
+            for waiter in waiters:
+                waiter.set()
+
+    @staticmethod
+    def _commit(conn: sqlite3.Connection, batch: list) -> None:
+        with conn:
+            for kind, payload in batch:
+                if kind == "start":
+                    conn.execute(
+                        "INSERT OR REPLACE INTO scans"
+                        " (id, device_id, tuner, mode, channelmap, started)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        payload,
+                    )
+                elif kind == "channel":
+                    conn.execute(
+                        "INSERT OR REPLACE INTO scan_channels"
+                        " (scan_id, physical, lock, ss, snq, subchannels)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        payload,
+                    )
+                elif kind == "finish":
+                    conn.execute("UPDATE scans SET finished = ? WHERE id = ?", payload)
+
+    # -- reads --------------------------------------------------------------
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def get(self, scan_id: str) -> dict | None:
+        """Return ``{id, device_id, tuner, mode, channelmap, started, finished, results}``."""
+        row = self._reader().execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone()
+        if row is None:
+            return None
+        scan = dict(row)
+        scan["results"] = list(self.iter_channels(scan_id))
+        return scan
+
+    def iter_channels(self, scan_id: str) -> Iterator[dict]:
+        """Yield a scan's result groups by physical channel, one row at a time."""
+        for ch in self._reader().execute(
+            "SELECT * FROM scan_channels WHERE scan_id = ? ORDER BY physical", (scan_id,)
+        ):
+            yield {
+                "physical": ch["physical"],
+                "lock": ch["lock"],
+                "ss": ch["ss"],
+                "snq": ch["snq"],
+                "subchannels": json.loads(ch["subchannels"]),
+            }
+
+    def latest(self, device_id: str, channelmap: str, results: bool = True) -> dict | None:
+        """Return the newest finished scan of ``device_id`` with ``channelmap``, if any.
+
+        With ``results=False`` only the scan's own row is read.
+        """
+        row = self._reader().execute(
+            "SELECT * FROM scans WHERE device_id = ? AND channelmap = ?"
+            " AND finished IS NOT NULL ORDER BY started DESC LIMIT 1",
+            (device_id, channelmap),
+        ).fetchone()
+        if row is None:
+            return None
+        return self.get(row["id"]) if results else dict(row)
+
+    def history(
+        self, device_id: str | None = None, tuner: int | None = None, limit: int = 50
+    ) -> list[dict]:
+        """Return recent scans, newest first, with a channel count each."""
+        clauses, params = [], []
+        if device_id is not None:
+            clauses.append("s.device_id = ?")
+            params.append(device_id)
+        if tuner is not None:
+            clauses.append("s.tuner = ?")
+            params.append(tuner)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            "SELECT s.*, (SELECT COUNT(*) FROM scan_channels c WHERE c.scan_id = s.id)"
+            f" AS channels FROM scans s {where} ORDER BY s.started DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [dict(row) for row in rows]
+
+
+def diff_scans(old: list[dict], new: list[dict]) -> dict:
+    """Compare two scans' results by physical channel.
+
+    Returns ``{gained, lost, changed}``: channels that appeared, channels
+    that disappeared, and channels present in both whose signal or
+    subchannel lineup moved.
+    """
+    before = {g["physical"]: g for g in old if g.get("lock") or g.get("subchannels")}
+    after = {g["physical"]: g for g in new if g.get("lock") or g.get("subchannels")}
+
+    changed = []
+    for phys in sorted(before.keys() & after.keys(), key=lambda p: (p is None, p)):
+        a, b = before[phys], after[phys]
+        subs_a = {(s["num"], s["name"]) for s in a["subchannels"]}
+        subs_b = {(s["num"], s["name"]) for s in b["subchannels"]}
+        entry = {
+            "physical": phys,
+            "ss_delta": b["ss"] - a["ss"],
+            "snq_delta": b["snq"] - a["snq"],
+            "subchannels_added": [{"num": n, "name": m} for n, m in sorted(subs_b - subs_a)],
+            "subchannels_removed": [{"num": n, "name": m} for n, m in sorted(subs_a - subs_b)],
+        }
+        if (
+            entry["ss_delta"]
+            or entry["snq_delta"]
+            or entry["subchannels_added"]
+            or entry["subchannels_removed"]
+        ):
+            changed.append(entry)
+
+    def ordered(groups: dict, keys) -> list[dict]:
+        return [groups[k] for k in sorted(keys, key=lambda p: (p is None, p))]
+
+    return {
+        "gained": ordered(after, after.keys() - before.keys()),
+        "lost": ordered(before, before.keys() - after.keys()),
+        "changed": changed,
+    }
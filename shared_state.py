@@ -0,0 +1,250 @@
+"""State shared by every worker process on the host.
+
+Gunicorn runs several copies of the app; anything one worker learns (a
+running scan's progress, the discovered devices, the latest tuner sample)
+has to be visible to the others. :class:`SharedState` keeps it in SQLite in
+WAL mode, so readers never block the writer and each small write is one
+cheap commit. It offers three things:
+
+* namespaced JSON values with an optional expiry (:meth:`~SharedState.put`,
+  :meth:`~SharedState.get`)
+* named locks held until an expiry, for electing the one worker that runs
+  discovery or samples the tuners (:meth:`~SharedState.acquire`)
+* an append-only event log that each worker tails to republish other
+  workers' stream events to its own clients (:meth:`~SharedState.append_event`)
+
+:class:`MemoryState` has the same interface for a single process.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_values (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL,
+    expires REAL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shared_locks (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shared_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+EVENT_RETENTION = 60.0  # seconds of events kept for lagging workers
+PURGE_EVERY = 200  # writes between purges of expired rows
+
+
+class SharedState:
+    """SQLite-backed shared values, locks and events; see the module docstring."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # -- values -------------------------------------------------------------
+
+    def get(self, namespace: str, key: str, max_age: float | None = None):
+        """Return the value stored under ``key``, or ``None`` if missing, expired or older than ``max_age``."""
+        row = self._conn().execute(
+            "SELECT value, updated, expires FROM shared_values WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if (row[2] is not None and row[2] <= now) or (max_age is not None and now - row[1] > max_age):
+            return None
+        return json.loads(row[0])
+
+    def put(self, namespace: str, key: str, value, ttl: float | None = None) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO shared_values VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now, now + ttl if ttl else None),
+        )
+        self._wrote()
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._conn().execute(
+            "DELETE FROM shared_values WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    # -- locks --------------------------------------------------------------
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or extend lock ``name`` for ``owner`` until ``ttl`` seconds from now.
+
+        Succeeds when the lock is free, expired or already ``owner``'s.
+        """
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO shared_locks VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE"
+            " SET owner = excluded.owner, expires = excluded.expires"
+            " WHERE shared_locks.owner = excluded.owner OR shared_locks.expires <= ?",
+            (name, owner, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, name: str, owner: str) -> None:
+        self._conn().execute("DELETE FROM shared_locks WHERE name = ? AND owner = ?", (name, owner))
+
+    # -- events -------------------------------------------------------------
+
+    def append_event(self, origin: str, event: str, data: dict) -> None:
+        self._conn().execute(
+            "INSERT INTO shared_events (origin, event, data, created) VALUES (?, ?, ?, ?)",
+            (origin, event, json.dumps(data), time.time()),
+        )
+        self._wrote()
+
+    def events_since(self, last_id: int) -> list[tuple[int, str, str, dict]]:
+        """Return ``[(id, origin, event, data), ...]`` appended after ``last_id``."""
+        rows = self._conn().execute(
+            "SELECT id, origin, event, data FROM shared_events WHERE id > ? ORDER BY id",
+            (last_id,),
+        ).fetchall()
+        return [(row[0], row[1], row[2], json.loads(row[3])) for row in rows]
+
+    def last_event_id(self) -> int:
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM shared_events").fetchone()[0]
+
+    # -- upkeep -------------------------------------------------------------
+
+    def _wrote(self) -> None:
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+
+    def purge(self) -> None:
+        """Delete expired values and events older than ``EVENT_RETENTION``."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM shared_values WHERE expires <= ?", (now,))
+        conn.execute("DELETE FROM shared_events WHERE created < ?", (now - EVENT_RETENTION,))
+
+
+class MemoryState:
+    """In-process stand-in for :class:`SharedState` (one worker only)."""
+
+    def __init__(self):
+        self._values: dict[tuple[str, str], tuple] = {}
+        self._locks: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str, max_age: float | None = None):
+        with self._lock:
+            entry = self._values.get((namespace, key))
+        if entry is None:
+            return None
+        value, updated, expires = entry
+        now = time.time()
+        if (expires is not None and expires <= now) or (max_age is not None and now - updated > max_age):
+            return None
+        return value
+
+    def put(self, namespace: str, key: str, value, ttl: float | None = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._values[(namespace, key)] = (value, now, now + ttl if ttl else None)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._values.pop((namespace, key), None)
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            holder = self._locks.get(name)
+            if holder is not None and holder[0] != owner and holder[1] > now:
+                return False
+            self._locks[name] = (owner, now + ttl)
+            return True
+
+    def release(self, name: str, owner: str) -> None:
+        with self._lock:
+            if self._locks.get(name, (None,))[0] == owner:
+                del self._locks[name]
+
+    def append_event(self, origin: str, event: str, data: dict) -> None:
+        pass  # nobody else to tell
+
+    def events_since(self, last_id: int) -> list:
+        return []
+
+    def last_event_id(self) -> int:
+        return 0
+
+    def purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            for key, (_, _, expires) in list(self._values.items()):
+                if expires is not None and expires <= now:
+                    del self._values[key]
+
+
+class EventRelay:
+    """Tail the shared event log and hand other workers' events to ``deliver``."""
+
+    def __init__(
+        self,
+        state,
+        origin: str,
+        deliver: Callable[[str, dict], None],
+        interval: float = 0.2,
+    ):
+        self.state = state
+        self.origin = origin
+        self.deliver = deliver
+        self.interval = interval
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def publish(self, event: str, data: dict) -> None:
+        """Make a locally published event visible to the other workers."""
+        self.state.append_event(self.origin, event, data)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="event-relay", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        last_id = self.state.last_event_id()
+        while True:
+            time.sleep(self.interval)
+            try:
+                entries = self.state.events_since(last_id)
+            except sqlite3.Error:
+                continue
+            for event_id, origin, event, data in entries:
+                last_id = event_id
+                if origin != self.origin:
+                    self.deliver(event, data)
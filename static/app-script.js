@@ -112,6 +112,16 @@
     }
   }
 
+  // Show "done/total" channels on the scan button while scanning
+  function setScanProgress(done, total) {
+    const btn = document.getElementById("scan-again-btn");
+    if (!btn || !scanningActive) return;
+    btn.innerHTML = `
+        <span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>
+        &nbsp;Scanning… ${done}/${total}
+      `;
+  }
+
   // Display a Bootstrap toast message
   function showToast(msg, isError = false) {
     const container = document.getElementById("toast-container");
@@ -144,11 +154,18 @@
     let tunedProgramId = null;
     let lastScanResults = [];
 
-    // Track interval IDs so we can fully stop polling when requested
-    let chartInterval = null;
-    let tunerInterval = null;
-    let scanPollInterval = null;
-    let programInfoInterval = null;
+    // Live updates arrive over a single Server-Sent Events stream
+    let stream = null;
+    let activeScanId = null;
+    let pendingTuneJob = null;
+    let scanResults = [];
+    const tunerState = {}; // latest known status per "device/index"
+    let currentDevice = null;
+    let tunerCount = 0;
+
+    function tunerKey(device, index) {
+      return `${device}/${index}`;
+    }
 
     // ───────────────────────────────────────────────────────────
     // Apache ECharts setup for realtime updates
@@ -182,20 +199,96 @@
       arr.push(pt);
     }
 
-    function appendChartPoint() {
+    function appendChartPoint(timestamp) {
       if (!pollingEnabled || scanningActive || selectedTuner === null) return;
-      fetch("api/tuners")
+      const t = tunerState[tunerKey(currentDevice, selectedTuner)];
+      if (!t || !t.locked) return;
+      const when = timestamp ? timestamp * 1000 : Date.now();
+      pushPoint(chartSeries[0].data, [when, t.ss]);
+      pushPoint(chartSeries[1].data, [when, t.snq]);
+      pushPoint(chartSeries[2].data, [when, t.seq]);
+      signalChart.setOption({ series: chartSeries });
+    }
+
+    // Seed the chart with server-side history for the selected tuner
+    const CHART_HISTORY_SECONDS = 600;
+    function loadChartHistory() {
+      if (selectedTuner === null) return;
+      const tuner = selectedTuner;
+      const device = currentDevice;
+      const to = Date.now() / 1000;
+      const query = new URLSearchParams({
+        device,
+        tuner,
+        from: to - CHART_HISTORY_SECONDS,
+        to,
+        step: 1,
+      });
+      fetch(`api/history?${query}`)
         .then((r) => r.json())
-        .then((tuners) => {
-          const t = tuners.find((x) => x.index === selectedTuner);
-          if (!t || !t.locked) return;
-          const now = Date.now();
-          pushPoint(chartSeries[0].data, [now, t.ss]);
-          pushPoint(chartSeries[1].data, [now, t.snq]);
-          pushPoint(chartSeries[2].data, [now, t.seq]);
+        .then((hist) => {
+          if (tuner !== selectedTuner || device !== currentDevice) return;
+          if (!Array.isArray(hist.points)) return;
+          const seeded = [[], [], []];
+          hist.points.forEach(([t, ss, snq, seq]) => {
+            seeded[0].push([t * 1000, ss]);
+            seeded[1].push([t * 1000, snq]);
+            seeded[2].push([t * 1000, seq]);
+          });
+          // Keep live points that arrived after the history snapshot
+          chartSeries.forEach((s, i) => {
+            const last = seeded[i].length ? seeded[i][seeded[i].length - 1][0] : 0;
+            s.data = seeded[i].concat(s.data.filter((pt) => pt[0] > last));
+          });
           signalChart.setOption({ series: chartSeries });
         })
-        .catch(() => {});
+        .catch((err) => console.error(err));
+    }
+
+    // ───────────────────────────────────────────────────────────
+    // Live event stream: tuner deltas + scan progress
+    // ───────────────────────────────────────────────────────────
+    function openStream() {
+      if (stream) return;
+      stream = new EventSource("api/stream");
+
+      stream.addEventListener("tuners", (e) => {
+        const msg = JSON.parse(e.data);
+        msg.changes.forEach((delta) => {
+          const key = tunerKey(delta.device, delta.index);
+          tunerState[key] = Object.assign(tunerState[key] || {}, delta);
+        });
+        renderTuners();
+        appendChartPoint(msg.timestamp);
+      });
+
+      stream.addEventListener("scan", (e) => {
+        const msg = JSON.parse(e.data);
+        if (msg.scan_id !== activeScanId) return;
+        if (msg.group) {
+          // Keyed by physical channel so rows render in channel order
+          scanResults[msg.group.physical ?? msg.index] = msg.group;
+          renderScanRows(scanResults.filter(Boolean));
+        }
+        if (msg.total) setScanProgress(msg.done, msg.total);
+        if (msg.finished) finishScan();
+      });
+
+      stream.addEventListener("tune", (e) => {
+        const msg = JSON.parse(e.data);
+        if (msg.job_id === pendingTuneJob) handleTuneResult(msg);
+      });
+
+      stream.onerror = () => {
+        // EventSource reconnects on its own; show unknown state meanwhile
+        resetTunerBadges();
+      };
+    }
+
+    function closeStream() {
+      if (!stream) return;
+      stream.close();
+      stream = null;
     }
 
     function startPolling() {
@@ -204,12 +297,9 @@
       pollButton.classList.remove("btn-outline-success");
       pollButton.classList.add("btn-outline-danger");
       pollButton.innerHTML = '<i class="bi bi-sign-stop-fill"></i> Polling';
-      if (!chartInterval) chartInterval = setInterval(appendChartPoint, 1000);
-      if (!tunerInterval) tunerInterval = setInterval(fetchAndUpdateTuners, 1000);
-      if (tunedProgramId !== null && !programInfoInterval)
-        programInfoInterval = setInterval(fetchAndUpdateProgramInfo, 1000);
-      fetchAndUpdateTuners();
-      if (tunedProgramId !== null) fetchAndUpdateProgramInfo();
+      openStream();
+      // Catch up on any scan progress missed while paused
+      if (activeScanId) resyncScan(activeScanId);
     }
 
     function stopPolling() {
@@ -218,143 +308,183 @@
       pollButton.classList.remove("btn-outline-danger");
       pollButton.classList.add("btn-outline-success");
       pollButton.innerHTML = '<i class="bi bi-play-fill"></i> Paused';
-      clearInterval(chartInterval);
-      clearInterval(tunerInterval);
-      clearInterval(programInfoInterval);
-      chartInterval = null;
-      tunerInterval = null;
-      programInfoInterval = null;
-      if (scanPollInterval) {
-        clearInterval(scanPollInterval);
-        scanPollInterval = null;
-      }
+      closeStream();
     }
 
-    chartInterval = setInterval(appendChartPoint, 1000);
-
     const pollButton = document.getElementById("poll-button");
     pollButton.addEventListener("click", () => {
       if (pollingEnabled) stopPolling();
       else startPolling();
     });
     // ───────────────────────────────────────────────────────────
-    // 1) Populate Status badge once
+    // 1) Device list and status badges
     // ───────────────────────────────────────────────────────────
-    fetch("api/status")
-      .then((r) => r.json())
-      .then((data) => {
-        if (data.connected) {
-          setBadge("status-badge", "Connected", "text-bg-success");
-          document.getElementById("device-id-badge").innerText = data.device_id;
-          document.getElementById("device-ip-badge").innerText = data.device_ip;
-          document.getElementById("tuner-count-badge").innerText = data.tuner_count;
-        } else {
-          setBadge("status-badge", "Disconnected", "text-bg-danger");
+    const deviceSelect = document.getElementById("device-select");
+
+    function loadDevices() {
+      fetch("api/devices")
+        .then((r) => r.json())
+        .then((data) => {
+          const devices = data.devices || [];
+          deviceSelect.innerHTML = "";
+          devices.forEach((d) => {
+            const opt = document.createElement("option");
+            opt.value = d.device_id;
+            opt.innerText = `${d.device_id} (${d.device_ip})`;
+            deviceSelect.appendChild(opt);
+          });
+          // Only offer a choice when there is more than one device
+          document.getElementById("device-select-row").hidden = devices.length < 2;
+          selectDevice(devices.length ? devices[0].device_id : null);
+        })
+        .catch((err) => {
+          console.error(err);
+          setBadge("status-badge", "Error", "text-bg-danger");
           clearAllProgressBars();
-        }
-      })
-      .catch((err) => {
-        console.error(err);
-        setBadge("status-badge", "Error", "text-bg-danger");
-        clearAllProgressBars();
-      });
+        });
+    }
+
+    function selectDevice(deviceId) {
+      currentDevice = deviceId;
+      deviceSelect.value = deviceId ?? "";
+      selectedTuner = null;
+      validateTuneForm();
+      buildTunerList(0);
+      const query = deviceId ? `?device=${encodeURIComponent(deviceId)}` : "";
+      fetch(`api/status${query}`)
+        .then((r) => r.json())
+        .then((data) => {
+          if (deviceId !== currentDevice) return;
+          if (data.connected) {
+            setBadge("status-badge", "Connected", "text-bg-success");
+            document.getElementById("device-id-badge").innerText = data.device_id;
+            document.getElementById("device-ip-badge").innerText = data.device_ip;
+            document.getElementById("tuner-count-badge").innerText = data.tuner_count;
+            if (Array.isArray(data.channels)) {
+              channelInput.min = data.channels[0];
+              channelInput.max = data.channels[1];
+              channelInput.title = data.channelmap;
+              validateTuneForm();
+            }
+            buildTunerList(data.tuner_count || 0);
+            renderTuners();
+          } else {
+            setBadge("status-badge", "Disconnected", "text-bg-danger");
+            clearAllProgressBars();
+          }
+        })
+        .catch((err) => {
+          console.error(err);
+          setBadge("status-badge", "Error", "text-bg-danger");
+          clearAllProgressBars();
+        });
+    }
+
+    deviceSelect.addEventListener("change", () => selectDevice(deviceSelect.value));
 
     // ───────────────────────────────────────────────────────────
-    // 2) Fetch & update tuner list badges (poll every second)
+    // 2) Update tuner list badges from the live tuner state
     // ───────────────────────────────────────────────────────────
 
-    function fetchAndUpdateTuners() {
-      if (!pollingEnabled) return;
-      fetch("api/tuners")
-        .then((r) => r.json())
-        .then((tuners) => {
-          tuners.forEach((t) => {
-            const idx = t.index;
-            const lockEl = document.getElementById(`tuner-${idx}-lock-badge`);
-            const modEl = document.getElementById(`tuner-${idx}-modulation`);
-            const ssEl = document.getElementById(`tuner-${idx}-ss-badge`);
-            const snqEl = document.getElementById(`tuner-${idx}-snq-badge`);
-            const seqEl = document.getElementById(`tuner-${idx}-seq-badge`);
-
-            // 1) Update lock badge
-            if (t.locked) {
-              lockEl.innerText = `In-Use (${t.lock})`;
-              setBg(lockEl, "text-bg-danger");
-            } else {
-              lockEl.innerText = "Available";
-              setBg(lockEl, "text-bg-success");
-            }
+    function renderTuners() {
+      const tuners = Object.values(tunerState).filter((t) => t.device === currentDevice);
+      tuners.forEach((t) => {
+        const idx = t.index;
+        const lockEl = document.getElementById(`tuner-${idx}-lock-badge`);
+        const modEl = document.getElementById(`tuner-${idx}-modulation`);
+        const ssEl = document.getElementById(`tuner-${idx}-ss-badge`);
+        const snqEl = document.getElementById(`tuner-${idx}-snq-badge`);
+        const seqEl = document.getElementById(`tuner-${idx}-seq-badge`);
+        if (!lockEl) return; // tuner list not built yet
+
+        // 1) Update lock badge
+        if (t.locked) {
+          lockEl.innerText = `In-Use (${t.lock})`;
+          setBg(lockEl, "text-bg-danger");
+        } else {
+          lockEl.innerText = "Available";
+          setBg(lockEl, "text-bg-success");
+        }
 
-            // 2) Update “modulation/channel” badge
-            if (t.channel !== null) {
-              modEl.innerText = `CH: ${t.channel}`;
-              setBg(modEl, "text-bg-info");
-            } else {
-              modEl.innerText = "--";
-              setBg(modEl, "text-bg-secondary");
-            }
+        // 2) Update “modulation/channel” badge
+        if (t.channel !== null) {
+          modEl.innerText = `CH: ${t.channel}`;
+          setBg(modEl, "text-bg-info");
+        } else {
+          modEl.innerText = "--";
+          setBg(modEl, "text-bg-secondary");
+        }
 
-            // 3) Update SS/SNQ/SEQ badges (always reset then recolor)
-            ssEl.innerText = `SS: ${t.ss}%`;
-            setBg(ssEl, ssColorClass(t.ss));
+        // 3) Update SS/SNQ/SEQ badges (always reset then recolor)
+        ssEl.innerText = `SS: ${t.ss}%`;
+        setBg(ssEl, ssColorClass(t.ss));
 
-            snqEl.innerText = `SNQ: ${t.snq}%`;
-            setBg(snqEl, snqColorClass(t.snq));
+        snqEl.innerText = `SNQ: ${t.snq}%`;
+        setBg(snqEl, snqColorClass(t.snq));
 
-            seqEl.innerText = `SEQ: ${t.seq}%`;
-            setBg(seqEl, seqColorClass(t.seq));
-          });
+        seqEl.innerText = `SEQ: ${t.seq}%`;
+        setBg(seqEl, seqColorClass(t.seq));
+      });
 
-          // If a tuner is selected, still update its progress bars:
-          if (selectedTuner !== null) {
-            const chosen = tuners.find((x) => x.index === selectedTuner);
-            if (!chosen) {
-              clearAllProgressBars();
-              document.getElementById("ts-info").hidden = true;
-            } else {
-              updateProgressBar("ss-progress-bar", "ss-percentage-text", chosen.ss, ssColorClass);
-              updateProgressBar(
-                "snq-progress-bar",
-                "snq-percentage-text",
-                chosen.snq,
-                snqColorClass
-              );
-              updateProgressBar(
-                "seq-progress-bar",
-                "seq-percentage-text",
-                chosen.seq,
-                seqColorClass
-              );
-            }
-          }
-        })
-        .catch((err) => {
-          console.error(err);
-          // On error, reset everything back to “--” with gray badges
-          for (let i = 0; i < 4; i++) {
-            ["lock-badge", "modulation", "ss-badge", "snq-badge", "seq-badge"].forEach((suffix) => {
-              const el = document.getElementById(`tuner-${i}-${suffix}`);
-              if (el) {
-                el.innerText = "--";
-                el.className = "badge text-bg-secondary";
-              }
-            });
-          }
+      // If a tuner is selected, still update its progress bars:
+      if (selectedTuner !== null) {
+        const chosen = tuners.find((x) => x.index === selectedTuner);
+        if (!chosen) {
           clearAllProgressBars();
           document.getElementById("ts-info").hidden = true;
-        });
+        } else {
+          updateProgressBar("ss-progress-bar", "ss-percentage-text", chosen.ss, ssColorClass);
+          updateProgressBar(
+            "snq-progress-bar",
+            "snq-percentage-text",
+            chosen.snq,
+            snqColorClass
+          );
+          updateProgressBar(
+            "seq-progress-bar",
+            "seq-percentage-text",
+            chosen.seq,
+            seqColorClass
+          );
+          if (tunedProgramId !== null && chosen.bitrate !== undefined) {
+            tsInfo.hidden = false;
+            updateTSBar(
+              "ts-progress-bar",
+              "ts-bitrate-text",
+              chosen.bitrate,
+              chosen.max_bitrate
+            );
+          }
+        }
+      }
     }
 
-    fetchAndUpdateTuners();
-    tunerInterval = setInterval(fetchAndUpdateTuners, 1000);
+    // Reset every tuner badge back to “--” with gray badges
+    function resetTunerBadges() {
+      for (let i = 0; i < tunerCount; i++) {
+        ["lock-badge", "modulation", "ss-badge", "snq-badge", "seq-badge"].forEach((suffix) => {
+          const el = document.getElementById(`tuner-${i}-${suffix}`);
+          if (el) {
+            el.innerText = "--";
+            el.className = "badge text-bg-secondary";
+          }
+        });
+      }
+      clearAllProgressBars();
+      document.getElementById("ts-info").hidden = true;
+    }
 
+    // Select the program once; bitrate updates then arrive over the stream
     function fetchAndUpdateProgramInfo() {
-      if (!pollingEnabled) return;
       if (selectedTuner === null || tunedProgramId === null) return;
       fetch("api/program_info", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ tuner: selectedTuner, program: tunedProgramId }),
+        body: JSON.stringify({
+          device: currentDevice,
+          tuner: selectedTuner,
+          program: tunedProgramId,
+        }),
       })
         .then((r) => r.json())
         .then((info) => {
@@ -376,63 +506,81 @@
     // ───────────────────────────────────────────────────────────
     // 3) Tuner selection click handler
     // ───────────────────────────────────────────────────────────
-    const tunerItems = document.querySelectorAll(".list-group-item[id^='tuner-']");
-    tunerItems.forEach((item) => {
-      item.addEventListener("click", (e) => {
-        e.preventDefault();
-        tunerItems.forEach((el) => el.classList.remove("active"));
-        item.classList.add("active");
-
-        selectedTuner = parseInt(item.id.split("-")[1], 10);
-
-        // Hide TS info & program dropdown until tune
-        document.getElementById("ts-info").hidden = true;
-        clearInterval(programInfoInterval);
-        programInfoInterval = null;
-        tunedProgramId = null;
-        tunedProgram = null;
-        const programSelect = document.getElementById("program-select");
-        programSelect.disabled = true;
-        programSelect.hidden = true;
-        programSelect.innerHTML = '<option value="" disabled selected>Select Program…</option>';
-        document.getElementById("tune-button").classList.add("disabled");
-
-        // Clear progress bars right away for this tuner
-        fetch("api/tuners")
-          .then((r) => r.json())
-          .then((tuners) => {
-            const chosen = tuners.find((x) => x.index === selectedTuner);
-            if (!chosen || !chosen.locked) {
-              clearAllProgressBars();
-            } else {
-              updateProgressBar("ss-progress-bar", "ss-percentage-text", chosen.ss, ssColorClass);
-              updateProgressBar(
-                "snq-progress-bar",
-                "snq-percentage-text",
-                chosen.snq,
-                snqColorClass
-              );
-              updateProgressBar(
-                "seq-progress-bar",
-                "seq-percentage-text",
-                chosen.seq,
-                seqColorClass
-              );
-            }
-          })
-          .catch((err) => {
-            console.error(err);
-            clearAllProgressBars();
-          });
-
-        // **Reset the chart entirely** whenever you switch tuners:
-        chartSeries.forEach((s) => {
-          s.data.length = 0;
+    const tunerList = document.getElementById("tuner-list");
+
+    // Build one list entry per tuner of the current device
+    function buildTunerList(count) {
+      tunerCount = count;
+      tunerList.innerHTML = "";
+      for (let i = 0; i < count; i++) {
+        const item = document.createElement("a");
+        item.href = "#";
+        item.className = "list-group-item list-group-item-action";
+        item.id = `tuner-${i}-item`;
+        item.innerHTML = `
+          <div class="d-flex w-100 justify-content-between">
+            <h5 class="mb-1">Tuner ${i}</h5>
+            <small><span id="tuner-${i}-lock-badge" class="badge rounded-pill text-bg-secondary">--</span></small>
+          </div>
+          <div class="d-flex w-100 justify-content-between">
+            <small><span id="tuner-${i}-modulation" class="badge rounded-pill text-bg-secondary">--</span></small>
+            <small><span id="tuner-${i}-ss-badge" class="badge rounded-pill text-bg-secondary">--</span></small>
+            <small><span id="tuner-${i}-snq-badge" class="badge rounded-pill text-bg-secondary">--</span></small>
+            <small><span id="tuner-${i}-seq-badge" class="badge rounded-pill text-bg-secondary">--</span></small>
+          </div>`;
+        item.addEventListener("click", (e) => {
+          e.preventDefault();
+          selectTuner(item, i);
         });
-        signalChart.setOption({ series: chartSeries });
-        updateChartTitle();
+        tunerList.appendChild(item);
+      }
+    }
+
+    function selectTuner(item, index) {
+      tunerList.querySelectorAll(".list-group-item").forEach((el) => el.classList.remove("active"));
+      item.classList.add("active");
+
+      selectedTuner = index;
+
+      // Hide TS info & program dropdown until tune
+      document.getElementById("ts-info").hidden = true;
+      tunedProgramId = null;
+      tunedProgram = null;
+      const programSelect = document.getElementById("program-select");
+      programSelect.disabled = true;
+      programSelect.hidden = true;
+      programSelect.innerHTML = '<option value="" disabled selected>Select Program…</option>';
+      document.getElementById("tune-button").classList.add("disabled");
+
+      // Clear progress bars right away for this tuner
+      const chosen = tunerState[tunerKey(currentDevice, selectedTuner)];
+      if (!chosen || !chosen.locked) {
+        clearAllProgressBars();
+      } else {
+        updateProgressBar("ss-progress-bar", "ss-percentage-text", chosen.ss, ssColorClass);
+        updateProgressBar(
+          "snq-progress-bar",
+          "snq-percentage-text",
+          chosen.snq,
+          snqColorClass
+        );
+        updateProgressBar(
+          "seq-progress-bar",
+          "seq-percentage-text",
+          chosen.seq,
+          seqColorClass
+        );
+      }
+
+      // **Reset the chart entirely** whenever you switch tuners, then
+      // backfill it from the server's recorded history
+      chartSeries.forEach((s) => {
+        s.data.length = 0;
       });
-    });
+      signalChart.setOption({ series: chartSeries });
+      updateChartTitle();
+      loadChartHistory();
+    }
 
     // ───────────────────────────────────────────────────────────
     // 4) "Scan Again" button behavior: run actual scan and populate table
@@ -451,35 +599,17 @@
       fetch("api/scan/start", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ tuner: selectedTuner }),
+        // Parallel mode spreads the band across every free tuner
+        body: JSON.stringify({ device: currentDevice, tuner: selectedTuner, mode: "parallel" }),
       })
         .then((r) => r.json())
         .then((data) => {
           if (!data.scan_id) throw new Error("Scan start failed");
-          const scanId = data.scan_id;
-          scanPollInterval = setInterval(() => {
-            if (!pollingEnabled) return;
-            fetch(`api/scan/status/${scanId}`)
-              .then((r) => r.json())
-              .then((resp) => {
-                if (Array.isArray(resp.results)) {
-                  renderScanRows(resp.results);
-                }
-                if (resp.finished) {
-                  clearInterval(scanPollInterval);
-                  scanPollInterval = null;
-                  scanHasRun = true;
-                  setScanning(false);
-                  collapseAllScanRows();
-                }
-              })
-              .catch((err) => {
-                console.error(err);
-                clearInterval(scanPollInterval);
-                scanPollInterval = null;
-                setScanning(false);
-              });
-          }, 3000);
+          // Progress arrives as "scan" events on the live stream
+          activeScanId = data.scan_id;
+          scanResults = [];
+          // Pick up anything published before the scan id was known
+          resyncScan(activeScanId);
         })
         .catch((err) => {
           console.error(err);
@@ -488,6 +618,34 @@
         });
     });
 
+    function finishScan() {
+      activeScanId = null;
+      setScanning(false);
+      collapseAllScanRows();
+    }
+
+    // Fetch the full scan state once, e.g. after the stream was paused
+    function resyncScan(scanId) {
+      fetch(`api/scan/status/${scanId}`)
+        .then((r) => r.json())
+        .then((resp) => {
+          if (scanId !== activeScanId) return;
+          if (Array.isArray(resp.results)) {
+            scanResults = [];
+            resp.results.forEach((g, i) => {
+              scanResults[g.physical ?? i] = g;
+            });
+            renderScanRows(scanResults.filter(Boolean));
+          }
+          if (resp.finished) finishScan();
+        })
+        .catch((err) => {
+          console.error(err);
+          activeScanId = null;
+          setScanning(false);
+        });
+    }
+
     // ───────────────────────────────────────────────────────────────────
     // Helper: renderScanRows(arrayOf { physical, ss, snq, subchannels:[…] })
     // ───────────────────────────────────────────────────────────────────
@@ -603,7 +761,11 @@ function renderScanRows(rows) {
     // 5) Force‐clear all tuner locks via POST /api/clear_locks
     // ───────────────────────────────────────────────────────────
     document.getElementById("force-clear-btn").addEventListener("click", () => {
-      fetch("api/clear_locks", { method: "POST" })
+      fetch("api/clear_locks", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ device: currentDevice }),
+      })
         .then((r) => {
           if (r.ok) {
             showToast("All tuner locks cleared");
@@ -666,40 +828,28 @@ function renderScanRows(rows) {
       tunedChannel = chVal;
       tunedProgram = null;
       tunedProgramId = null;
-      clearInterval(programInfoInterval);
-      programInfoInterval = null;
       updateChartTitle();
       programSelect.hidden = true;
       programSelect.innerHTML = '<option value="" disabled selected>Select Program…</option>';
       programSelect.disabled = true;
       tsInfo.hidden = true;
 
+      // Tune asynchronously; the result arrives as a "tune" stream event
       fetch("api/tune", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ tuner: selectedTuner, channel: chVal }),
+        body: JSON.stringify({
+          device: currentDevice,
+          tuner: selectedTuner,
+          channel: chVal,
+          async: true,
+        }),
       })
         .then((r) => r.json())
         .then((data) => {
-          // data.subchannels = [ { id, num, name }, … ]
-          if (Array.isArray(data.subchannels) && data.subchannels.length > 0) {
-            programSelect.hidden = false;
-            programSelect.disabled = false;
-            programSelect.innerHTML =
-              '<option value="" disabled selected>Select Program…</option>';
-            data.subchannels.forEach((p) => {
-              const opt = document.createElement("option");
-              opt.value = p.id;
-              opt.dataset.vchannel = p.num;
-              opt.innerText = `${p.num} | ${p.name}`;
-              programSelect.appendChild(opt);
-            });
-          } else {
-            showToast("No subchannels found", true);
-            programSelect.hidden = true;
-            programSelect.disabled = true;
-          }
-          updateChartTitle();
+          if (!data.job_id) throw new Error("Tune start failed");
+          pendingTuneJob = data.job_id;
+          checkTuneJob(data.job_id);
         })
         .catch((err) => {
           console.error(err);
@@ -709,6 +859,42 @@ function renderScanRows(rows) {
         });
     });
 
+    // Read a tune job directly: covers results published before the job id
+    // was known, and keeps tuning usable while the stream is paused
+    function checkTuneJob(jobId) {
+      fetch(`api/tune/${jobId}`)
+        .then((r) => r.json())
+        .then((job) => {
+          if (jobId !== pendingTuneJob) return;
+          if (job.finished) handleTuneResult(job);
+          else if (!stream) setTimeout(() => checkTuneJob(jobId), 500);
+        })
+        .catch((err) => console.error(err));
+    }
+
+    function handleTuneResult(data) {
+      pendingTuneJob = null;
+      // data.subchannels = [ { id, num, name }, … ]
+      if (Array.isArray(data.subchannels) && data.subchannels.length > 0) {
+        programSelect.hidden = false;
+        programSelect.disabled = false;
+        programSelect.innerHTML =
+          '<option value="" disabled selected>Select Program…</option>';
+        data.subchannels.forEach((p) => {
+          const opt = document.createElement("option");
+          opt.value = p.id;
+          opt.dataset.vchannel = p.num;
+          opt.innerText = `${p.num} | ${p.name}`;
+          programSelect.appendChild(opt);
+        });
+      } else {
+        showToast("No subchannels found", true);
+        programSelect.hidden = true;
+        programSelect.disabled = true;
+      }
+      updateChartTitle();
+    }
+
     // ───────────────────────────────────────────────────────────
     // 7) When a program is chosen, fetch its TS info
     // ───────────────────────────────────────────────────────────
@@ -719,8 +905,6 @@ function renderScanRows(rows) {
       const vchan = selectedOpt ? selectedOpt.dataset.vchannel : "";
       if (isNaN(progId)) {
         tsInfo.hidden = true;
-        clearInterval(programInfoInterval);
-        programInfoInterval = null;
         tunedProgramId = null;
         tunedProgram = null;
         updateChartTitle();
@@ -728,13 +912,13 @@ function renderScanRows(rows) {
       }
       tunedProgram = vchan;
       tunedProgramId = progId;
-      clearInterval(programInfoInterval);
-      programInfoInterval = setInterval(fetchAndUpdateProgramInfo, 1000);
       fetchAndUpdateProgramInfo();
     });
 
     // ───────────────────────────────────────────────────────────
-    // 8) Initially clear all progress bars
+    // 8) Initially clear all progress bars and start the live stream
     // ───────────────────────────────────────────────────────────
     clearAllProgressBars();
+    loadDevices();
+    openStream();
   });
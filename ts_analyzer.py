@@ -0,0 +1,490 @@
+"""Live transport stream analysis: per-PID bitrate, continuity errors, PCR jitter.
+
+:class:`TSAnalyzer` is fed raw MPEG transport stream bytes as they arrive
+from a tuner's UDP target or its HTTP stream (port 5004), or read from a
+recorded ``.ts`` file. Packets are parsed in place through memoryview
+indexing, so no per-packet objects are created. With NumPy installed a
+buffer of packets is decoded at once: headers are read as columns, packets
+are counted per PID with ``bincount`` and only continuity breaks and PCR
+packets are looked at one by one. The receivers batch several datagrams
+into one buffer so that path pays off.
+
+Continuity counter errors follow ISO/IEC 13818-1: the counter must step by
+one on every packet with a payload, one duplicate is allowed, and the
+adaptation field's discontinuity indicator resets it. PCR jitter is the
+peak-to-peak spread, over the last ``PCR_WINDOW`` PCRs, of the PCR clock
+against the packets' arrival time. For files, arrival is the byte position
+at a constant ``clock_bitrate``.
+
+    python ts_analyzer.py capture.ts
+"""
+
+import argparse
+import bisect
+import json
+import socket
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import Callable
+
+try:
+    import numpy as np
+except ImportError:  # optional; the pure-Python path keeps up with a full mux
+    np = None
+
+TS_PACKET_SIZE = 188
+TS_SYNC = 0x47
+NULL_PID = 0x1FFF
+PCR_HZ = 27_000_000
+PCR_WRAP = (1 << 33) * 300  # 33-bit base at 90 kHz times 300
+PCR_INTERVAL_MAX = 0.04  # seconds; longer gaps are counted as PCR repetition errors
+PCR_RESET = 1.0  # seconds; a larger PCR step is treated as a new timebase
+PCR_WINDOW = 64  # recent PCRs per PID used for jitter
+ATSC_MUX_BPS = 19_392_658
+UDP_DATAGRAM = 7 * TS_PACKET_SIZE
+RECEIVE_BUFFER = 64 * UDP_DATAGRAM  # bytes gathered before analyzing
+RECEIVE_FLUSH = 0.05  # seconds; analyze at least this often while data flows
+
+_BITS = TS_PACKET_SIZE * 8
+
+
+class PidStats:
+    """Counters for one PID."""
+
+    __slots__ = (
+        "packets",
+        "cc_errors",
+        "last_cc",
+        "dup",
+        "pcr_count",
+        "pcr_interval_errors",
+        "pcr_interval_max",
+        "last_pcr",
+        "pcr_clock",
+        "pcr_base_at",
+        "pcr_offsets",
+        "window_packets",
+        "bitrate",
+    )
+
+    def __init__(self):
+        self.packets = 0
+        self.cc_errors = 0
+        self.last_cc = None
+        self.dup = False
+        self.pcr_count = 0
+        self.pcr_interval_errors = 0
+        self.pcr_interval_max = 0.0
+        self.last_pcr = None
+        self.pcr_clock = 0.0
+        self.pcr_base_at = 0.0
+        self.pcr_offsets: deque[float] = deque(maxlen=PCR_WINDOW)
+        self.window_packets = 0
+        self.bitrate = 0
+
+    def as_dict(self, elapsed: float) -> dict:
+        stats = {
+            "packets": self.packets,
+            "bitrate": self.bitrate,
+            "avg_bitrate": round(self.packets * _BITS / elapsed) if elapsed > 0 else 0,
+            "cc_errors": self.cc_errors,
+        }
+        if self.pcr_count:
+            offsets = self.pcr_offsets
+            stats.update(
+                pcr_count=self.pcr_count,
+                pcr_interval_max_ms=round(self.pcr_interval_max * 1000, 3),
+                pcr_interval_errors=self.pcr_interval_errors,
+                pcr_jitter_ms=round((max(offsets) - min(offsets)) * 1000, 3),
+            )
+        return stats
+
+
+class TSAnalyzer:
+    """Incremental transport stream analyzer.
+
+    ``clock_bitrate`` makes arrival times follow the byte position (for
+    files); otherwise :meth:`feed` takes wall-clock arrival times. Bitrates
+    are recomputed every ``window`` seconds of arrival time.
+    """
+
+    def __init__(
+        self,
+        clock_bitrate: float | None = None,
+        window: float = 1.0,
+        use_numpy: bool | None = None,
+    ):
+        self.clock_bitrate = clock_bitrate
+        self.window = window
+        self.use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+        self.pids: dict[int, PidStats] = {}
+        self.packets = 0
+        self.bytes = 0  # every byte fed, including skipped garbage
+        self.sync_losses = 0
+        self.transport_errors = 0
+        self.bitrate = 0
+        self._pending = b""
+        self._started: float | None = None
+        self._last_at = 0.0
+        self._window_start = 0.0
+        self._window_packets = 0
+        self._lock = threading.Lock()  # stats() may be read from another thread
+
+    def feed(self, data, arrival=None) -> None:
+        """Analyze ``data``.
+
+        ``arrival`` is the ``time.monotonic()`` at which ``data`` arrived, or
+        ``[(offset, time), ...]`` for a buffer assembled from several
+        datagrams; it defaults to now and is ignored with ``clock_bitrate``.
+        """
+        with self._lock:
+            self._feed(data, arrival)
+
+    def stats(self) -> dict:
+        """Return totals and per-PID figures (bitrates in bits per second)."""
+        with self._lock:
+            elapsed = self._last_at - self._started if self._started is not None else 0.0
+            pids = {str(pid): s.as_dict(elapsed) for pid, s in sorted(self.pids.items())}
+            return {
+                "packets": self.packets,
+                "bytes": self.bytes,
+                "seconds": round(elapsed, 3),
+                "bitrate": self.bitrate,
+                "avg_bitrate": round(self.packets * _BITS / elapsed) if elapsed > 0 else 0,
+                "sync_losses": self.sync_losses,
+                "transport_errors": self.transport_errors,
+                "cc_errors": sum(s["cc_errors"] for s in pids.values()),
+                "pids": pids,
+            }
+
+    # -- internals ------------------------------------------------------------
+
+    def _feed(self, data, arrival) -> None:
+        if self._pending:
+            carried = len(self._pending)
+            buf = self._pending + bytes(data)
+        else:
+            carried = 0
+            buf = data
+        base = self.bytes - carried
+        self.bytes += len(data)
+        at = self._clock(base, carried, arrival)
+
+        view = memoryview(buf)
+        process = self._process_numpy if self.use_numpy else self._process_python
+        pos = 0
+        while True:
+            pos = self._sync(view, pos)
+            end = pos + (len(view) - pos) // TS_PACKET_SIZE * TS_PACKET_SIZE
+            if end == pos:
+                break
+            pos += process(view[pos:end], pos, at)
+            if pos == end:
+                break
+        self._pending = bytes(view[pos:])
+        if self.packets:
+            self._roll(at(len(view)))
+
+    def _clock(self, base: int, carried: int, arrival) -> Callable[[int], float]:
+        """Return ``at(offset)``: the arrival time of byte ``offset`` of the buffer."""
+        if self.clock_bitrate:
+            scale = 8 / self.clock_bitrate
+            return lambda offset: (base + offset) * scale
+        if arrival is None:
+            arrival = time.monotonic()
+        if not isinstance(arrival, (list, tuple)):
+            return lambda offset: arrival
+        offsets = [o + carried for o, _ in arrival]
+        times = [t for _, t in arrival]
+
+        def at(offset: int) -> float:
+            return times[max(bisect.bisect_right(offsets, offset) - 1, 0)]
+
+        return at
+
+    def _sync(self, view: memoryview, pos: int) -> int:
+        """Return the offset of the next packet start at or after ``pos``."""
+        size = len(view)
+        if pos >= size or (
+            view[pos] == TS_SYNC
+            and (pos + TS_PACKET_SIZE >= size or view[pos + TS_PACKET_SIZE] == TS_SYNC)
+        ):
+            return pos
+        self.sync_losses += 1
+        raw = bytes(view)
+        start = pos + 1
+        while True:
+            start = raw.find(b"\x47", start)
+            if start < 0:
+                return max(pos, size - TS_PACKET_SIZE + 1)  # keep a possible partial packet
+            if start + TS_PACKET_SIZE >= size or raw[start + TS_PACKET_SIZE] == TS_SYNC:
+                return start
+            start += 1
+
+    def _stats(self, pid: int) -> PidStats:
+        stats = self.pids.get(pid)
+        if stats is None:
+            stats = self.pids[pid] = PidStats()
+        return stats
+
+    def _process_python(self, block: memoryview, offset: int, at) -> int:
+        """Analyze whole packets of ``block``; stop at a lost sync. Returns bytes used."""
+        pids = self.pids
+        used = 0
+        for off in range(0, len(block), TS_PACKET_SIZE):
+            if block[off] != TS_SYNC:
+                break
+            used = off + TS_PACKET_SIZE
+            b1 = block[off + 1]
+            pid = (b1 & 0x1F) << 8 | block[off + 2]
+            stats = pids.get(pid) or self._stats(pid)
+            stats.packets += 1
+            if b1 & 0x80:
+                self.transport_errors += 1
+                continue
+            b3 = block[off + 3]
+            disc = False
+            if b3 & 0x20 and block[off + 4]:
+                flags = block[off + 5]
+                disc = flags & 0x80
+                if flags & 0x10 and block[off + 4] >= 7:
+                    self._pcr(stats, _read_pcr(block, off + 6), at(offset + off), disc)
+            if b3 & 0x10 and pid != NULL_PID:
+                self._cc(stats, b3 & 0x0F, disc)
+        self._count(used // TS_PACKET_SIZE, at(offset))
+        return used
+
+    def _process_numpy(self, block: memoryview, offset: int, at) -> int:
+        rows = np.frombuffer(block, dtype=np.uint8).reshape(-1, TS_PACKET_SIZE)
+        lost = np.flatnonzero(rows[:, 0] != TS_SYNC)
+        if lost.size:
+            rows = rows[: lost[0]]
+        if not len(rows):
+            return 0
+        b1, b3, length, flags = rows[:, 1], rows[:, 3], rows[:, 4], rows[:, 5]
+        pid = (b1 & 0x1F).astype(np.int32) << 8 | rows[:, 2]
+
+        counts = np.bincount(pid, minlength=NULL_PID + 1)
+        for p in np.flatnonzero(counts).tolist():
+            self._stats(p).packets += int(counts[p])
+        error = (b1 & 0x80) != 0
+        self.transport_errors += int(np.count_nonzero(error))
+
+        adaptation = ((b3 & 0x20) != 0) & (length > 0) & ~error
+        disc = adaptation & ((flags & 0x80) != 0)
+        for row in np.flatnonzero(adaptation & ((flags & 0x10) != 0) & (length >= 7)).tolist():
+            off = row * TS_PACKET_SIZE
+            self._pcr(
+                self.pids[int(pid[row])],
+                _read_pcr(block, off + 6),
+                at(offset + off),
+                bool(disc[row]),
+            )
+
+        payload = np.flatnonzero(((b3 & 0x10) != 0) & (pid != NULL_PID) & ~error)
+        if payload.size:
+            order = payload[np.argsort(pid[payload], kind="stable")]
+            cc = (b3[order] & 0x0F).astype(np.int8)
+            groups = np.flatnonzero(np.diff(pid[order])) + 1
+            for ccs, rows_ in zip(np.split(cc, groups), np.split(order, groups)):
+                self._cc_run(self.pids[int(pid[rows_[0]])], ccs, disc[rows_])
+        self._count(len(rows), at(offset))
+        return len(rows) * TS_PACKET_SIZE
+
+    def _cc_run(self, stats: PidStats, ccs, disc) -> None:
+        """Check one PID's counters; only breaks in the sequence are handled singly."""
+        breaks = np.flatnonzero(ccs[1:] != (ccs[:-1] + 1) & 0x0F) + 1
+        previous = -1
+        for k in [0, *breaks.tolist()]:
+            if k:
+                if k - 1 != previous:
+                    stats.dup = False
+                stats.last_cc = int(ccs[k - 1])
+            self._cc(stats, int(ccs[k]), bool(disc[k]))
+            previous = k
+        last = len(ccs) - 1
+        if previous != last:
+            stats.dup = False
+            stats.last_cc = int(ccs[last])
+
+    @staticmethod
+    def _cc(stats: PidStats, cc: int, disc) -> None:
+        last = stats.last_cc
+        if last is not None and not disc and cc != (last + 1) & 0x0F:
+            if cc == last and not stats.dup:
+                stats.dup = True
+                return
+            stats.cc_errors += 1
+        stats.dup = False
+        stats.last_cc = cc
+
+    @staticmethod
+    def _pcr(stats: PidStats, pcr: int, at: float, disc) -> None:
+        stats.pcr_count += 1
+        if stats.last_pcr is not None and not disc:
+            delta = (pcr - stats.last_pcr) % PCR_WRAP / PCR_HZ
+            if delta <= PCR_RESET:
+                stats.last_pcr = pcr
+                stats.pcr_clock += delta
+                stats.pcr_interval_max = max(stats.pcr_interval_max, delta)
+                if delta > PCR_INTERVAL_MAX:
+                    stats.pcr_interval_errors += 1
+                stats.pcr_offsets.append(stats.pcr_clock - (at - stats.pcr_base_at))
+                return
+        stats.last_pcr = pcr
+        stats.pcr_clock = 0.0
+        stats.pcr_base_at = at
+        stats.pcr_offsets.clear()
+        stats.pcr_offsets.append(0.0)
+
+    def _count(self, packets: int, at: float) -> None:
+        if packets and self._started is None:
+            self._started = self._window_start = at
+        self.packets += packets
+
+    def _roll(self, now: float) -> None:
+        """Recompute windowed bitrates once ``window`` seconds have passed."""
+        self._last_at = now
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        scale = _BITS / elapsed
+        for stats in self.pids.values():
+            stats.bitrate = round((stats.packets - stats.window_packets) * scale)
+            stats.window_packets = stats.packets
+        self.bitrate = round((self.packets - self._window_packets) * scale)
+        self._window_packets = self.packets
+        self._window_start = now
+
+
+def _read_pcr(buf, off: int) -> int:
+    """Return the 27 MHz PCR whose six bytes start at ``off``."""
+    base = buf[off] << 25 | buf[off + 1] << 17 | buf[off + 2] << 9 | buf[off + 3] << 1
+    base |= buf[off + 4] >> 7
+    return base * 300 + ((buf[off + 4] & 0x01) << 8 | buf[off + 5])
+
+
+# -- sources ------------------------------------------------------------------
+
+
+def receive_udp(sock: socket.socket, analyzer: TSAnalyzer, stop: threading.Event) -> None:
+    """Feed datagrams from ``sock`` to ``analyzer`` until ``stop`` is set.
+
+    Datagrams are received straight into one buffer and analyzed together,
+    each with its own arrival time, every ``RECEIVE_FLUSH`` seconds or when
+    the buffer is full.
+    """
+    buf = bytearray(RECEIVE_BUFFER)
+    view = memoryview(buf)
+    sock.settimeout(RECEIVE_FLUSH)
+    while not stop.is_set():
+        size = 0
+        arrivals = []
+        flush_at = time.monotonic() + RECEIVE_FLUSH
+        while size <= RECEIVE_BUFFER - UDP_DATAGRAM and not stop.is_set():
+            try:
+                count = sock.recv_into(view[size:])
+            except socket.timeout:
+                break
+            now = time.monotonic()
+            arrivals.append((size, now))
+            size += count
+            if now >= flush_at:
+                break
+        if size:
+            analyzer.feed(view[:size], arrivals)
+
+
+def receive_http(
+    url: str, analyzer: TSAnalyzer, stop: threading.Event, timeout: float = 5.0
+) -> None:
+    """Feed ``url``'s stream (a device's port 5004) to ``analyzer`` until ``stop`` is set."""
+    buf = bytearray(RECEIVE_BUFFER)
+    view = memoryview(buf)
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        while not stop.is_set():
+            count = response.readinto(view)
+            if not count:
+                return
+            analyzer.feed(view[:count], time.monotonic())
+
+
+def analyze_file(
+    path: str,
+    clock_bitrate: float = ATSC_MUX_BPS,
+    chunk: int = RECEIVE_BUFFER,
+    use_numpy: bool | None = None,
+) -> TSAnalyzer:
+    """Analyze a recorded stream as if it arrived at ``clock_bitrate``."""
+    analyzer = TSAnalyzer(clock_bitrate, use_numpy=use_numpy)
+    buf = bytearray(chunk)
+    view = memoryview(buf)
+    with open(path, "rb") as f:
+        while count := f.readinto(view):
+            analyzer.feed(view[:count])
+    return analyzer
+
+
+class Capture:
+    """Run ``receive(analyzer, stop)`` in a background thread for up to ``duration`` seconds."""
+
+    def __init__(
+        self,
+        receive: Callable[[TSAnalyzer, threading.Event], None],
+        duration: float,
+        on_finish: Callable[["Capture"], None] | None = None,
+    ):
+        self.analyzer = TSAnalyzer()
+        self.receive = receive
+        self.duration = duration
+        self.on_finish = on_finish
+        self.started = time.time()
+        self.finished: float | None = None
+        self.error: str | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ts-capture", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        timer = threading.Timer(self.duration, self._stop.set)
+        timer.daemon = True
+        timer.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        try:
+            self.receive(self.analyzer, self._stop)
+        except (OSError, ValueError) as exc:
+            self.error = str(exc)
+        finally:
+            self.finished = time.time()
+            if self.on_finish is not None:
+                self.on_finish(self)
+
+    def status(self) -> dict:
+        return {
+            "running": self.finished is None,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "numpy": self.analyzer.use_numpy,
+            **self.analyzer.stats(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a recorded MPEG transport stream.")
+    parser.add_argument("path")
+    parser.add_argument("--bitrate", type=float, default=ATSC_MUX_BPS, help="arrival clock, bps")
+    parser.add_argument("--no-numpy", action="store_true")
+    args = parser.parse_args()
+    analyzer = analyze_file(args.path, args.bitrate, use_numpy=False if args.no_numpy else None)
+    print(json.dumps(analyzer.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
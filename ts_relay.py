@@ -0,0 +1,276 @@
+"""Share one tuner's transport stream among many HTTP viewers.
+
+A :class:`StreamRelay` receives a tuner's stream (e.g. with
+:func:`ts_analyzer.receive_udp`, the relay standing in for the analyzer)
+into one preallocated ring buffer. Each viewer holds a :class:`RelayReader`
+that walks the buffer at its own pace and is handed memoryview slices of it,
+so a single copy of the stream serves every viewer. A reader that falls
+further behind than the buffer holds is disconnected instead of being
+buffered for; players reconnect at the live edge.
+
+When the last reader leaves, the relay lingers for ``linger`` seconds (so a
+player restarting does not lose the tuner) and then stops and calls
+``on_close``. It also stops when no data arrives for ``stall`` seconds.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable
+
+from ts_analyzer import RECEIVE_BUFFER, TS_PACKET_SIZE
+
+WATCH_INTERVAL = 1.0  # seconds between idle/stall checks and keepalives
+KEEPALIVE_FAILURES = 3  # consecutive keepalive errors before the relay stops
+
+log = logging.getLogger(__name__)
+
+
+class StreamRelay:
+    """A ring buffer of ``capacity`` bytes filled by ``receive(relay, stop)``.
+
+    ``receive`` runs in a background thread and passes data to
+    :meth:`feed` until ``stop`` is set. ``keepalive`` is called every
+    second while the relay runs (e.g. to renew a tuner lease); when it raises
+    ``KEEPALIVE_FAILURES`` times in a row the relay stops with that error.
+    """
+
+    def __init__(
+        self,
+        receive: Callable[["StreamRelay", threading.Event], None],
+        capacity: int = 8 * 1024 * 1024,
+        linger: float = 5.0,
+        stall: float = 10.0,
+        on_close: Callable[["StreamRelay"], None] | None = None,
+        keepalive: Callable[[], None] | None = None,
+    ):
+        self.receive = receive
+        self.capacity = capacity - capacity % TS_PACKET_SIZE
+        self.linger = linger
+        self.stall = stall
+        self.on_close = on_close
+        self.keepalive = keepalive
+        self._view = memoryview(bytearray(self.capacity))
+        self._cond = threading.Condition()
+        self._readers: set[RelayReader] = set()
+        self._stop = threading.Event()
+        self._idle_since = time.monotonic()
+        self.written = 0
+        self.readers_served = 0
+        self.readers_dropped = 0
+        self.started = time.time()
+        self.closed = False
+        self.error: str | None = None
+
+    # -- producer -------------------------------------------------------------
+
+    def start(self) -> None:
+        for target, name in ((self._receive, "relay-receive"), (self._watch, "relay-watch")):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+    def feed(self, data, arrival=None) -> None:
+        """Append received bytes; ``arrival`` is accepted and ignored (analyzer interface)."""
+        data = memoryview(data)[-self.capacity :]
+        size = len(data)
+        with self._cond:
+            start = self.written % self.capacity
+            first = min(size, self.capacity - start)
+            self._view[start : start + first] = data[:first]
+            if first < size:
+                self._view[: size - first] = data[first:]
+            self.written += size
+            self._cond.notify_all()
+            waiting = [r for r in self._readers if isinstance(r, AsyncRelayReader)]
+        for reader in waiting:
+            reader.wake()
+
+    def _receive(self) -> None:
+        try:
+            self.receive(self, self._stop)
+        except Exception as exc:  # reported in status()
+            self.error = str(exc)
+        self.stop()
+
+    def _watch(self) -> None:
+        last_written, last_data = self.written, time.monotonic()
+        failures = 0
+        while not self._stop.wait(WATCH_INTERVAL):
+            now = time.monotonic()
+            if self.written != last_written:
+                last_written, last_data = self.written, now
+            elif now - last_data > self.stall:
+                self.error = self.error or "no data received"
+                break
+            with self._cond:
+                if not self._readers and now - self._idle_since >= self.linger:
+                    break
+            if self.keepalive is not None:
+                try:
+                    self.keepalive()
+                    failures = 0
+                except Exception as exc:  # keep relaying through a passing error
+                    failures += 1
+                    log.warning("relay keepalive failed (%d in a row): %s", failures, exc)
+                    if failures >= KEEPALIVE_FAILURES:
+                        self.error = self.error or f"keepalive failed: {exc}"
+                        break
+        self.stop()
+
+    def stop(self) -> None:
+        """Stop receiving, end every reader and call ``on_close`` (once)."""
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify_all()
+            readers = list(self._readers)
+        self._stop.set()
+        for reader in readers:
+            if isinstance(reader, AsyncRelayReader):
+                reader.wake()
+        if self.on_close is not None:
+            self.on_close(self)
+
+    # -- readers --------------------------------------------------------------
+
+    def open_reader(self, max_chunk: int = RECEIVE_BUFFER) -> "RelayReader | None":
+        """Return a reader starting at the live edge, or ``None`` if the relay has stopped."""
+        return self._add(RelayReader(self, max_chunk))
+
+    def open_async_reader(self, max_chunk: int = RECEIVE_BUFFER) -> "AsyncRelayReader | None":
+        """Like :meth:`open_reader`, for a coroutine on the running event loop."""
+        return self._add(AsyncRelayReader(self, max_chunk, asyncio.get_running_loop()))
+
+    def _add(self, reader):
+        with self._cond:
+            if self.closed:
+                return None
+            reader.pos = self.written - self.written % TS_PACKET_SIZE
+            self._readers.add(reader)
+            self.readers_served += 1
+        return reader
+
+    def _remove(self, reader: "RelayReader") -> None:
+        with self._cond:
+            if reader in self._readers:
+                self._readers.discard(reader)
+                if reader.dropped:
+                    self.readers_dropped += 1
+                if not self._readers:
+                    self._idle_since = time.monotonic()
+
+    def status(self) -> dict:
+        elapsed = max(time.time() - self.started, 1e-6)
+        with self._cond:
+            readers = len(self._readers)
+        return {
+            "readers": readers,
+            "readers_served": self.readers_served,
+            "readers_dropped": self.readers_dropped,
+            "bytes": self.written,
+            "bitrate": int(self.written * 8 / elapsed),
+            "buffer": self.capacity,
+            "started": self.started,
+            "closed": self.closed,
+            "error": self.error,
+        }
+
+
+class RelayReader:
+    """One viewer's position in a relay's ring buffer."""
+
+    def __init__(self, relay: StreamRelay, max_chunk: int):
+        self.relay = relay
+        self.max_chunk = min(max_chunk, relay.capacity // 2)
+        self.pos = 0
+        self.sent = 0
+        self.dropped = False
+        self.closed = False
+
+    def _next(self) -> memoryview | None:
+        """The next slice to send, or ``None``; called with the relay's lock held."""
+        relay = self.relay
+        lag = relay.written - self.pos
+        if lag > relay.capacity - self.max_chunk:
+            self.dropped = self.closed = True  # too slow: the writer is about to lap it
+            return None
+        if not lag:
+            return None
+        start = self.pos % relay.capacity
+        size = min(lag, relay.capacity - start, self.max_chunk)
+        return relay._view[start : start + size]
+
+    def _advance(self, chunk: memoryview) -> bool:
+        """Move past a sent chunk; ``False`` if the writer overwrote it meanwhile."""
+        if self.relay.written - self.pos > self.relay.capacity:
+            self.dropped = self.closed = True
+            return False
+        self.pos += len(chunk)
+        self.sent += len(chunk)
+        return True
+
+    def chunks(self, timeout: float = 1.0):
+        """Yield memoryview slices of the stream until the relay stops or the reader is dropped.
+
+        A slice is only valid until the next one is requested; copy it (or
+        send it) before asking for more.
+        """
+        relay = self.relay
+        try:
+            while True:
+                with relay._cond:
+                    chunk = self._next()
+                    while chunk is None and not (self.closed or relay.closed):
+                        relay._cond.wait(timeout)
+                        chunk = self._next()
+                if chunk is None:
+                    return
+                yield chunk
+                if not self._advance(chunk):
+                    return
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.closed = True
+        self.relay._remove(self)
+
+
+class AsyncRelayReader(RelayReader):
+    """A reader consumed from an asyncio event loop."""
+
+    def __init__(self, relay: StreamRelay, max_chunk: int, loop: asyncio.AbstractEventLoop):
+        super().__init__(relay, max_chunk)
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def wake(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:  # loop closed
+            pass
+
+    async def achunks(self, timeout: float = 1.0):
+        """Async version of :meth:`RelayReader.chunks`."""
+        relay = self.relay
+        try:
+            while True:
+                with relay._cond:
+                    chunk = self._next()
+                    ended = self.closed or relay.closed
+                    if chunk is None:
+                        self._ready.clear()
+                if chunk is None:
+                    if ended:
+                        return
+                    try:
+                        await asyncio.wait_for(self._ready.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                yield chunk
+                if not self._advance(chunk):
+                    return
+        finally:
+            self.close()
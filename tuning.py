@@ -0,0 +1,149 @@
+"""Tune a tuner and wait for lock and PSIP with adaptive polling.
+
+Instead of fixed sleeps, ``/tunerN/status`` and ``/tunerN/streaminfo`` are
+polled starting at ``POLL_INITIAL`` seconds and backing off exponentially
+up to ``POLL_MAX``. A channel that locks in 200 ms is reported in roughly
+200 ms; a dead channel gives up as soon as the signal is clearly absent.
+
+The stop conditions (:func:`lock_settled`, :func:`programs_ready`) are kept
+separate from the blocking loops so the asyncio server can drive the same
+polling with non-blocking sleeps.
+"""
+
+import time
+
+import perf
+from hdhomerun import parse_status, parse_streaminfo
+
+POLL_INITIAL = 0.05
+POLL_MAX = 0.5
+POLL_BACKOFF = 1.6
+# Below this signal strength there is no carrier worth waiting for; the
+# same cut-off libhdhomerun uses to end its lock wait early.
+SIGNAL_PRESENT_SS = 45
+# Give the demodulator this long after a channel change before treating a
+# weak signal reading as "no carrier".
+SIGNAL_SETTLE = 0.25
+
+
+def backoff_delays(
+    initial: float = POLL_INITIAL, maximum: float = POLL_MAX, factor: float = POLL_BACKOFF
+):
+    """Yield successive poll delays: initial, initial*factor, ... capped at maximum."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
+def _program_lines(raw: str) -> int:
+    """Count the programs still expected to be named.
+
+    Entries the device marks as never carrying a virtual channel, such as
+    ``3: 0 (control)`` or ``4: 0 (no data)``, are not counted; a bare
+    ``5: 0`` is a program whose PSIP has not arrived yet.
+    """
+    count = 0
+    for line in raw.splitlines():
+        prog, sep, rest = line.partition(":")
+        if not sep or not prog.strip().isdigit():
+            continue
+        tokens = rest.split()
+        if tokens and tokens[0] == "0" and "(" in rest:
+            continue
+        count += 1
+    return count
+
+
+def lock_settled(fields: dict, started: float, deadline: float, now: float) -> bool:
+    """Return True once a lock poll returning ``fields`` should stop waiting."""
+    if fields.get("lock", "none") != "none":
+        return True
+    try:
+        weak = int(fields.get("ss", 0)) < SIGNAL_PRESENT_SS
+    except ValueError:
+        weak = True
+    return (weak and now - started >= SIGNAL_SETTLE) or now >= deadline
+
+
+def programs_ready(raw: str) -> tuple[list[dict], bool]:
+    """Return ``(programs, complete)`` for a streaminfo reply.
+
+    ``complete`` is True once every listed program that can carry a virtual
+    channel has been named.
+    """
+    programs = parse_streaminfo(raw)
+    return programs, bool(programs) and len(programs) >= _program_lines(raw)
+
+
+def wait_for_lock(client, tuner: int, deadline: float, started: float | None = None) -> dict:
+    """Poll tuner status until it locks, the signal is absent or ``deadline``.
+
+    ``deadline`` and ``started`` are ``time.monotonic()`` values. Returns the
+    last parsed status fields.
+    """
+    started = time.monotonic() if started is None else started
+    delays = backoff_delays()
+    while True:
+        fields = parse_status(client.get(f"/tuner{tuner}/status"))
+        now = time.monotonic()
+        if lock_settled(fields, started, deadline, now):
+            return fields
+        with perf.span("wait", "tune_poll"):
+            time.sleep(min(next(delays), max(0.0, deadline - now)))
+
+
+def wait_for_programs(client, tuner: int, deadline: float) -> list[dict]:
+    """Poll streaminfo until every listed program is named, or ``deadline``.
+
+    Returns ``[{id, num, name}, ...]`` (possibly partial at the deadline).
+    """
+    delays = backoff_delays()
+    while True:
+        programs, complete = programs_ready(client.get(f"/tuner{tuner}/streaminfo"))
+        now = time.monotonic()
+        if complete or now >= deadline:
+            return programs
+        with perf.span("wait", "tune_poll"):
+            time.sleep(min(next(delays), max(0.0, deadline - now)))
+
+
+def tune_result(fields: dict) -> dict:
+    """Build the result of :func:`tune` from the final lock poll's fields."""
+    lock = fields.get("lock", "none")
+    result = {
+        "locked": lock != "none",
+        "lock": None if lock == "none" else lock.split(":", 1)[0],
+        "subchannels": [],
+        "time_to_lock": None,
+        "time_to_psip": None,
+    }
+    for key in ("ss", "snq", "seq"):
+        try:
+            result[key] = int(fields.get(key, 0))
+        except ValueError:
+            result[key] = 0
+    return result
+
+
+def tune(client, tuner: int, channel, deadline: float = 6.0, lockkey: int | None = None) -> dict:
+    """Tune ``channel`` (``auto:`` modulation) and wait for lock and programs.
+
+    ``deadline`` bounds the whole operation in seconds. Returns
+    ``{locked, lock, ss, snq, seq, subchannels, time_to_lock, time_to_psip}``
+    with times in seconds since the channel was set (``None`` if not reached).
+    """
+    started = time.monotonic()
+    end = started + deadline
+    client.set(f"/tuner{tuner}/channel", f"auto:{channel}", lockkey=lockkey)
+
+    result = tune_result(wait_for_lock(client, tuner, end, started))
+    if not result["locked"]:
+        return result
+    result["time_to_lock"] = round(time.monotonic() - started, 3)
+
+    programs = wait_for_programs(client, tuner, end)
+    result["subchannels"] = programs
+    if programs:
+        result["time_to_psip"] = round(time.monotonic() - started, 3)
+    return result